@@ -0,0 +1,155 @@
+import math
+import threading
+from collections import OrderedDict, deque
+from models import WasteLoad
+
+# Weighbridge readings that repeat within DUPLICATE_TOLERANCE are treated as the same load
+DUPLICATE_TOLERANCE = 0.02
+# Readings off by about 10x or 100x from a load moments earlier are likely a slipped digit
+MAGNITUDE_RATIOS = (10.0, 100.0)
+MAGNITUDE_TOLERANCE = 0.05
+
+# Rolling weight statistics are kept on log(weight), so a 10x error is the same distance
+# from a 300 kg vehicle's average as from a 3000 kg one's
+ROLLING_WINDOW = 50
+MIN_HISTORY = 10
+# Floor on the rolling standard deviation (about +/-25%) so very regular vehicles are not
+# flagged for ordinary variation
+MIN_LOG_STD = math.log(1.25)
+# Deviation, in rolling standard deviations, beyond which a weight is clipped when updating
+OUTLIER_CLIP = 3.0
+# Loads remembered per vehicle for the near-duplicate checks
+RECENT_LOADS = 8
+
+class VehicleState:
+    """Rolling weight statistics and the last few loads of one vehicle"""
+    
+    __slots__ = ('count', 'mean', 'variance', 'recent')
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.recent = deque(maxlen=RECENT_LOADS)
+    
+    def std(self):
+        return max(math.sqrt(self.variance), MIN_LOG_STD)
+    
+    def add(self, load_datetime, weight):
+        """Fold one load into the exponentially weighted mean and variance of log(weight)
+        
+        Once there is enough history, values are clipped to the outlier threshold
+        first, so a single bad reading barely moves the statistics while a vehicle
+        whose loads really change still drifts to its new level.
+        """
+        value = math.log(weight)
+        if self.count >= MIN_HISTORY:
+            limit = OUTLIER_CLIP * self.std()
+            value = min(max(value, self.mean - limit), self.mean + limit)
+        self.count += 1
+        alpha = max(1.0 / self.count, 2.0 / (ROLLING_WINDOW + 1))
+        delta = value - self.mean
+        self.mean += alpha * delta
+        self.variance = (1 - alpha) * (self.variance + alpha * delta * delta)
+        self.recent.append((load_datetime, weight))
+
+class AnomalyDetector:
+    """Flags near-duplicate submissions and weight outliers as loads are ingested
+    
+    Keeps a VehicleState per tenant and vehicle in a bounded LRU shared by all tenants;
+    a vehicle that is not in memory is warmed from its latest stored loads on first
+    sight. Checks compare a load with at most RECENT_LOADS earlier loads and one set
+    of statistics, so their cost does not grow with the table or the batch. Each worker process keeps its own state, so near-duplicates
+    submitted to different workers are caught once a worker next warms that vehicle.
+    """
+    
+    def __init__(self, capacity=10000, duplicate_minutes=10, outlier_sigmas=4.0):
+        self.capacity = capacity
+        self.duplicate_minutes = duplicate_minutes
+        self.outlier_sigmas = outlier_sigmas
+        self._vehicles = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _state(self, key):
+        """Get a vehicle's state by (tenant_id, normalized vehicle number), warming it from the database if needed"""
+        with self._lock:
+            state = self._vehicles.get(key)
+            if state is not None:
+                self._vehicles.move_to_end(key)
+                return state
+        
+        state = VehicleState()
+        for load_datetime, weight in reversed(WasteLoad.get_recent_weights(*key, ROLLING_WINDOW)):
+            state.add(load_datetime, weight)
+        with self._lock:
+            state = self._vehicles.setdefault(key, state)
+            self._vehicles.move_to_end(key)
+            while len(self._vehicles) > self.capacity:
+                self._vehicles.popitem(last=False)
+        return state
+    
+    def check(self, rows):
+        """Get the flags for each of rows (dicts of WasteLoad column values), without recording them
+        
+        Returns one list of (kind, detail, reference_weight) tuples per row. Earlier
+        rows of the same call count as recent loads, so a batch that repeats a load
+        is caught too; like stored loads, only the last RECENT_LOADS of a vehicle are
+        compared, so a check costs the same however large the batch.
+        """
+        window = self.duplicate_minutes * 60
+        pending = {}
+        results = []
+        for row in rows:
+            key = (row['tenant_id'], row['vehicle_search'])
+            state = self._state(key)
+            load_datetime, weight = row['datetime'], row['waste_weight']
+            recent = pending.get(key)
+            if recent is None:
+                recent = pending[key] = deque(state.recent, maxlen=RECENT_LOADS)
+            flags = []
+            
+            # Any duplicate in the window wins over a magnitude slip; among several
+            # matches, the newest load is reported
+            duplicate = slip = None
+            for other_datetime, other_weight in reversed(recent):
+                if abs((load_datetime - other_datetime).total_seconds()) > window:
+                    continue
+                ratio = max(weight, other_weight) / min(weight, other_weight)
+                if ratio - 1 <= DUPLICATE_TOLERANCE:
+                    if duplicate is None or other_datetime > duplicate[0]:
+                        duplicate = (other_datetime, other_weight, ratio)
+                elif any(abs(ratio / expected - 1) <= MAGNITUDE_TOLERANCE for expected in MAGNITUDE_RATIOS):
+                    if slip is None or other_datetime > slip[0]:
+                        slip = (other_datetime, other_weight, ratio)
+            if duplicate:
+                other_datetime, other_weight, _ = duplicate
+                flags.append(('duplicate', f"Same vehicle logged {other_weight:g} kg at "
+                                           f"{other_datetime:%Y-%m-%d %H:%M}", other_weight))
+            elif slip:
+                other_datetime, other_weight, ratio = slip
+                flags.append(('magnitude', f"{weight:g} kg is off by about {round(ratio):d}x from the "
+                                           f"{other_weight:g} kg logged at {other_datetime:%Y-%m-%d %H:%M}",
+                              other_weight))
+            
+            if state.count >= MIN_HISTORY:
+                deviation = (math.log(weight) - state.mean) / state.std()
+                if abs(deviation) > self.outlier_sigmas:
+                    typical = math.exp(state.mean)
+                    flags.append(('outlier', f"{weight:g} kg is far from this vehicle's typical "
+                                             f"{typical:.0f} kg", round(typical, 1)))
+            
+            recent.append((load_datetime, weight))
+            results.append(flags)
+        return results
+    
+    def record(self, rows):
+        """Add committed rows to the rolling state of vehicles held in memory
+        
+        Vehicles evicted since check() are skipped; warming them later reads these
+        rows from the database anyway.
+        """
+        with self._lock:
+            for row in rows:
+                state = self._vehicles.get((row['tenant_id'], row['vehicle_search']))
+                if state is not None:
+                    state.add(row['datetime'], row['waste_weight'])
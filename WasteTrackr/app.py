@@ -1,124 +1,613 @@
 import os
+import uuid
+import re
+import hashlib
+import functools
 import logging
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+import multiprocessing
+import click
+import orjson
+from datetime import datetime, time, timedelta
+from flask import Blueprint, Flask, Response, abort, current_app, g, has_app_context, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, stream_with_context, session
 from werkzeug.middleware.proxy_fix import ProxyFix
-from werkzeug.utils import secure_filename
-from models import db, WasteLoad, Organization
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-
-# Create Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure the PostgreSQL database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from models import db, WasteLoad, Organization, DailyWasteRollup, DataVersion, sync_schema, ensure_search_index, explain
+from models import Job, LoadFlag, READ_REPLICA, dimension_cache, migrate_dimension_columns, use_read_replica
+from models import Tenant, current_tenant_id, get_archive, migrate_tenant_columns, use_tenant
+from importer import import_csv
+from anomalies import AnomalyDetector
+from archive import Archive, migrate_legacy_archive, tenant_folder
+from assets import LOGO_VARIANT_PATTERN, StaticAssets, is_logo_key, logo_variant_filename, remove_logo, send_immutable, store_logo
+from cache import TTLCache
+from metrics import RequestMetrics
+from trends import GRANULARITIES, build_trends
+from exports import EXPORT_COLUMNS, generate_csv, gzip_stream
+from jobs import JOB_KINDS, work
 
-# Initialize the database
-db.init_app(app)
+def engine_options(prefix):
+    """Engine options for the database configured by the {prefix}_* environment variables
+    
+    {prefix}_POOL_SIZE, {prefix}_MAX_OVERFLOW and {prefix}_POOL_TIMEOUT size the connection
+    pool; {prefix}_STATEMENT_TIMEOUT_MS cancels slower statements on PostgreSQL.
+    """
+    options = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    for setting, option in (('POOL_SIZE', 'pool_size'), ('MAX_OVERFLOW', 'max_overflow'), ('POOL_TIMEOUT', 'pool_timeout')):
+        if os.environ.get(f'{prefix}_{setting}'):
+            options[option] = int(os.environ[f'{prefix}_{setting}'])
+    statement_timeout = os.environ.get(f'{prefix}_STATEMENT_TIMEOUT_MS')
+    if statement_timeout and os.environ.get(f'{prefix}_URL', '').startswith('postgres'):
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+    return options
 
-# Configure file uploads
+# Logo uploads, relative to the working directory
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# Create upload directory if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Per-process caches and metrics; create_app() applies the configured sizes and lifetimes.
+# Metadata keys carry the data version, so the size bound evicts entries of old versions
+metadata_cache = TTLCache(300, 1024)
+response_cache = TTLCache(600, 256)
+request_metrics = RequestMetrics()
+static_assets = StaticAssets()
+anomaly_detector = AnomalyDetector()
+
+# Streaming format for large API pulls
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Views, request hooks and CLI commands, registered on the application by create_app()
+bp = Blueprint('main', __name__, cli_group=None)
+
+def get_data_version():
+    """Get the current tenant's DataVersion (version, updated_at), read once per request"""
+    tenant_id = current_tenant_id()
+    if g.get('data_version', (None,))[0] != tenant_id:
+        g.data_version = (tenant_id, DataVersion.get())
+    return g.data_version[1]
+
+def forget_data_version():
+    """Drop the data version read earlier in this request; call after committing a write
+    
+    Cached metadata is keyed by data version, so later lookups then see the write,
+    and every worker's entries for older versions stop being used.
+    """
+    g.pop('data_version', None)
+
+def get_organization():
+    """Get the current tenant's organization from the metadata cache"""
+    key = ('organization', current_tenant_id(), get_data_version()[0])
+    return metadata_cache.get_or_load(key, Organization.get_current_snapshot)
+
+def get_filter_options():
+    """Get the current tenant's filter dropdown options from the metadata cache"""
+    key = ('filter_options', current_tenant_id(), get_data_version()[0])
+    return metadata_cache.get_or_load(key, DailyWasteRollup.get_distinct_values)
+
+def get_tenant_id(slug):
+    """Get a tenant's id by slug through the metadata cache, or None if there is no such tenant
+    
+    Unknown slugs are not cached, so requests for made-up subdomains cannot fill the cache.
+    """
+    tenant_id = metadata_cache.get(('tenant', slug))
+    if tenant_id is None:
+        tenant_id = Tenant.get_id(slug)
+        if tenant_id is not None:
+            metadata_cache.set(('tenant', slug), tenant_id)
+    return tenant_id
+
+def requested_tenant_slug():
+    """Get the slug of the tenant a request is for
+    
+    Taken from the TENANT_HEADER header if one is configured and present (it must be
+    set by a trusted proxy that strips it from client requests), then from the
+    subdomain of TENANT_DOMAIN, falling back to DEFAULT_TENANT (None if that is empty).
+    """
+    header = current_app.config['TENANT_HEADER']
+    if header and request.headers.get(header):
+        return request.headers[header].strip().lower()
+    domain = current_app.config['TENANT_DOMAIN']
+    host = request.host.rsplit(':', 1)[0].lower()
+    if domain and host.endswith('.' + domain):
+        return host[:-len(domain) - 1]
+    return current_app.config['DEFAULT_TENANT'] or None
+
+# Endpoints that serve the same content to every tenant
+TENANTLESS_ENDPOINTS = {'static', 'main.uploaded_file', 'main.metrics'}
+
+@bp.before_app_request
+def select_tenant():
+    """Scope the request's queries, caches and writes to the tenant it is for; 404 for unknown tenants"""
+    if request.endpoint in TENANTLESS_ENDPOINTS:
+        return
+    slug = requested_tenant_slug()
+    tenant_id = get_tenant_id(slug) if slug else None
+    if tenant_id is None:
+        abort(404)
+    use_tenant(tenant_id)
+
+def conditional_on_data_version(view):
+    """Serve read-only views with ETag/Last-Modified validators derived from DataVersion
+    
+    Unchanged data is answered with 304 Not Modified, or from the server-side response
+    cache, without running the view. Streamed responses get validators but are not cached.
+    If the version cannot be read, the view runs uncached and handles the error itself.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Pending flash messages are rendered into the page, so never short-circuit them
+        if '_flashes' in session:
+            return view(*args, **kwargs)
+        
+        try:
+            version, updated_at = get_data_version()
+        except Exception as e:
+            logging.error(f"Error reading data version: {e}")
+            db.session.rollback()
+            return view(*args, **kwargs)
+        normalized_args = tuple(sorted((key, value) for key, value in request.args.items(multi=True) if value))
+        variant = ('gzip' in request.accept_encodings, request.headers.get('Accept', ''))
+        cache_key = (current_tenant_id(), request.endpoint, normalized_args, variant, version)
+        etag = hashlib.sha1(repr(cache_key).encode()).hexdigest()[:20]
+        
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            # Last-Modified has whole-second precision, so a date equal to it may predate a
+            # later write in the same second; only a strictly later date proves freshness
+            not_modified = bool(updated_at and request.if_modified_since and
+                                request.if_modified_since > updated_at)
+        if not_modified:
+            response = Response(status=304)
+        else:
+            cached = response_cache.get(cache_key)
+            if cached:
+                body, status, headers = cached
+                response = Response(body, status=status, headers=headers)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed and not session.modified:
+                    response_cache.set(cache_key, (response.get_data(), response.status_code,
+                                                   list(response.headers.items())))
+                elif response.status_code != 200:
+                    return response
+        
+        response.set_etag(etag)
+        if updated_at:
+            response.last_modified = updated_at
+        # Let browsers keep the response but always revalidate it
+        response.cache_control.no_cache = True
+        return response
+    
+    return wrapper
+
+def reads_from_replica(view):
+    """Run a read-only view's queries on the read replica, if one is configured
+    
+    Clients that wrote within the last READ_YOUR_WRITES_SECONDS keep reading from the
+    primary so their own changes show up despite replication lag. The setting lasts
+    for the whole request, including streamed responses.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('read_primary_until', 0) <= datetime.now().timestamp():
+            use_read_replica()
+        return view(*args, **kwargs)
+    
+    return wrapper
+
+@bp.after_app_request
+def remember_recent_write(response):
+    """After a successful write, keep this client's reads on the primary for a few seconds"""
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.status_code < 400 \
+            and READ_REPLICA in db.engines:
+        session['read_primary_until'] = datetime.now().timestamp() + current_app.config['READ_YOUR_WRITES_SECONDS']
+    return response
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def prepare_chart_data(waste_loads):
-    """Prepare data for charts"""
-    try:
-        # Count by waste type
-        waste_type_counts = {}
-        material_category_counts = {}
-        destination_counts = {}
-        weight_by_type = {}
-        weight_by_destination = {}
+# Query arguments understood by parse_filters()
+FILTER_ARGS = ('vehicle_number', 'date_from', 'date_to', 'weight_min', 'weight_max',
+               'waste_type', 'material_category', 'destination', 'panchayath')
+
+def parse_filters(args):
+    """Build a WasteLoad.filtered_query() criteria dict from request query arguments"""
+    filters = {}
+    
+    vehicle_number = args.get('vehicle_number')
+    if vehicle_number:
+        filters['vehicle_number'] = vehicle_number
         
-        for load in waste_loads:
-            # Waste type counts
-            waste_type_counts[load.waste_type] = waste_type_counts.get(load.waste_type, 0) + 1
+    date_from = args.get('date_from')
+    if date_from:
+        try:
+            filters['date_from'] = datetime.strptime(date_from, '%Y-%m-%d')
+        except ValueError:
+            pass
             
-            # Material category counts
-            material_category_counts[load.material_category] = material_category_counts.get(load.material_category, 0) + 1
+    date_to = args.get('date_to')
+    if date_to:
+        try:
+            # Date To is inclusive of the whole day
+            filters['date_to'] = datetime.combine(datetime.strptime(date_to, '%Y-%m-%d'), time.max)
+        except ValueError:
+            pass
             
-            # Destination counts
-            destination_counts[load.destination] = destination_counts.get(load.destination, 0) + 1
+    weight_min = args.get('weight_min')
+    if weight_min:
+        try:
+            filters['weight_min'] = float(weight_min)
+        except ValueError:
+            pass
             
-            # Weight by waste type
-            weight_by_type[load.waste_type] = weight_by_type.get(load.waste_type, 0) + load.waste_weight
+    weight_max = args.get('weight_max')
+    if weight_max:
+        try:
+            filters['weight_max'] = float(weight_max)
+        except ValueError:
+            pass
             
-            # Weight by destination
-            weight_by_destination[load.destination] = weight_by_destination.get(load.destination, 0) + load.waste_weight
-        
-        return {
-            'waste_type_counts': waste_type_counts,
-            'material_category_counts': material_category_counts,
-            'destination_counts': destination_counts,
-            'weight_by_type': weight_by_type,
-            'weight_by_destination': weight_by_destination
-        }
-    except Exception as e:
-        logging.error(f"Error preparing chart data: {e}")
-        return {}
+    waste_type = args.get('waste_type')
+    if waste_type:
+        filters['waste_type'] = waste_type
+        
+    material_category = args.get('material_category')
+    if material_category:
+        filters['material_category'] = material_category
+        
+    destination = args.get('destination')
+    if destination:
+        filters['destination'] = destination
+        
+    panchayath = args.get('panchayath')
+    if panchayath:
+        filters['panchayath'] = panchayath
+    
+    return filters
+
+def prepare_chart_data(totals):
+    """Prepare data for charts from WasteLoad.get_grouped_totals() aggregates"""
+    return {
+        'waste_type_counts': {label: count for label, (count, _) in totals['waste_type'].items()},
+        'material_category_counts': {label: count for label, (count, _) in totals['material_category'].items()},
+        'destination_counts': {label: count for label, (count, _) in totals['destination'].items()},
+        'weight_by_type': {label: weight for label, (_, weight) in totals['waste_type'].items()},
+        'weight_by_destination': {label: weight for label, (_, weight) in totals['destination'].items()}
+    }
+
+def json_response(payload, status=200):
+    """Build a JSON response with orjson, which is several times faster than jsonify for large payloads"""
+    return Response(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), status=status,
+                    mimetype='application/json')
 
-def create_tables():
-    """Create database tables if they don't exist"""
+def generate_ndjson(rows, batch_size):
+    """Yield API_COLUMNS row tuples as newline-delimited JSON, one chunk per batch of rows"""
+    batch = []
+    for row in rows:
+        batch.append(orjson.dumps(WasteLoad.row_to_dict(row), option=orjson.OPT_APPEND_NEWLINE))
+        if len(batch) >= batch_size:
+            yield b''.join(batch)
+            batch = []
+    if batch:
+        yield b''.join(batch)
+
+def init_db():
+    """Create or upgrade the database schema and backfill derived data
+    
+    Safe to run repeatedly; run it once per deploy with `flask init-db` rather than
+    from every worker at startup.
+    """
+    migrate_dimension_columns()
+    migrate_tenant_columns()
+    sync_schema()
+    default_tenant_id = Tenant.get_id(Tenant.DEFAULT_SLUG)
+    DataVersion.ensure(default_tenant_id)
+    logging.info("Database tables created successfully")
+    
+    # Archives written before tenancy belong to the default tenant
+    if current_app.config['ARCHIVE_FOLDER'] and \
+            migrate_legacy_archive(current_app.config['ARCHIVE_FOLDER'], default_tenant_id):
+        logging.info("Moved the archive into the default tenant's folder")
+    
+    # Populate search columns added after rows were written, then index them
+    backfilled = WasteLoad.backfill_search_columns()
+    if backfilled:
+        logging.info(f"Backfilled search columns for {backfilled} waste loads")
+    ensure_search_index()
+    
+    # Backfill each tenant's rollup the first time it is deployed against existing data
+    previous = use_tenant(None)
     try:
-        with app.app_context():
-            db.create_all()
-            logging.info("Database tables created successfully")
-    except Exception as e:
-        logging.error(f"Error creating database tables: {e}")
+        for tenant in Tenant.get_all():
+            use_tenant(tenant.id)
+            if DailyWasteRollup.tenant_query(DailyWasteRollup.id).first() is None and \
+                    (WasteLoad.tenant_query(WasteLoad.id).first() is not None or get_archive()):
+                DailyWasteRollup.rebuild()
+                db.session.commit()
+                logging.info(f"Daily rollup of tenant {tenant.slug} backfilled from waste_loads")
+    finally:
+        use_tenant(previous)
+
+def cli_tenants(slug, default_to_all):
+    """Tenants a CLI command works on: the one named by --tenant, else every tenant or DEFAULT_TENANT"""
+    if slug is None and default_to_all:
+        return Tenant.get_all()
+    slug = slug or current_app.config['DEFAULT_TENANT'] or Tenant.DEFAULT_SLUG
+    tenant = Tenant.query.filter_by(slug=slug).first()
+    if tenant is None:
+        raise click.ClickException(f"No tenant {slug!r}; add it with `flask add-tenant {slug}`")
+    return [tenant]
+
+# --tenant option shared by the CLI commands that work on tenant data
+tenant_option = click.option('--tenant', 'tenant_slug', help='Tenant slug to work on.')
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the database schema"""
+    init_db()
+    click.echo('Database schema is up to date')
+
+@bp.cli.command('add-tenant')
+@click.argument('slug')
+def add_tenant_command(slug):
+    """Add a tenant, served at SLUG.<TENANT_DOMAIN> or with the tenant header set to SLUG"""
+    try:
+        tenant = Tenant.create(slug)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    db.session.commit()
+    DataVersion.ensure(tenant.id)
+    click.echo(f"Added tenant {tenant.slug} (id {tenant.id})")
+
+@bp.cli.command('rebuild-rollups')
+@tenant_option
+def rebuild_rollups_command(tenant_slug):
+    """Regenerate the daily rollup table from waste_loads (every tenant unless --tenant is given)"""
+    for tenant in cli_tenants(tenant_slug, default_to_all=True):
+        use_tenant(tenant.id)
+        DailyWasteRollup.rebuild()
+        # Cached pages and ETags were derived from the old totals
+        DataVersion.bump()
+        db.session.commit()
+        forget_data_version()
+        rollup_rows = DailyWasteRollup.tenant_query(func.count(DailyWasteRollup.id)).scalar()
+        click.echo(f"Rebuilt daily rollup of tenant {tenant.slug}: {rollup_rows} rows")
+
+# Representative report/API filter combinations checked by `flask explain-search`
+SEARCH_PLAN_MONTH = {'date_from': datetime(2025, 6, 1), 'date_to': datetime.combine(datetime(2025, 6, 30), time.max)}
+SEARCH_PLAN_CASES = {
+    'newest first': {},
+    'date range': SEARCH_PLAN_MONTH,
+    'waste type + date range': {'waste_type': 'Mixed', **SEARCH_PLAN_MONTH},
+    'material category + date range': {'material_category': 'Plastic', **SEARCH_PLAN_MONTH},
+    'destination + date range': {'destination': 'Recycler', **SEARCH_PLAN_MONTH},
+    'vehicle substring': {'vehicle_number': 'aa-000'},
+    'panchayath substring': {'panchayath': 'ullal'},
+}
+
+# A full pass over waste_loads, whether over the table or one of its indexes
+FULL_SCAN_PLAN = re.compile(r'Seq Scan on waste_loads\b|\bSCAN waste_loads\b')
+# waste_loads rows fetched by id from the trigram matches (SQLite FTS5 or PostgreSQL pg_trgm)
+TRIGRAM_PLAN = re.compile(r'\bSEARCH waste_loads USING INTEGER PRIMARY KEY\b|'
+                          r'Bitmap Index Scan on ix_waste_loads_\w+_trgm\b')
+
+def search_plan_ok(filters, plan):
+    """Check a WasteLoad.page_query() plan for filters: no full scans, and substring
+    searches driven by the trigram index rather than filtered row by row"""
+    if any(FULL_SCAN_PLAN.search(line) for line in plan):
+        return False
+    if filters.get('vehicle_number') or filters.get('panchayath'):
+        return any(TRIGRAM_PLAN.search(line) for line in plan)
+    return True
+
+@bp.cli.command('explain-search')
+@tenant_option
+def explain_search_command(tenant_slug):
+    """Check that common report/API filter combinations are answered from indexes
+    
+    Prints the query plan of each representative page query (for DEFAULT_TENANT unless
+    --tenant is given) and exits non-zero if any of them scans waste_loads, or answers a
+    substring search without looking the trigram matches up by id.
+    """
+    use_tenant(cli_tenants(tenant_slug, default_to_all=False)[0].id)
+    
+    failures = []
+    for name, filters in SEARCH_PLAN_CASES.items():
+        plan = explain(WasteLoad.page_query(filters))
+        ok = search_plan_ok(filters, plan)
+        click.echo(f"{'ok  ' if ok else 'SCAN'} {name}")
+        for line in plan:
+            click.echo(f"       {line}")
+        if not ok:
+            failures.append(name)
+    db.session.rollback()
+    
+    if failures:
+        raise click.ClickException(f"Plans not driven by an index for: {', '.join(failures)}")
+
+@bp.cli.command('import-csv')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows parsed and inserted per transaction.')
+@click.option('--restart', is_flag=True, help='Ignore saved progress and import the file from the top.')
+@tenant_option
+def import_csv_command(paths, chunk_size, restart, tenant_slug):
+    """Bulk-import weighbridge CSV logs in the waste_logs.csv layout (resumable) into DEFAULT_TENANT or --tenant"""
+    use_tenant(cli_tenants(tenant_slug, default_to_all=False)[0].id)
+    try:
+        for path in paths:
+            import_csv(path, chunk_size=chunk_size, restart=restart, report=click.echo, detector=anomaly_detector)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        forget_data_version()
+
+@bp.cli.command('archive-loads')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Archive loads dated before this day (default: ARCHIVE_AFTER_DAYS days ago).')
+@tenant_option
+def archive_loads_command(before, tenant_slug):
+    """Move old waste loads out of the live table into the compressed archive (every tenant unless --tenant is given)"""
+    if before is None:
+        before = datetime.combine(datetime.now().date(), time.min) - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+    for tenant in cli_tenants(tenant_slug, default_to_all=True):
+        use_tenant(tenant.id)
+        archive = Archive(tenant_folder(current_app.config['ARCHIVE_FOLDER'], tenant.id))
+        moved = WasteLoad.move_to_archive(archive, before, report=click.echo)
+        click.echo(f"Archived {moved} waste loads of tenant {tenant.slug} dated before {before:%Y-%m-%d}")
+
+@bp.cli.command('run-jobs')
+@click.option('--workers', default=1, show_default=True, help='Worker processes to run.')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty instead of polling for new jobs.')
+def run_jobs_command(workers, once):
+    """Run queued background exports and reports"""
+    if workers == 1:
+        run_job_worker(once)
+        return
+    
+    # Fresh interpreters, so no worker inherits another's database connections
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_job_worker, args=(once,)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+def run_job_worker(once=False):
+    """Claim and run jobs from the jobs table in this process"""
+    # Spawned worker processes start without an application, so build their own
+    app = current_app._get_current_object() if has_app_context() else create_app()
+    with app.app_context():
+        work(parse_filters, app.config['JOB_OUTPUT_FOLDER'],
+             batch_size=app.config['EXPORT_BATCH_SIZE'],
+             stale_after=app.config['JOB_STALE_AFTER'],
+             retention_days=app.config['JOB_RETENTION_DAYS'],
+             once=once)
+
+def queue_job(kind, args):
+    """Queue a background job for the filter arguments in args"""
+    params = {key: str(args[key]) for key in FILTER_ARGS if args.get(key)}
+    job = Job(tenant_id=current_tenant_id(), kind=kind, params=params)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def job_to_dict(job):
+    """Job status for the API, with a download link once the output is ready"""
+    data = job.to_dict()
+    data['download_url'] = url_for('main.download_job', job_id=job.id) if job.status == 'done' else None
+    return data
 
 def save_waste_load(data):
-    """Save waste load data to database"""
+    """Save waste load data to database
+    
+    Returns the anomaly flags raised for the load (usually an empty list), or None
+    if it could not be saved. Flagged loads are still saved.
+    """
     try:
-        # Parse datetime string
-        datetime_obj = datetime.strptime(data['datetime'], '%Y-%m-%dT%H:%M')
-        
-        waste_load = WasteLoad()
-        waste_load.vehicle_number = data['vehicle_number']
-        waste_load.datetime = datetime_obj
-        waste_load.waste_weight = float(data['waste_weight'])
-        waste_load.waste_type = data['waste_type']
-        waste_load.material_category = data['material_category']
-        waste_load.destination = data['destination']
-        waste_load.panchayath = data.get('panchayath', '')
+        values = WasteLoad.parse_values(data)
+        flags = anomaly_detector.check([values])[0]
+        
+        dimension_cache.ensure([values])
         
+        # The rollup and any flags are written in the same transaction as the load
+        waste_load = WasteLoad(**values)
         db.session.add(waste_load)
+        if flags:
+            db.session.flush()
+            LoadFlag.add_for(waste_load.id, values, flags)
+        DailyWasteRollup.add_loads([values])
+        DataVersion.bump()
         db.session.commit()
-        return True
+        forget_data_version()
+        anomaly_detector.record([values])
+        return flags
     except Exception as e:
         logging.error(f"Error saving to database: {e}")
         db.session.rollback()
-        return False
+        return None
+
+def save_waste_load_batch(records):
+    """Validate and insert a batch of waste loads idempotently, keyed by client_uuid
+    
+    Valid new records are written with one multi-row insert and a single commit;
+    records whose client_uuid is already stored are reported as duplicates.
+    Returns one result dict per record, in request order; created records carry
+    the anomaly flags raised for them.
+    """
+    results = []
+    pending = {}
+    
+    for index, data in enumerate(records):
+        result = {'index': index, 'client_uuid': None}
+        results.append(result)
+        try:
+            try:
+                client_uuid = str(uuid.UUID(str(data.get('client_uuid'))))
+            except (AttributeError, ValueError):
+                raise ValueError("client_uuid must be a valid UUID")
+            result['client_uuid'] = client_uuid
+            values = WasteLoad.parse_values(data)
+        except ValueError as e:
+            result.update(status='invalid', error=str(e))
+            continue
+        
+        if client_uuid in pending:
+            result['status'] = 'duplicate'
+        else:
+            pending[client_uuid] = dict(values, client_uuid=client_uuid)
+    
+    for attempt in range(2):
+        existing = WasteLoad.get_existing_client_uuids(pending.keys())
+        new_values = [values for client_uuid, values in pending.items() if client_uuid not in existing]
+        flags = {values['client_uuid']: load_flags
+                 for values, load_flags in zip(new_values, anomaly_detector.check(new_values)) if load_flags}
+        try:
+            if new_values:
+                dimension_cache.ensure(new_values)
+                db.session.execute(db.insert(WasteLoad.__table__), new_values)
+                # Only flagged loads need their new ids looked up
+                load_ids = WasteLoad.get_ids_by_client_uuid(flags.keys())
+                for client_uuid, load_flags in flags.items():
+                    LoadFlag.add_for(load_ids[client_uuid], pending[client_uuid], load_flags)
+                DailyWasteRollup.add_loads(new_values)
+                DataVersion.bump()
+            db.session.commit()
+            if new_values:
+                forget_data_version()
+                anomaly_detector.record(new_values)
+            break
+        except IntegrityError:
+            # A concurrent retry of the same records committed first; re-check and retry once
+            db.session.rollback()
+            if attempt:
+                raise
+    
+    for result in results:
+        if 'status' not in result:
+            if result['client_uuid'] in existing:
+                result['status'] = 'duplicate'
+            else:
+                result['status'] = 'created'
+                result['flags'] = [{'kind': kind, 'detail': detail} for kind, detail, _ in flags.get(result['client_uuid'], ())]
+    
+    return results
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Main page with waste logging form"""
-    organization = Organization.get_current()
+    organization = get_organization()
     return render_template('index.html', organization=organization)
 
-@app.route('/organization')
+@bp.route('/organization')
 def organization_info():
     """Organization setup page"""
-    organization = Organization.get_current()
+    organization = get_organization()
     return render_template('organization.html', organization=organization)
 
-@app.route('/organization', methods=['POST'])
+@bp.route('/organization', methods=['POST'])
 def save_organization():
     """Save organization information"""
     try:
@@ -127,20 +616,20 @@ def save_organization():
         
         if not name:
             flash('Organization name is required.', 'error')
-            return redirect(url_for('organization_info'))
+            return redirect(url_for('main.organization_info'))
         
         # Handle logo upload
         logo_filename = None
         if 'logo' in request.files:
             file = request.files['logo']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                # Add timestamp to avoid filename conflicts
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-                filename = timestamp + filename
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
-                logo_filename = filename
+                # Resized renditions under a content-hash name, so their URLs never go stale
+                try:
+                    logo_filename = store_logo(file.stream, current_app.config['UPLOAD_FOLDER'])
+                except ValueError as e:
+                    logging.warning(f"Rejected logo upload {file.filename!r}: {e}")
+                    flash('The logo could not be read as an image. Please upload a PNG, JPG or GIF file.', 'error')
+                    return redirect(url_for('main.organization_info'))
         
         # Get or create organization record
         organization = Organization.get_current()
@@ -148,20 +637,21 @@ def save_organization():
             organization.name = name
             organization.description = description
             if logo_filename:
-                # Delete old logo file if exists
-                if organization.logo_filename:
-                    old_file_path = os.path.join(app.config['UPLOAD_FOLDER'], organization.logo_filename)
-                    if os.path.exists(old_file_path):
-                        os.remove(old_file_path)
+                old_logo_filename = organization.logo_filename
                 organization.logo_filename = logo_filename
+                # Delete the old logo unless it is shown again, here or by another tenant
+                if old_logo_filename and not Organization.logo_in_use(old_logo_filename):
+                    remove_logo(current_app.config['UPLOAD_FOLDER'], old_logo_filename)
         else:
-            organization = Organization()
+            organization = Organization(tenant_id=current_tenant_id())
             organization.name = name
             organization.description = description
             organization.logo_filename = logo_filename
             db.session.add(organization)
         
+        DataVersion.bump()
         db.session.commit()
+        forget_data_version()
         flash('Organization information saved successfully!', 'success')
         
     except Exception as e:
@@ -169,14 +659,26 @@ def save_organization():
         db.session.rollback()
         flash('Error saving organization information. Please try again.', 'error')
     
-    return redirect(url_for('organization_info'))
+    return redirect(url_for('main.organization_info'))
 
-@app.route('/uploads/<filename>')
+@bp.route('/uploads/<filename>')
 def uploaded_file(filename):
-    """Serve uploaded files"""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """Serve uploaded files; logo renditions have content-hash names and are cached for good"""
+    if LOGO_VARIANT_PATTERN.fullmatch(filename):
+        return send_immutable(current_app.config['UPLOAD_FOLDER'], filename)
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+
+@bp.app_template_global()
+def logo_url(logo_filename, size='medium'):
+    """URL of one LOGO_SIZES rendition of an organization logo
+    
+    Logos uploaded before renditions existed are served as originally stored.
+    """
+    if is_logo_key(logo_filename):
+        return url_for('main.uploaded_file', filename=logo_variant_filename(logo_filename, size))
+    return url_for('main.uploaded_file', filename=logo_filename)
 
-@app.route('/submit', methods=['POST'])
+@bp.route('/submit', methods=['POST'])
 def submit_waste_log():
     """Handle form submission for waste logging"""
     try:
@@ -192,7 +694,7 @@ def submit_waste_log():
         # Validate required fields
         if not all([vehicle_number, datetime_str, waste_weight, waste_type, material_category, destination]):
             flash('All fields are required. Please fill in all information.', 'error')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         
         # Validate weight is a positive number
         try:
@@ -201,7 +703,7 @@ def submit_waste_log():
                 raise ValueError("Weight must be positive")
         except ValueError:
             flash('Waste weight must be a valid positive number.', 'error')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         
         # Prepare data for CSV
         waste_data = {
@@ -215,9 +717,12 @@ def submit_waste_log():
         }
         
         # Save to database
-        if save_waste_load(waste_data):
+        flags = save_waste_load(waste_data)
+        if flags is not None:
             flash('Waste load logged successfully!', 'success')
             logging.info(f"Waste load logged: Vehicle {vehicle_number}")
+            for kind, detail, _ in flags:
+                flash(f'Please check this load: {detail}.', 'warning')
         else:
             flash('Error saving waste load. Please try again.', 'error')
             
@@ -225,72 +730,39 @@ def submit_waste_log():
         logging.error(f"Error processing form submission: {e}")
         flash('An unexpected error occurred. Please try again.', 'error')
     
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/report')
+@bp.route('/report')
+@reads_from_replica
+@conditional_on_data_version
 def report():
     """Display all logged waste entries with optional filtering"""
     try:
-        organization = Organization.get_current()
+        organization = get_organization()
         
-        # Get filter parameters
-        filters = {}
+        filters = parse_filters(request.args)
         
-        vehicle_number = request.args.get('vehicle_number')
-        if vehicle_number:
-            filters['vehicle_number'] = vehicle_number
-            
-        date_from = request.args.get('date_from')
-        if date_from:
-            try:
-                filters['date_from'] = datetime.strptime(date_from, '%Y-%m-%d')
-            except ValueError:
-                pass
-                
-        date_to = request.args.get('date_to')
-        if date_to:
-            try:
-                filters['date_to'] = datetime.strptime(date_to, '%Y-%m-%d')
-            except ValueError:
-                pass
-                
-        weight_min = request.args.get('weight_min')
-        if weight_min:
-            try:
-                filters['weight_min'] = float(weight_min)
-            except ValueError:
-                pass
-                
-        weight_max = request.args.get('weight_max')
-        if weight_max:
-            try:
-                filters['weight_max'] = float(weight_max)
-            except ValueError:
-                pass
-                
-        waste_type = request.args.get('waste_type')
-        if waste_type:
-            filters['waste_type'] = waste_type
-            
-        material_category = request.args.get('material_category')
-        if material_category:
-            filters['material_category'] = material_category
-            
-        destination = request.args.get('destination')
-        if destination:
-            filters['destination'] = destination
-            
-        panchayath = request.args.get('panchayath')
-        if panchayath:
-            filters['panchayath'] = panchayath
+        # Get one page of filtered or all data
+        page_size = current_app.config['REPORT_PAGE_SIZE']
+        cursor = request.args.get('cursor')
+        try:
+            waste_loads, next_cursor = WasteLoad.get_page(filters, cursor, page_size)
+        except ValueError:
+            cursor = None
+            waste_loads, next_cursor = WasteLoad.get_page(filters, None, page_size)
         
-        # Get filtered or all data
-        if filters:
-            waste_loads = WasteLoad.search_and_filter(filters)
-        else:
-            waste_loads = WasteLoad.get_all_ordered()
+        # Pagination links keep the current filters
+        page_args = {key: value for key, value in request.args.items() if key != 'cursor'}
+        export_url = url_for('main.export_csv', **page_args)
+        pagination = {
+            'next_url': url_for('main.report', cursor=next_cursor, **page_args) if next_cursor else None,
+            'first_url': url_for('main.report', **page_args) if cursor else None
+        }
         
-        stats = WasteLoad.get_summary_stats()
+        # Chart data covers the full filtered set, not just this page; without filters
+        # the same totals also give the summary, saving a second pass over the rollup
+        grouped_totals = WasteLoad.get_grouped_totals(filters)
+        stats = WasteLoad.get_summary_stats(None if filters else grouped_totals)
         
         # Convert to format expected by template
         waste_logs = []
@@ -305,17 +777,10 @@ def report():
                 'Panchayath': load.panchayath or ''
             })
         
-        # Prepare chart data
-        chart_data = prepare_chart_data(waste_loads)
+        chart_data = prepare_chart_data(grouped_totals)
         
         # Get unique values for filter dropdowns
-        all_loads = WasteLoad.get_all_ordered()
-        filter_options = {
-            'waste_types': list(set([load.waste_type for load in all_loads])),
-            'material_categories': list(set([load.material_category for load in all_loads])),
-            'destinations': list(set([load.destination for load in all_loads])),
-            'panchayaths': list(set([load.panchayath for load in all_loads if load.panchayath]))
-        }
+        filter_options = get_filter_options()
             
         return render_template('report.html', 
                              waste_logs=waste_logs, 
@@ -323,6 +788,8 @@ def report():
                              organization=organization,
                              chart_data=chart_data,
                              filter_options=filter_options,
+                             pagination=pagination,
+                             export_url=export_url,
                              current_filters=request.args)
         
     except Exception as e:
@@ -331,29 +798,99 @@ def report():
         return render_template('report.html', 
                              waste_logs=[], 
                              stats={}, 
-                             organization=Organization.get_current(),
+                             organization=get_organization(),
                              chart_data={},
                              filter_options={},
+                             pagination={},
+                             export_url=url_for('main.export_csv'),
                              current_filters={})
 
-@app.route('/api/waste-loads', methods=['GET'])
+@bp.route('/api/waste-loads', methods=['GET'])
+@reads_from_replica
+@conditional_on_data_version
 def api_get_waste_loads():
-    """API endpoint to get all waste loads"""
+    """API endpoint to get one page of waste loads, newest first
+    
+    Accepts the same filter parameters as /report plus `limit` and `cursor`.
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page.
+    With `Accept: application/x-ndjson` or `format=ndjson` every matching load (after
+    `cursor`, up to `limit` if given) is streamed instead, one JSON object per line.
+    """
     try:
-        waste_loads = WasteLoad.get_all_ordered()
-        return jsonify([load.to_dict() for load in waste_loads])
+        filters = parse_filters(request.args)
+        cursor = request.args.get('cursor')
+        
+        if request.args.get('format') == 'ndjson' or \
+                request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+            batch_size = current_app.config['EXPORT_BATCH_SIZE']
+            limit = request.args.get('limit', type=int)
+            try:
+                rows = WasteLoad.iter_rows(WasteLoad.API_COLUMNS, filters, batch_size, cursor, limit)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            body = generate_ndjson(rows, batch_size)
+            headers = {'Vary': 'Accept, Accept-Encoding'}
+            if 'gzip' in request.accept_encodings:
+                body = gzip_stream(body)
+                headers['Content-Encoding'] = 'gzip'
+            return Response(stream_with_context(body), mimetype=NDJSON_MIMETYPE, headers=headers)
+        
+        limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+        try:
+            rows, next_cursor = WasteLoad.get_page(filters, cursor, limit, WasteLoad.API_COLUMNS)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        response = json_response({
+            'waste_loads': [WasteLoad.row_to_dict(row) for row in rows],
+            'next_cursor': next_cursor
+        })
+        response.vary.add('Accept')
+        return response
     except Exception as e:
         logging.error(f"Error fetching waste loads: {e}")
         return jsonify({'error': 'Failed to fetch waste loads'}), 500
 
-@app.route('/api/waste-loads', methods=['POST'])
+@bp.route('/api/trends')
+@reads_from_replica
+@conditional_on_data_version
+def api_trends():
+    """API endpoint for load and tonnage trends per day, week, month or year
+    
+    Accepts the same filter parameters as /report plus `granularity` (day, week,
+    month or year), `group_by` (waste_type, material_category, destination,
+    panchayath or vehicle_number) and `top`, the number of groups to return before the rest are
+    combined. Each series carries per-period loads, weight, deltas against the
+    previous period and 7/30-day moving averages of daily weight.
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    group_by = request.args.get('group_by') or None
+    if group_by and group_by not in WasteLoad.TREND_GROUPS:
+        return jsonify({'error': f"group_by must be one of {', '.join(WasteLoad.TREND_GROUPS)}"}), 400
+    top = request.args.get('top', 10, type=int)
+    if top < 1:
+        return jsonify({'error': 'top must be at least 1'}), 400
+    
+    try:
+        filters = parse_filters(request.args)
+        rows = WasteLoad.get_daily_totals(filters, group_by)
+        trends = build_trends(rows, granularity, filters.get('date_from'), filters.get('date_to'), top)
+        return json_response({'granularity': granularity, 'group_by': group_by, **trends})
+    except Exception as e:
+        logging.error(f"Error computing trends: {e}")
+        return jsonify({'error': 'Failed to compute trends'}), 500
+
+@bp.route('/api/waste-loads', methods=['POST'])
 def api_create_waste_load():
     """API endpoint to create a new waste load"""
     try:
         data = request.get_json()
         
-        if save_waste_load(data):
-            return jsonify({'success': True, 'message': 'Waste load saved successfully'})
+        flags = save_waste_load(data)
+        if flags is not None:
+            return jsonify({'success': True, 'message': 'Waste load saved successfully',
+                            'flags': [{'kind': kind, 'detail': detail} for kind, detail, _ in flags]})
         else:
             return jsonify({'error': 'Failed to save waste load'}), 500
             
@@ -361,50 +898,271 @@ def api_create_waste_load():
         logging.error(f"Error creating waste load via API: {e}")
         return jsonify({'error': 'Invalid request data'}), 400
 
-@app.route('/export/csv')
+@bp.route('/api/anomalies')
+@reads_from_replica
+@conditional_on_data_version
+def api_anomalies():
+    """API endpoint to list loads flagged at ingest, newest first
+    
+    Accepts `kind` (duplicate, magnitude or outlier), `vehicle_number`, `limit` and
+    `cursor`; pass the returned `next_cursor` back as `cursor` for the next page.
+    """
+    kind = request.args.get('kind') or None
+    if kind and kind not in LoadFlag.KINDS:
+        return jsonify({'error': f"kind must be one of {', '.join(LoadFlag.KINDS)}"}), 400
+    cursor = request.args.get('cursor') or None
+    if cursor and not cursor.isdigit():
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    try:
+        flags, next_id = LoadFlag.get_page(kind, request.args.get('vehicle_number', '').strip() or None,
+                                           int(cursor) if cursor else None,
+                                           request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int))
+        return json_response({
+            'anomalies': [flag.to_dict() for flag in flags],
+            'next_cursor': str(next_id) if next_id else None
+        })
+    except Exception as e:
+        logging.error(f"Error fetching anomalies: {e}")
+        return jsonify({'error': 'Failed to fetch anomalies'}), 500
+
+@bp.route('/api/waste-loads/batch', methods=['POST'])
+def api_sync_waste_loads():
+    """API endpoint to sync a batch of offline waste loads
+    
+    Accepts {"waste_loads": [...]} where every record carries a client-generated
+    client_uuid, so retrying a batch never creates duplicate loads.
+    """
+    try:
+        data = request.get_json()
+        records = data.get('waste_loads') if isinstance(data, dict) else data
+        if not isinstance(records, list):
+            return jsonify({'error': 'Expected a list of waste loads'}), 400
+    except Exception as e:
+        logging.error(f"Error reading waste load batch: {e}")
+        return jsonify({'error': 'Invalid request data'}), 400
+    
+    if len(records) > current_app.config['SYNC_BATCH_LIMIT']:
+        return jsonify({'error': f"At most {current_app.config['SYNC_BATCH_LIMIT']} waste loads per batch"}), 413
+    
+    try:
+        results = save_waste_load_batch(records)
+    except Exception as e:
+        logging.error(f"Error syncing waste load batch: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to save waste loads'}), 500
+    
+    statuses = [result['status'] for result in results]
+    return jsonify({
+        'results': results,
+        'created': statuses.count('created'),
+        'duplicates': statuses.count('duplicate'),
+        'invalid': statuses.count('invalid')
+    })
+
+@bp.route('/export/csv')
+@bp.route('/export/csv.gz', endpoint='export_csv_gz')
+@reads_from_replica
+@conditional_on_data_version
 def export_csv():
-    """Export waste loads as CSV"""
+    """Stream waste loads as CSV, honouring the same filters as /report
+    
+    /export/csv.gz downloads a gzip file; /export/csv is gzip-encoded on the wire
+    when the client sends Accept-Encoding: gzip.
+    """
     try:
-        import csv
-        import io
-        from flask import make_response
+        filters = parse_filters(request.args)
+        rows = WasteLoad.iter_rows(EXPORT_COLUMNS, filters, current_app.config['EXPORT_BATCH_SIZE'])
+        body = generate_csv(rows)
         
-        waste_loads = WasteLoad.get_all_ordered()
+        filename = f'waste_loads_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        headers = {'Vary': 'Accept-Encoding'}
         
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Vehicle Number', 'Date & Time', 'Waste Weight (kg)', 
-                        'Waste Type', 'Material Category', 'Destination', 'Created At'])
-        
-        # Write data
-        for load in waste_loads:
-            writer.writerow([
-                load.vehicle_number,
-                load.datetime.strftime('%Y-%m-%d %H:%M'),
-                load.waste_weight,
-                load.waste_type,
-                load.material_category,
-                load.destination,
-                load.created_at.strftime('%Y-%m-%d %H:%M') if load.created_at else ''
-            ])
-        
-        output.seek(0)
-        
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename=waste_loads_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        if request.endpoint == 'main.export_csv_gz':
+            body = gzip_stream(body)
+            mimetype = 'application/gzip'
+            filename += '.gz'
+        else:
+            mimetype = 'text/csv'
+            if 'gzip' in request.accept_encodings:
+                body = gzip_stream(body)
+                headers['Content-Encoding'] = 'gzip'
         
-        return response
+        headers['Content-Disposition'] = f'attachment; filename={filename}'
+        return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
         
     except Exception as e:
         logging.error(f"Error exporting CSV: {e}")
         flash('Error exporting data.', 'error')
-        return redirect(url_for('report'))
+        return redirect(url_for('main.report'))
+
+@bp.route('/jobs')
+def jobs():
+    """List recent background exports and reports"""
+    return render_template('jobs.html', jobs=Job.get_recent(), organization=get_organization())
+
+@bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a background export or report for the report page's current filters"""
+    kind = request.form.get('kind')
+    if kind not in JOB_KINDS:
+        flash('Unknown export type.', 'error')
+        return redirect(url_for('main.report'))
+    
+    try:
+        queue_job(kind, request.form)
+        flash('Export queued. It will be ready to download here when it finishes.', 'success')
+    except Exception as e:
+        logging.error(f"Error queueing job: {e}")
+        db.session.rollback()
+        flash('Error queueing export.', 'error')
+        return redirect(url_for('main.report'))
+    
+    return redirect(url_for('main.jobs'))
+
+@bp.route('/jobs/<job_id>/download')
+def download_job(job_id):
+    """Download the output of a finished job"""
+    job = Job.get_for_tenant(job_id)
+    if job is None or job.status != 'done':
+        abort(404)
+    return send_from_directory(current_app.config['JOB_OUTPUT_FOLDER'], job.filename,
+                               as_attachment=True, download_name=job.download_name)
+
+@bp.route('/api/jobs', methods=['POST'])
+def api_create_job():
+    """API endpoint to queue a background job
+    
+    Accepts {"kind": "csv" | "csv.gz" | "xlsx" | "summary", "filters": {...}} with the
+    same filter names as /report, and answers 202 with the job's status URL.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or data.get('kind') not in JOB_KINDS:
+        return jsonify({'error': f"kind must be one of {', '.join(JOB_KINDS)}"}), 400
+    filters = data.get('filters') or {}
+    if not isinstance(filters, dict):
+        return jsonify({'error': 'filters must be an object'}), 400
+    
+    try:
+        job = queue_job(data['kind'], filters)
+    except Exception as e:
+        logging.error(f"Error queueing job: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to queue job'}), 500
+    
+    return jsonify(job_to_dict(job)), 202, {'Location': url_for('main.api_get_job', job_id=job.id)}
 
-# Initialize database on startup
-create_tables()
+@bp.route('/api/jobs/<job_id>')
+def api_get_job(job_id):
+    """API endpoint to get a background job's status and progress"""
+    job = Job.get_for_tenant(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_to_dict(job))
+
+@bp.route('/metrics')
+def metrics():
+    """Route latency and SQL metrics for this worker in the Prometheus text format"""
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def create_app(config=None):
+    """Create and configure the Flask application
+    
+    Building the app neither connects to the database nor touches the filesystem, so
+    it is cheap enough for every worker (and safe under gunicorn --preload). Prepare
+    the schema separately with `flask init-db`.
+    """
+    # Configure logging; LOG_LEVEL=DEBUG is verbose and slows down busy workers
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+    
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    
+    # Configure the PostgreSQL database
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options('DATABASE')
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    
+    # Optional read replica for dashboards and exports; writes always go to DATABASE_URL.
+    # Clients that just wrote keep reading from the primary for READ_YOUR_WRITES_SECONDS.
+    if os.environ.get('DATABASE_READ_URL'):
+        app.config['SQLALCHEMY_BINDS'] = {
+            READ_REPLICA: {'url': os.environ['DATABASE_READ_URL'], **engine_options('DATABASE_READ')}
+        }
+    app.config['READ_YOUR_WRITES_SECONDS'] = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 10))
+    
+    # Tenancy: each request's tenant comes from its subdomain of TENANT_DOMAIN
+    # (kannur.example.org), else DEFAULT_TENANT; set DEFAULT_TENANT empty to answer requests
+    # that name no tenant with 404. TENANT_HEADER (off by default) names a header that
+    # overrides both; only set it behind a proxy that strips the header from clients
+    app.config['TENANT_HEADER'] = os.environ.get('TENANT_HEADER', '')
+    app.config['TENANT_DOMAIN'] = os.environ.get('TENANT_DOMAIN', '').lower()
+    app.config['DEFAULT_TENANT'] = os.environ.get('DEFAULT_TENANT', Tenant.DEFAULT_SLUG)
+    
+    # Configure file uploads; the folder is created on the first upload
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    
+    # Page sizes for keyset-paginated listings
+    app.config['REPORT_PAGE_SIZE'] = int(os.environ.get('REPORT_PAGE_SIZE', 50))
+    app.config['API_PAGE_SIZE'] = int(os.environ.get('API_PAGE_SIZE', 100))
+    
+    # Rows fetched per database round trip while streaming exports
+    app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+    
+    # Lifetime of cached page metadata (organization, filter dropdown options)
+    app.config['METADATA_CACHE_TTL'] = int(os.environ.get('METADATA_CACHE_TTL', 300))
+    
+    # Server-side cache of rendered read-only responses, keyed by data version
+    app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 600))
+    app.config['RESPONSE_CACHE_SIZE'] = int(os.environ.get('RESPONSE_CACHE_SIZE', 256))
+    
+    # Maximum number of records accepted by one batch sync request
+    app.config['SYNC_BATCH_LIMIT'] = int(os.environ.get('SYNC_BATCH_LIMIT', 500))
+    
+    # Background jobs: where output is written, how long finished jobs are kept, and how long
+    # a running job may go without a heartbeat before it is handed to another worker
+    app.config['JOB_OUTPUT_FOLDER'] = os.environ.get('JOB_OUTPUT_FOLDER', os.path.join(app.root_path, 'job_output'))
+    app.config['JOB_RETENTION_DAYS'] = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+    app.config['JOB_STALE_AFTER'] = int(os.environ.get('JOB_STALE_AFTER', 600))
+    
+    # Cold storage: loads older than ARCHIVE_AFTER_DAYS move to compressed monthly files in
+    # ARCHIVE_FOLDER with `flask archive-loads`; each worker keeps up to ARCHIVE_CACHE_MB of
+    # decompressed months in memory
+    app.config['ARCHIVE_FOLDER'] = os.environ.get('ARCHIVE_FOLDER', os.path.join(app.root_path, 'archive'))
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    app.config['ARCHIVE_CACHE_MB'] = int(os.environ.get('ARCHIVE_CACHE_MB', 256))
+    
+    # Anomaly checks at ingest: rolling weight state is kept for up to ANOMALY_VEHICLE_CAPACITY
+    # vehicles per worker; loads within ANOMALY_DUPLICATE_MINUTES of an earlier load by the
+    # same vehicle are compared with it, and weights ANOMALY_OUTLIER_SIGMAS from a vehicle's
+    # rolling average (on a log scale) are flagged as outliers
+    app.config['ANOMALY_VEHICLE_CAPACITY'] = int(os.environ.get('ANOMALY_VEHICLE_CAPACITY', 10000))
+    app.config['ANOMALY_DUPLICATE_MINUTES'] = int(os.environ.get('ANOMALY_DUPLICATE_MINUTES', 10))
+    app.config['ANOMALY_OUTLIER_SIGMAS'] = float(os.environ.get('ANOMALY_OUTLIER_SIGMAS', 4.0))
+    
+    # Request latency and SQL metrics, served at /metrics; SLOW_QUERY_MS enables the slow query log
+    app.config['SLOW_QUERY_MS'] = os.environ.get('SLOW_QUERY_MS')
+    
+    if config:
+        app.config.update(config)
+    
+    # Engines are created here but connect lazily, on the first query
+    db.init_app(app)
+    metadata_cache.ttl = app.config['METADATA_CACHE_TTL']
+    response_cache.ttl = app.config['RESPONSE_CACHE_TTL']
+    response_cache.max_entries = app.config['RESPONSE_CACHE_SIZE']
+    anomaly_detector.capacity = app.config['ANOMALY_VEHICLE_CAPACITY']
+    anomaly_detector.duplicate_minutes = app.config['ANOMALY_DUPLICATE_MINUTES']
+    anomaly_detector.outlier_sigmas = app.config['ANOMALY_OUTLIER_SIGMAS']
+    request_metrics.init_app(app)
+    static_assets.init_app(app)
+    app.register_blueprint(bp)
+    return app
 
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        init_db()
     app.run(host='0.0.0.0', port=5000, debug=True)
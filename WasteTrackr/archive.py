@@ -0,0 +1,395 @@
+import os
+import re
+import json
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+from functools import lru_cache
+import numpy as np
+from trends import EPOCH_ORDINAL
+
+# Columns kept for every archived load, in WasteLoad.API_COLUMNS order
+ARCHIVE_COLUMNS = ('id', 'vehicle_number', 'datetime', 'waste_weight', 'waste_type', 'material_category',
+                   'destination', 'panchayath', 'client_uuid', 'created_at')
+
+# String columns stored as integer codes into a per-partition label array; code -1 is NULL
+ENCODED_COLUMNS = ('vehicle_number', 'waste_type', 'material_category', 'destination', 'panchayath')
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+@lru_cache(maxsize=32)
+def row_type(columns):
+    """Named tuple type for rows of the given columns, so rows work like query result rows"""
+    return namedtuple('ArchivedLoad', columns)
+
+def tenant_folder(folder, tenant_id):
+    """Archive folder of one tenant under the ARCHIVE_FOLDER root"""
+    return os.path.join(folder, f'tenant-{tenant_id}')
+
+def migrate_legacy_archive(folder, tenant_id):
+    """Move an archive written before tenancy (manifest at the root of folder) into tenant_id's folder
+    
+    Partitions are moved before the manifest that points at them, so an interrupted
+    move is finished by calling this again. Returns True if an archive was moved.
+    """
+    manifest_path = os.path.join(folder, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return False
+    target = tenant_folder(folder, tenant_id)
+    os.makedirs(target, exist_ok=True)
+    for name in os.listdir(folder):
+        if re.fullmatch(r'\d{4}', name):
+            os.replace(os.path.join(folder, name), os.path.join(target, name))
+    os.replace(manifest_path, os.path.join(target, MANIFEST_NAME))
+    return True
+
+def month_key(value):
+    """Partition key ('YYYY-MM') of a datetime"""
+    return f"{value.year:04d}-{value.month:02d}"
+
+def _encode(values):
+    """Dictionary-encode a list of strings (or None) into (codes, labels)"""
+    labels = sorted({value for value in values if value is not None})
+    index = {label: code for code, label in enumerate(labels)}
+    codes = np.array([index[value] if value is not None else -1 for value in values], dtype=np.int32)
+    return codes, np.array(labels, dtype=str)
+
+def _to_datetime64(values):
+    """Convert a list of datetimes (or None) to a datetime64[us] array with NaT for None"""
+    return np.array([value if value is not None else 'NaT' for value in values], dtype='datetime64[us]')
+
+class Partition:
+    """One month of archived loads held as NumPy column arrays, sorted by (datetime, id)"""
+    
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.rows = len(arrays['id'])
+        self.nbytes = sum(array.nbytes for array in arrays.values())
+        # Labels as Python lists with None appended, so code -1 decodes to NULL
+        self._labels = {name: arrays[f'{name}_labels'].tolist() + [None] for name in ENCODED_COLUMNS}
+    
+    @classmethod
+    def read(cls, path):
+        """Load and decompress every column of a partition file"""
+        with np.load(path, allow_pickle=False) as npz:
+            return cls({name: npz[name] for name in npz.files})
+    
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a partition from ARCHIVE_COLUMNS row tuples, plus each row's vehicle_search value"""
+        values = dict(zip(ARCHIVE_COLUMNS + ('vehicle_search',), zip(*rows)))
+        arrays = {
+            'id': np.array(values['id'], dtype=np.int64),
+            'datetime': _to_datetime64(values['datetime']),
+            'waste_weight': np.array(values['waste_weight'], dtype=np.float64),
+            'client_uuid': np.array([value or '' for value in values['client_uuid']], dtype='S36'),
+            'created_at': _to_datetime64(values['created_at'])
+        }
+        for name in ENCODED_COLUMNS:
+            arrays[f'{name}_codes'], arrays[f'{name}_labels'] = _encode(list(values[name]))
+        # Search form of each vehicle label, aligned with vehicle_number_labels
+        search = dict(zip(values['vehicle_number'], values['vehicle_search']))
+        arrays['vehicle_search_labels'] = np.array([search[label] or '' for label in
+                                                    arrays['vehicle_number_labels'].tolist()], dtype=str)
+        return cls(arrays).sorted()
+    
+    def sorted(self):
+        """This partition with rows ordered by (datetime, id)"""
+        order = np.lexsort((self.arrays['id'], self.arrays['datetime']))
+        return self.take(order)
+    
+    def take(self, index):
+        """A partition holding the rows at index, sharing the label arrays"""
+        return Partition({name: array if name.endswith('_labels') else array[index]
+                          for name, array in self.arrays.items()})
+    
+    def merge(self, other):
+        """Combine with another partition; rows of other replace rows with the same id"""
+        keep = np.flatnonzero(~np.isin(self.arrays['id'], other.arrays['id']))
+        return Partition.from_rows(self.to_rows(keep) + other.to_rows(np.arange(other.rows)))
+    
+    def to_rows(self, index):
+        """ARCHIVE_COLUMNS row tuples plus vehicle_search for the rows at index, in index order"""
+        vehicle_search = self.arrays['vehicle_search_labels'].tolist() + ['']
+        vehicle_codes = self.arrays['vehicle_number_codes'][index].tolist()
+        return list(zip(*self.columns(ARCHIVE_COLUMNS, index), [vehicle_search[code] for code in vehicle_codes]))
+    
+    def columns(self, names, index):
+        """Python lists of column values for the rows at index"""
+        result = []
+        for name in names:
+            if name in ENCODED_COLUMNS:
+                labels = self._labels[name]
+                result.append([labels[code] for code in self.arrays[f'{name}_codes'][index].tolist()])
+            elif name == 'client_uuid':
+                result.append([value.decode() or None for value in self.arrays[name][index].tolist()])
+            else:
+                result.append(self.arrays[name][index].tolist())
+        return result
+    
+    def label_mask(self, name, matches):
+        """Row mask for an encoded column given a boolean array over its labels"""
+        return np.append(matches, False)[self.arrays[f'{name}_codes']]
+    
+    def mask(self, filters, cursor=None):
+        """Boolean row mask for WasteLoad.filtered_query() criteria and an optional (datetime, id) keyset bound
+        
+        filters['vehicle_search'] holds the normalized vehicle search term.
+        """
+        arrays = self.arrays
+        mask = np.ones(self.rows, dtype=bool)
+        
+        if filters.get('vehicle_search'):
+            labels = arrays['vehicle_search_labels']
+            mask &= self.label_mask('vehicle_number', np.char.find(labels, filters['vehicle_search']) >= 0)
+        if filters.get('date_from'):
+            mask &= arrays['datetime'] >= np.datetime64(filters['date_from'], 'us')
+        if filters.get('date_to'):
+            mask &= arrays['datetime'] <= np.datetime64(filters['date_to'], 'us')
+        if filters.get('weight_min'):
+            mask &= arrays['waste_weight'] >= filters['weight_min']
+        if filters.get('weight_max'):
+            mask &= arrays['waste_weight'] <= filters['weight_max']
+        for name in ('waste_type', 'material_category', 'destination'):
+            if filters.get(name):
+                mask &= self.label_mask(name, arrays[f'{name}_labels'] == filters[name])
+        if filters.get('panchayath'):
+            labels = np.char.lower(arrays['panchayath_labels'])
+            mask &= self.label_mask('panchayath', np.char.find(labels, filters['panchayath'].lower()) >= 0)
+        
+        if cursor:
+            cursor_datetime, cursor_id = cursor
+            bound = np.datetime64(cursor_datetime, 'us')
+            mask &= (arrays['datetime'] < bound) | ((arrays['datetime'] == bound) & (arrays['id'] < cursor_id))
+        return mask
+    
+    def write(self, path):
+        """Write the partition compressed, replacing any previous file atomically"""
+        partial_path = path + '.part'
+        with open(partial_path, 'wb') as partition_file:
+            np.savez_compressed(partition_file, **self.arrays)
+            partition_file.flush()
+            os.fsync(partition_file.fileno())
+        os.replace(partial_path, path)
+
+class PartitionCache:
+    """Per-process LRU of decompressed partitions holding up to max_bytes
+    
+    One cache can be shared by the archives of many tenants, so the memory budget
+    does not grow with the number of tenants.
+    """
+    
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._partitions = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+    
+    def get_or_read(self, path, written_at):
+        """Decompressed partition stored at path, reread when it was written again"""
+        key = (path, written_at)
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is not None:
+                self._partitions.move_to_end(key)
+                return partition
+        
+        partition = Partition.read(path)
+        with self._lock:
+            if key not in self._partitions:
+                self._partitions[key] = partition
+                self._cached_bytes += partition.nbytes
+            # Keep at least the partition just read, however small the budget
+            while self._cached_bytes > self.max_bytes and len(self._partitions) > 1:
+                _, evicted = self._partitions.popitem(last=False)
+                self._cached_bytes -= evicted.nbytes
+        return partition
+
+class Archive:
+    """Cold waste loads stored as compressed monthly column files under folder
+    
+    manifest.json lists each partition with its row count and datetime bounds, so
+    queries skip the months a date range cannot touch without opening them.
+    Decompressed partitions are kept in a per-process LRU cache of up to cache_bytes,
+    or in a PartitionCache shared with other archives.
+    """
+    
+    def __init__(self, folder, cache_bytes=256 * 1024 * 1024, cache=None):
+        self.folder = folder
+        self.cache = cache or PartitionCache(cache_bytes)
+        self._manifest = None
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+    
+    @property
+    def manifest_path(self):
+        return os.path.join(self.folder, MANIFEST_NAME)
+    
+    def manifest(self):
+        """The current manifest, reread whenever the file changes"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return {'version': MANIFEST_VERSION, 'partitions': [], 'vehicles': []}
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                with open(self.manifest_path) as manifest_file:
+                    self._manifest = json.load(manifest_file)
+                self._manifest_mtime = mtime
+            return self._manifest
+    
+    def __bool__(self):
+        return bool(self.manifest()['partitions'])
+    
+    def partitions(self, filters=None, cursor=None):
+        """Manifest entries of the partitions that can hold matching rows, newest first"""
+        filters = filters or {}
+        lower = filters.get('date_from')
+        upper = min(filter(None, (filters.get('date_to'), cursor[0] if cursor else None)), default=None)
+        entries = []
+        for entry in reversed(self.manifest()['partitions']):
+            if lower and datetime.fromisoformat(entry['max_datetime']) < lower:
+                continue
+            if upper and datetime.fromisoformat(entry['min_datetime']) > upper:
+                continue
+            entries.append(entry)
+        return entries
+    
+    def load(self, entry):
+        """Decompressed partition for a manifest entry"""
+        return self.cache.get_or_read(os.path.join(self.folder, entry['file']), entry['written_at'])
+    
+    def iter_rows(self, columns, filters=None, cursor=None, batch_size=1000):
+        """Yield matching rows as named tuples of columns, newest first, after an optional (datetime, id) cursor"""
+        filters = filters or {}
+        ArchivedLoad = row_type(tuple(columns))
+        for entry in self.partitions(filters, cursor):
+            partition = self.load(entry)
+            index = np.flatnonzero(partition.mask(filters, cursor))[::-1]
+            for start in range(0, len(index), batch_size):
+                batch = index[start:start + batch_size]
+                for values in zip(*partition.columns(columns, batch)):
+                    yield ArchivedLoad(*values)
+    
+    def count(self, filters=None):
+        """Number of archived loads matching filters"""
+        filters = filters or {}
+        if not any(filters.values()):
+            return sum(entry['rows'] for entry in self.manifest()['partitions'])
+        return sum(int(np.count_nonzero(self.load(entry).mask(filters))) for entry in self.partitions(filters))
+    
+    def grouped_totals(self, filters, dimensions):
+        """Get {dimension: {label: (load_count, total_weight)}} over matching archived loads"""
+        filters = filters or {}
+        totals = {name: {} for name in dimensions}
+        for entry in self.partitions(filters):
+            partition = self.load(entry)
+            mask = partition.mask(filters)
+            weights = partition.arrays['waste_weight'][mask]
+            for name in dimensions:
+                labels = partition.arrays[f'{name}_labels'].tolist() + [None]
+                # Shift codes by one so NULL (-1) gets its own bin
+                codes = partition.arrays[f'{name}_codes'][mask] + 1
+                counts = np.bincount(codes, minlength=len(labels))
+                sums = np.bincount(codes, weights=weights, minlength=len(labels))
+                for code in np.flatnonzero(counts).tolist():
+                    label = labels[code - 1]
+                    count, weight = totals[name].get(label, (0, 0.0))
+                    totals[name][label] = (count + int(counts[code]), weight + float(sums[code]))
+        return totals
+    
+    def daily_totals(self, filters=None, group_by=None):
+        """Get (day, group, load_count, total_weight) rows over matching archived loads"""
+        filters = filters or {}
+        rows = []
+        for entry in self.partitions(filters):
+            partition = self.load(entry)
+            mask = partition.mask(filters)
+            days = partition.arrays['datetime'][mask].astype('datetime64[D]').astype(np.int64)
+            weights = partition.arrays['waste_weight'][mask]
+            if group_by:
+                labels = partition.arrays[f'{group_by}_labels'].tolist() + [None]
+                codes = partition.arrays[f'{group_by}_codes'][mask] + 1
+            else:
+                labels = ['']
+                codes = np.zeros(len(days), dtype=np.int64)
+            keys, inverse = np.unique(days * len(labels) + codes, return_inverse=True)
+            counts = np.bincount(inverse)
+            sums = np.bincount(inverse, weights=weights)
+            for key, count, weight in zip(keys.tolist(), counts.tolist(), sums.tolist()):
+                day, code = divmod(key, len(labels))
+                rows.append((date.fromordinal(EPOCH_ORDINAL + day), labels[code - 1] if group_by else '', count, weight))
+        return rows
+    
+    def rollup_totals(self):
+        """Yield (day, waste_type, material_category, destination, panchayath, load_count, total_weight)
+        for every archived day and category combination, for rebuilding the daily rollup"""
+        for entry in self.manifest()['partitions']:
+            partition = self.load(entry)
+            key_columns = ('waste_type', 'material_category', 'destination', 'panchayath')
+            index = np.arange(partition.rows)
+            days = partition.arrays['datetime'].astype('datetime64[D]').tolist()
+            totals = {}
+            for day, *labels, weight in zip(days, *partition.columns(key_columns, index),
+                                            partition.arrays['waste_weight'].tolist()):
+                key = (day, *labels[:3], labels[3] or '')
+                count, total = totals.get(key, (0, 0.0))
+                totals[key] = (count + 1, total + weight)
+            for key, (count, total) in totals.items():
+                yield (*key, count, total)
+    
+    def vehicles(self):
+        """Distinct vehicle numbers across the whole archive"""
+        return self.manifest()['vehicles']
+    
+    def add(self, rows):
+        """Archive ARCHIVE_COLUMNS row tuples (plus vehicle_search) that all fall in one month
+        
+        Rows whose id is already archived replace the stored copy, so rerunning an
+        interrupted archive run is safe. The partition file is written before the
+        manifest points at it. Returns the partition's manifest entry.
+        """
+        incoming = Partition.from_rows(rows)
+        month = month_key(incoming.arrays['datetime'][0].tolist())
+        manifest = self.manifest()
+        entries = {entry['month']: entry for entry in manifest['partitions']}
+        
+        partition = incoming
+        if month in entries:
+            partition = self.load(entries[month]).merge(incoming)
+        
+        relative_path = os.path.join(month[:4], f'waste_loads-{month}.npz')
+        path = os.path.join(self.folder, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partition.write(path)
+        
+        datetimes = partition.arrays['datetime']
+        entries[month] = {
+            'month': month,
+            'file': relative_path,
+            'rows': partition.rows,
+            'min_datetime': datetimes[0].tolist().isoformat(),
+            'max_datetime': datetimes[-1].tolist().isoformat(),
+            'total_weight': float(partition.arrays['waste_weight'].sum()),
+            'bytes': os.path.getsize(path),
+            'written_at': datetime.now().isoformat()
+        }
+        vehicles = set(manifest['vehicles']) | set(partition.arrays['vehicle_number_labels'].tolist())
+        self.write_manifest({
+            'version': MANIFEST_VERSION,
+            'columns': list(ARCHIVE_COLUMNS),
+            'partitions': [entries[key] for key in sorted(entries)],
+            'vehicles': sorted(vehicles)
+        })
+        return entries[month]
+    
+    def write_manifest(self, manifest):
+        """Replace the manifest atomically"""
+        os.makedirs(self.folder, exist_ok=True)
+        partial_path = self.manifest_path + '.part'
+        with open(partial_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        os.replace(partial_path, self.manifest_path)
@@ -0,0 +1,143 @@
+import os
+import re
+import hashlib
+import threading
+from io import BytesIO
+from flask import current_app, send_from_directory
+from werkzeug.security import safe_join
+from PIL import Image, ImageOps
+
+# Logo renditions as (max width, max height), about twice the on-screen height for high-DPI screens
+LOGO_SIZES = {
+    'small': (256, 64),     # navbar, shown 32px tall
+    'medium': (640, 160),   # home page and upload form
+    'large': (1280, 320)    # organization page
+}
+LOGO_FORMAT = 'webp'
+LOGO_QUALITY = 85
+
+# Logos are stored under the first 20 hex digits of the uploaded file's SHA-256
+LOGO_KEY_PATTERN = re.compile(r'[0-9a-f]{20}')
+LOGO_VARIANT_PATTERN = re.compile(rf'[0-9a-f]{{20}}-({"|".join(LOGO_SIZES)})\.{LOGO_FORMAT}')
+
+# Fingerprinted static file names: css/custom.<12 hex digits>.css
+FINGERPRINT_PATTERN = re.compile(r'(.+)\.([0-9a-f]{12})(\.[^./]+)')
+
+# One year, the longest lifetime caches reliably honour
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def logo_variant_filename(logo_key, size):
+    """File name of one rendition of a stored logo"""
+    return f'{logo_key}-{size}.{LOGO_FORMAT}'
+
+def is_logo_key(logo_filename):
+    """Check whether an organization's logo_filename is a content-hash key (not a pre-resizing upload)"""
+    return bool(logo_filename and LOGO_KEY_PATTERN.fullmatch(logo_filename))
+
+def store_logo(stream, folder):
+    """Resize and recompress an uploaded logo into every LOGO_SIZES rendition
+    
+    Renditions are named after a hash of the upload, so uploading the same image
+    again reuses the files. Returns the logo key to store as the organization's
+    logo_filename; raises ValueError if the upload is not a readable image.
+    """
+    data = stream.read()
+    logo_key = hashlib.sha256(data).hexdigest()[:20]
+    try:
+        image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Unreadable image: {e}") from e
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    
+    os.makedirs(folder, exist_ok=True)
+    for size, bounds in LOGO_SIZES.items():
+        path = os.path.join(folder, logo_variant_filename(logo_key, size))
+        if os.path.exists(path):
+            continue
+        rendition = image.copy()
+        rendition.thumbnail(bounds, Image.LANCZOS)
+        partial_path = path + '.part'
+        rendition.save(partial_path, LOGO_FORMAT, quality=LOGO_QUALITY, method=6)
+        os.replace(partial_path, path)
+    return logo_key
+
+def remove_logo(folder, logo_filename):
+    """Delete a stored logo: every rendition of a logo key, or a pre-resizing upload as is"""
+    if is_logo_key(logo_filename):
+        filenames = [logo_variant_filename(logo_filename, size) for size in LOGO_SIZES]
+    else:
+        filenames = [logo_filename]
+    for filename in filenames:
+        path = os.path.join(folder, filename)
+        if os.path.exists(path):
+            os.remove(path)
+
+def send_immutable(directory, filename):
+    """Send a file whose URL changes with its content, letting browsers cache it for good"""
+    response = send_from_directory(directory, filename, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+class StaticAssets:
+    """Content-fingerprinted URLs for files in the static folder
+    
+    url_for('static', filename='css/custom.css') renders as /static/css/custom.<hash>.css,
+    which is served with a one-year immutable Cache-Control; editing the file changes
+    the URL. Plain and outdated fingerprinted URLs still serve the current file, but
+    are revalidated with ETags. Hashes are computed on first use, and recomputed when
+    a file changes in debug mode.
+    """
+    
+    def __init__(self, exclude=('uploads',)):
+        self.exclude = exclude
+        self._digests = {}
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Fingerprint static URLs built by app and serve them with long-lived caching"""
+        app.url_defaults(self._add_fingerprint)
+        if app.has_static_folder:
+            app.view_functions['static'] = self._send_static
+    
+    def digest(self, filename):
+        """Short content hash of a static file, or None if there is no such file"""
+        app = current_app
+        path = safe_join(app.static_folder, filename)
+        if path is None:
+            return None
+        cached = self._digests.get(path)
+        if cached and not app.debug:
+            return cached[1]
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'rb') as static_file:
+            digest = hashlib.sha256(static_file.read()).hexdigest()[:12]
+        with self._lock:
+            self._digests[path] = (mtime, digest)
+        return digest
+    
+    def _add_fingerprint(self, endpoint, values):
+        """url_defaults hook adding the content hash to static file names"""
+        if endpoint != 'static' or 'filename' not in values:
+            return
+        filename = values['filename']
+        if filename.split('/', 1)[0] in self.exclude:
+            return
+        digest = self.digest(filename)
+        if digest:
+            root, extension = os.path.splitext(filename)
+            values['filename'] = f'{root}.{digest}{extension}'
+    
+    def _send_static(self, filename):
+        """Static file view that understands fingerprinted names"""
+        match = FINGERPRINT_PATTERN.fullmatch(filename)
+        if match:
+            filename = match[1] + match[3]
+            if self.digest(filename) == match[2]:
+                return send_immutable(current_app.static_folder, filename)
+        return current_app.send_static_file(filename)
@@ -0,0 +1,11 @@
+"""Reproducible benchmarks for WasteTrackr's hot paths
+
+Fill a local database with synthetic waste loads and time the report, API, export,
+statistics and bulk insert paths through Flask's test client:
+
+    python -m benchmarks --database sqlite:////tmp/bench.db --rows 1000000 --output bench.json
+
+Check that worker startup stays within budget and never touches the database:
+
+    python -m benchmarks.startup --budget-ms 50
+"""
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import platform
+import statistics
+import subprocess
+import uuid
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+import click
+
+from benchmarks.synthetic import generate_loads
+
+def summarize(timings):
+    """Summarize a list of durations in seconds as milliseconds"""
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+
+def git_commit():
+    """Return the current git commit, if the benchmark runs from a checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_rows(values_iter, chunk_size, report):
+    """Insert synthetic rows into the current tenant the same way the CSV importer does; returns rows per second"""
+    from importer import bulk_insert
+    from models import db, DailyWasteRollup, DataVersion, current_tenant_id, dimension_cache
+    
+    inserted = 0
+    started = time.perf_counter()
+    while True:
+        values = [dict(row, tenant_id=current_tenant_id()) for row in islice(values_iter, chunk_size)]
+        if not values:
+            break
+        dimension_cache.ensure(values)
+        bulk_insert(values)
+        DailyWasteRollup.add_loads(values)
+        DataVersion.bump()
+        db.session.commit()
+        inserted += len(values)
+        elapsed = time.perf_counter() - started
+        report(f"  inserted {inserted} rows ({inserted / elapsed:.0f} rows/sec)")
+    elapsed = time.perf_counter() - started
+    return inserted, elapsed
+
+def time_request(client, url, repeat, headers=None):
+    """Time a GET through the test client, reading the whole (possibly streamed) body"""
+    from app import response_cache
+    
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        # Measure the real work, not a cached response
+        response_cache.invalidate()
+        started = time.perf_counter()
+        response = client.get(url, headers=headers or {})
+        size = len(response.get_data())
+        response.close()
+        timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise click.ClickException(f"GET {url} returned {response.status_code}")
+    return dict(summarize(timings), url=url, response_bytes=size)
+
+def time_call(function, repeat):
+    """Time a plain function call"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+def sample_filters(seed, vehicles, panchayaths, years):
+    """Pick filters that match the data generate_loads() produces with the same options
+    
+    Returns a vehicle, a panchayath, and the first days of a quarter and of a
+    four-month window in the middle of the generated date range.
+    """
+    sample = next(generate_loads(1, seed=seed, vehicles=vehicles, panchayaths=panchayaths, years=years))
+    middle = sample['datetime'].date() + timedelta(days=365 * years // 2)
+    return sample['vehicle_number'], sample['panchayath'], middle, middle + timedelta(days=89), middle + timedelta(days=119)
+
+def run_scenarios(app, repeat, seed, batch_size, report, vehicles, panchayaths, years):
+    """Time the hot read paths and batch sync; returns a dict of scenario results"""
+    from app import metadata_cache
+    from models import Tenant, WasteLoad, use_tenant
+    
+    vehicle, panchayath, window_start, quarter_end, export_end = sample_filters(seed, vehicles, panchayaths, years)
+    client = app.test_client()
+    results = {}
+    
+    # Prime the metadata cache and connection pool so the first timed run isn't an outlier
+    client.get('/report')
+    
+    scenarios = [
+        ('report', '/report', None),
+        ('report_filtered', f'/report?material_category=Plastic&date_from={window_start}&date_to={quarter_end}', None),
+        ('report_vehicle_search', f'/report?vehicle_number={vehicle[-4:]}', None),
+        ('report_panchayath_search', f'/report?panchayath={panchayath[:5]}', None),
+        ('api_page', '/api/waste-loads', None),
+        ('api_page_filtered', '/api/waste-loads?waste_type=Wet&destination=Landfill', None),
+        ('export_csv', '/export/csv', None),
+        ('export_csv_filtered', f'/export/csv?date_from={window_start}&date_to={export_end}', None),
+        ('export_csv_gzip', '/export/csv', {'Accept-Encoding': 'gzip'}),
+    ]
+    for name, url, headers in scenarios:
+        report(f"Timing {name}")
+        results[name] = time_request(client, url, repeat, headers)
+    
+    report("Timing get_summary_stats")
+    with app.app_context():
+        tenant_id = Tenant.get_id(Tenant.DEFAULT_SLUG)
+        use_tenant(tenant_id)
+        results['summary_stats'] = time_call(WasteLoad.get_summary_stats, repeat)
+    
+    # The first report after a write, with filter options and organization uncached
+    def report_after_write():
+        metadata_cache.invalidate()
+        time_request(client, '/report', 1)
+    report("Timing report_after_write")
+    results['report_after_write'] = time_call(report_after_write, repeat)
+    
+    report("Timing batch sync")
+    timings = []
+    batches = generate_loads(batch_size * repeat, seed=seed + 1, vehicles=vehicles, panchayaths=panchayaths, years=years)
+    for _ in range(repeat):
+        records = [
+            {
+                'client_uuid': str(uuid.uuid4()),
+                'vehicle_number': values['vehicle_number'],
+                'datetime': values['datetime'].strftime('%Y-%m-%dT%H:%M'),
+                'waste_weight': values['waste_weight'],
+                'waste_type': values['waste_type'],
+                'material_category': values['material_category'],
+                'destination': values['destination'],
+                'panchayath': values['panchayath']
+            }
+            for values in islice(batches, batch_size)
+        ]
+        started = time.perf_counter()
+        response = client.post('/api/waste-loads/batch', json={'waste_loads': records})
+        timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise click.ClickException(f"Batch sync returned {response.status_code}")
+        if response.get_json()['created'] != len(records):
+            raise click.ClickException("Batch sync rejected synthetic records")
+    results['batch_sync'] = dict(summarize(timings), records_per_batch=batch_size)
+    
+    return results
+
+@click.command()
+@click.option('--database', 'database_url', default='sqlite:////tmp/wastetrackr-bench.db', show_default=True,
+              help='Database to benchmark; generated rows are added to it.')
+@click.option('--rows', default=100000, show_default=True, help='Synthetic waste loads to generate.')
+@click.option('--reuse', is_flag=True, help='Skip generation if the database already holds at least --rows loads.')
+@click.option('--seed', default=42, show_default=True, help='Random seed for the generator.')
+@click.option('--vehicles', default=300, show_default=True, help='Distinct vehicles.')
+@click.option('--panchayaths', default=20, show_default=True, help='Distinct panchayaths.')
+@click.option('--years', default=3, show_default=True, help='Years of history to spread the loads over.')
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows per insert transaction.')
+@click.option('--repeat', default=5, show_default=True, help='Timed runs per scenario.')
+@click.option('--batch-size', default=500, show_default=True, help='Records per batch sync request.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write results as JSON to this file.')
+def main(database_url, rows, reuse, seed, vehicles, panchayaths, years, chunk_size, repeat, batch_size, output):
+    """Generate synthetic waste loads and time WasteTrackr's hot paths"""
+    # The app reads its database from the environment when it is created
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app, init_db
+    from models import db, Tenant, WasteLoad, use_tenant
+    
+    report = lambda message: click.echo(message, err=True)
+    app = create_app()
+    
+    with app.app_context():
+        init_db()
+        # Synthetic loads go to the default tenant, which the timed requests read
+        use_tenant(Tenant.get_id(Tenant.DEFAULT_SLUG))
+        existing = WasteLoad.tenant_query(WasteLoad.id).count()
+        insert_stats = None
+        if reuse and existing >= rows:
+            report(f"Reusing {existing} existing waste loads")
+        else:
+            report(f"Generating {rows} waste loads into {db.engine.url.render_as_string(hide_password=True)}")
+            loads = generate_loads(rows, seed=seed, vehicles=vehicles, panchayaths=panchayaths, years=years)
+            inserted, elapsed = load_rows(loads, chunk_size, report)
+            insert_stats = {
+                'rows': inserted,
+                'seconds': round(elapsed, 3),
+                'rows_per_second': round(inserted / elapsed) if elapsed else None
+            }
+        total_rows = WasteLoad.tenant_query(WasteLoad.id).count()
+        dialect = db.engine.dialect.name
+    
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'dialect': dialect,
+            'rows': total_rows,
+            'seed': seed,
+            'vehicles': vehicles,
+            'panchayaths': panchayaths,
+            'years': years,
+            'repeat': repeat
+        },
+        'bulk_insert': insert_stats,
+        'scenarios': run_scenarios(app, repeat, seed, batch_size, report, vehicles, panchayaths, years)
+    }
+    
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, 'w') as output_file:
+            output_file.write(text + '\n')
+        report(f"Results written to {output}")
+    else:
+        click.echo(text)
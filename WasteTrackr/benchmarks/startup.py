@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+
+import click
+
+# Runs in a fresh interpreter: times the imports and create_app() separately and counts
+# database connections opened along the way
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+connections = []
+event.listen(Pool, 'connect', lambda *args: connections.append(1))
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+json.dump({'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000,
+           'connections': len(connections)}, sys.stdout)
+'''
+
+def measure(database_url):
+    """Boot the app once in a new interpreter and return its timings"""
+    env = dict(os.environ, DATABASE_URL=database_url, LOG_LEVEL='WARNING')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=root, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+# Allowed median create_app() time, which is what a preloaded worker pays, and import time,
+# paid once by the gunicorn master
+CREATE_APP_BUDGET_MS = 50.0
+IMPORT_BUDGET_MS = 2000.0
+
+def check(database_url, runs, budget_ms=CREATE_APP_BUDGET_MS, import_budget_ms=IMPORT_BUDGET_MS):
+    """Boot the app runs times and compare the median timings with the budgets
+    
+    Returns (import_ms, create_app_ms, connections, failures), where failures lists
+    every exceeded budget and whether a database connection was opened.
+    """
+    samples = [measure(database_url) for _ in range(runs)]
+    import_ms = sorted(sample['import_ms'] for sample in samples)[runs // 2]
+    create_app_ms = sorted(sample['create_app_ms'] for sample in samples)[runs // 2]
+    connections = max(sample['connections'] for sample in samples)
+    
+    failures = []
+    if import_ms > import_budget_ms:
+        failures.append('import is over budget')
+    if create_app_ms > budget_ms:
+        failures.append('create_app() is over budget')
+    if connections:
+        failures.append('startup connected to the database')
+    return import_ms, create_app_ms, connections, failures
+
+@click.command()
+@click.option('--database', 'database_url', default='sqlite:////tmp/wastetrackr-startup.db',
+              show_default=True, help='Database URL; it is never connected to.')
+@click.option('--runs', default=5, show_default=True, help='Interpreters to boot.')
+@click.option('--budget-ms', default=CREATE_APP_BUDGET_MS, show_default=True,
+              help='Allowed median create_app() time; this is what a preloaded worker pays.')
+@click.option('--import-budget-ms', default=IMPORT_BUDGET_MS, show_default=True,
+              help='Allowed median import time, paid once by the gunicorn master.')
+def main(database_url, runs, budget_ms, import_budget_ms):
+    """Check that building the app stays fast and never touches the database
+    
+    Exits non-zero when a budget is exceeded or a database connection was opened.
+    tests/test_startup.py runs the same check with the test suite.
+    """
+    import_ms, create_app_ms, connections, failures = check(database_url, runs, budget_ms, import_budget_ms)
+    click.echo(f"import: {import_ms:.1f} ms (budget {import_budget_ms:g} ms), "
+               f"create_app: {create_app_ms:.1f} ms (budget {budget_ms:g} ms), "
+               f"database connections: {connections}")
+    if failures:
+        raise click.ClickException('; '.join(failures))
+
+if __name__ == '__main__':
+    main()
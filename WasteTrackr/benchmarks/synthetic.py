@@ -0,0 +1,100 @@
+import math
+import random
+from datetime import datetime, timedelta
+from models import WasteLoad
+
+# Panchayaths served by the MRF (the suggestions offered on the logging form)
+PANCHAYATHS = [
+    'Ullal', 'Bantwal', 'Mulky', 'Puttur', 'Belthangady', 'Sullia', 'Kadaba', 'Vittal',
+    'Mangalore City Corporation', 'Surathkal', 'Mudipu', 'Farangipete', 'Thumbay', 'Gurpur',
+    'Bajpe', 'Kinnigoli', 'Kateel', 'Venur', 'Beltangady', 'Dharmasthala'
+]
+
+WASTE_TYPES = ['Mixed', 'Dry', 'Wet']
+MATERIAL_CATEGORIES = ['Plastic', 'Glass', 'Rubber', 'MLP']
+DESTINATIONS = ['Recycler', 'Landfill', 'Cement Factory']
+
+# Typical load weight in kg per waste type
+BASE_WEIGHTS = {'Mixed': 900.0, 'Dry': 600.0, 'Wet': 1200.0}
+
+# Where each material usually ends up
+DESTINATION_WEIGHTS = {
+    'Plastic': [0.7, 0.1, 0.2],
+    'Glass': [0.85, 0.15, 0.0],
+    'Rubber': [0.3, 0.2, 0.5],
+    'MLP': [0.1, 0.3, 0.6],
+}
+
+def make_vehicles(rng, count):
+    """Generate distinct Karnataka-style vehicle numbers, e.g. KA-19-AB-1234"""
+    vehicles = set()
+    while len(vehicles) < count:
+        letters = ''.join(rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(2))
+        vehicles.add(f"KA-{rng.randint(1, 70):02d}-{letters}-{rng.randint(1, 9999):04d}")
+    return sorted(vehicles)
+
+def make_panchayaths(count):
+    """Return count panchayath names, adding numbered wards once the real names run out"""
+    names = list(PANCHAYATHS[:count])
+    ward = 1
+    while len(names) < count:
+        names.append(f"{PANCHAYATHS[(ward - 1) % len(PANCHAYATHS)]} Ward {ward}")
+        ward += 1
+    return names
+
+def season_factor(day_of_year):
+    """Monsoon (June-September) brings heavier, wetter loads"""
+    return 1.0 + 0.35 * math.exp(-((day_of_year - 200) / 45.0) ** 2)
+
+def generate_loads(rows, seed=42, vehicles=300, panchayaths=20, years=3, end=None):
+    """Yield synthetic WasteLoad column-value dicts, oldest first
+    
+    Loads are spread evenly over the given number of years ending at `end`, with
+    arrivals during working hours, fewer loads on Sundays, monsoon peaks in weight
+    and wet waste, and each vehicle tied to a home panchayath. The same seed always
+    produces the same rows.
+    """
+    rng = random.Random(seed)
+    vehicle_numbers = make_vehicles(rng, vehicles)
+    panchayath_names = make_panchayaths(panchayaths)
+    home_panchayath = {vehicle: rng.choice(panchayath_names) for vehicle in vehicle_numbers}
+    # A few vehicles do most of the trips
+    vehicle_weights = [1.0 / (rank + 1) ** 0.8 for rank in range(len(vehicle_numbers))]
+    
+    end = end or datetime(2025, 6, 30)
+    start = end - timedelta(days=365 * years)
+    step = (end - start) / max(rows, 1)
+    created_at = datetime.now()
+    
+    chosen_vehicles = iter(())
+    for index in range(rows):
+        moment = start + step * index
+        # Keep arrivals between 06:00 and 19:00 and thin out Sundays
+        if moment.weekday() == 6 and rng.random() < 0.6:
+            moment += timedelta(days=1)
+        moment = moment.replace(hour=6 + (moment.hour % 13), second=0, microsecond=0)
+        
+        try:
+            vehicle = next(chosen_vehicles)
+        except StopIteration:
+            chosen_vehicles = iter(rng.choices(vehicle_numbers, vehicle_weights, k=10000))
+            vehicle = next(chosen_vehicles)
+        
+        factor = season_factor(moment.timetuple().tm_yday)
+        wet_share = 0.3 * factor
+        waste_type = rng.choices(WASTE_TYPES, [0.45, 1.0 - 0.45 - wet_share, wet_share])[0]
+        material_category = rng.choices(MATERIAL_CATEGORIES, [0.5, 0.15, 0.1, 0.25])[0]
+        destination = rng.choices(DESTINATIONS, DESTINATION_WEIGHTS[material_category])[0]
+        weight = round(BASE_WEIGHTS[waste_type] * factor * rng.lognormvariate(0, 0.35), 1)
+        
+        yield {
+            'vehicle_number': vehicle,
+            'vehicle_search': WasteLoad.normalize_vehicle_number(vehicle),
+            'datetime': moment,
+            'waste_weight': weight,
+            'waste_type': waste_type,
+            'material_category': material_category,
+            'destination': destination,
+            'panchayath': home_panchayath[vehicle],
+            'created_at': created_at
+        }
@@ -0,0 +1,111 @@
+import csv
+import zlib
+import xlsxwriter
+
+# Columns and headers of the CSV export
+EXPORT_COLUMNS = ('vehicle_number', 'datetime', 'waste_weight', 'waste_type',
+                  'material_category', 'destination', 'created_at')
+EXPORT_HEADER = ['Vehicle Number', 'Date & Time', 'Waste Weight (kg)',
+                 'Waste Type', 'Material Category', 'Destination', 'Created At']
+
+class _LineBuffer:
+    """File-like sink that hands back whatever csv.writer writes to it"""
+    def write(self, line):
+        return line
+
+def generate_csv(rows):
+    """Yield the CSV export one encoded line at a time"""
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_HEADER).encode()
+    for vehicle_number, load_datetime, waste_weight, waste_type, material_category, destination, created_at in rows:
+        yield writer.writerow([
+            vehicle_number,
+            load_datetime.strftime('%Y-%m-%d %H:%M'),
+            waste_weight,
+            waste_type,
+            material_category,
+            destination,
+            created_at.strftime('%Y-%m-%d %H:%M') if created_at else ''
+        ]).encode()
+
+def gzip_stream(chunks, flush_size=64 * 1024):
+    """Gzip-compress a stream of byte chunks, yielding compressed blocks of roughly flush_size"""
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= flush_size:
+            block = compressor.compress(b''.join(pending))
+            pending, pending_size = [], 0
+            if block:
+                yield block
+    yield compressor.compress(b''.join(pending)) + compressor.flush()
+
+# Excel's row limit, including the header row
+XLSX_MAX_ROWS = 1048576
+
+def write_xlsx(path, rows):
+    """Write export rows to an .xlsx workbook in constant memory, continuing on new sheets past Excel's row limit"""
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd hh:mm'})
+    header_format = workbook.add_format({'bold': True})
+    sheet_number = 0
+    row_number = XLSX_MAX_ROWS
+    for row in rows:
+        if row_number == XLSX_MAX_ROWS:
+            sheet_number += 1
+            worksheet = workbook.add_worksheet('Waste Loads' if sheet_number == 1 else f'Waste Loads {sheet_number}')
+            worksheet.set_column(0, len(EXPORT_HEADER) - 1, 18)
+            worksheet.write_row(0, 0, EXPORT_HEADER, header_format)
+            row_number = 1
+        worksheet.write_row(row_number, 0, row)
+        row_number += 1
+    if sheet_number == 0:
+        workbook.add_worksheet('Waste Loads').write_row(0, 0, EXPORT_HEADER, header_format)
+    workbook.close()
+
+def write_summary_xlsx(path, grouped_totals, monthly, yearly):
+    """Write a multi-year summary workbook
+    
+    grouped_totals is the get_grouped_totals() dict; monthly and yearly are
+    build_trends() results grouped by waste type and by panchayath.
+    """
+    workbook = xlsxwriter.Workbook(path)
+    header_format = workbook.add_format({'bold': True})
+    weight_format = workbook.add_format({'num_format': '#,##0.0'})
+    
+    worksheet = workbook.add_worksheet('Totals')
+    worksheet.set_column(0, 0, 24)
+    worksheet.set_column(1, 2, 16)
+    row_number = 0
+    for dimension, totals in grouped_totals.items():
+        worksheet.write_row(row_number, 0, [dimension.replace('_', ' ').title(), 'Loads', 'Weight (kg)'], header_format)
+        for label, (load_count, total_weight) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            row_number += 1
+            worksheet.write_row(row_number, 0, [label, load_count])
+            worksheet.write_number(row_number, 2, total_weight, weight_format)
+        row_number += 2
+    
+    # One row per month, one weight column per waste type
+    worksheet = workbook.add_worksheet('Monthly')
+    worksheet.set_column(0, len(monthly['series']) + 2, 16)
+    worksheet.write_row(0, 0, ['Month'] + [f"{series['key']} (kg)" for series in monthly['series']] +
+                        ['Total (kg)', 'Loads'], header_format)
+    for index, period in enumerate(monthly['periods']):
+        weights = [float(series['weight'][index]) for series in monthly['series']]
+        worksheet.write_string(index + 1, 0, period[:7])
+        worksheet.write_row(index + 1, 1, weights + [sum(weights)], weight_format)
+        worksheet.write_number(index + 1, len(weights) + 2, sum(int(series['loads'][index]) for series in monthly['series']))
+    
+    # One row per panchayath, one weight column per year
+    worksheet = workbook.add_worksheet('Yearly by Panchayath')
+    worksheet.set_column(0, 0, 28)
+    worksheet.set_column(1, len(yearly['periods']) + 1, 14)
+    worksheet.write_row(0, 0, ['Panchayath'] + [period[:4] for period in yearly['periods']] + ['Total (kg)'], header_format)
+    for index, series in enumerate(yearly['series']):
+        weights = [float(weight) for weight in series['weight']]
+        worksheet.write_string(index + 1, 0, series['key'] or '(none)')
+        worksheet.write_row(index + 1, 1, weights + [sum(weights)], weight_format)
+    
+    workbook.close()
@@ -0,0 +1,17 @@
+import os
+
+# gunicorn --config gunicorn.conf.py main:app
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Import the application once in the master and fork workers from it, so each worker
+# boots in milliseconds and shares the imported code's memory
+preload_app = True
+
+def post_fork(server, worker):
+    """Discard any pooled connections inherited from the master; workers open their own"""
+    from main import app
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,174 @@
+import os
+import csv
+import io
+import time
+import logging
+from datetime import datetime
+from itertools import islice
+from models import db, WasteLoad, DailyWasteRollup, DataVersion, ImportCheckpoint, LoadFlag, DIMENSIONS, current_tenant_id, dimension_cache
+
+# CSV headers (as written by the logger and the export) mapped to WasteLoad fields
+HEADER_FIELDS = {
+    'Vehicle Number': 'vehicle_number',
+    'Date & Time': 'datetime',
+    'Waste Weight (kg)': 'waste_weight',
+    'Waste Type': 'waste_type',
+    'Material Category': 'material_category',
+    'Destination': 'destination',
+    'Panchayath': 'panchayath'
+}
+
+# Column order used for bulk inserts
+INSERT_COLUMNS = ('tenant_id', 'vehicle_number', 'vehicle_search', 'datetime', 'waste_weight', 'waste_type',
+                  'material_category', 'destination', 'panchayath', 'created_at')
+
+def parse_chunk(rows, first_line):
+    """Validate a chunk of CSV rows, returning (values, rejects)
+    
+    rejects is a list of (line_number, error) tuples for rows that failed validation.
+    """
+    values = []
+    rejects = []
+    created_at = datetime.now()
+    for line_number, row in enumerate(rows, start=first_line):
+        data = {field: row.get(header) for header, field in HEADER_FIELDS.items()}
+        try:
+            row_values = WasteLoad.parse_values(data)
+        except ValueError as e:
+            rejects.append((line_number, str(e)))
+            continue
+        row_values['created_at'] = created_at
+        values.append(row_values)
+    return values, rejects
+
+def copy_insert(values):
+    """Insert rows with PostgreSQL COPY on the session's current connection"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # COPY bypasses SQLAlchemy type processing, so dimension labels are mapped to ids here
+    dimension_positions = [INSERT_COLUMNS.index(dimension) for dimension in DIMENSIONS]
+    for row in values:
+        fields = [row[column] for column in INSERT_COLUMNS]
+        for position in dimension_positions:
+            fields[position] = dimension_cache.id_for(INSERT_COLUMNS[position], fields[position])
+        writer.writerow(fields)
+    buffer.seek(0)
+    
+    column_names = [WasteLoad.__table__.c[column].name for column in INSERT_COLUMNS]
+    
+    driver_connection = db.session.connection().connection.driver_connection
+    with driver_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {WasteLoad.__tablename__} ({', '.join(column_names)}) "
+            f"FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (panchayath))",
+            buffer
+        )
+
+def bulk_insert(values):
+    """Insert parsed rows with COPY on PostgreSQL and executemany elsewhere"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        copy_insert(values)
+    else:
+        db.session.execute(db.insert(WasteLoad.__table__), values)
+
+def insert_chunk(values, detector=None):
+    """Insert a chunk of parsed rows, flagging anomalies when a detector is given
+    
+    Flagged rows are added through the ORM so their flags can reference the new
+    ids; they are rare, so everything else still goes through bulk_insert().
+    """
+    flags = detector.check(values) if detector else [[]] * len(values)
+    flagged = [(WasteLoad(**row), row, row_flags) for row, row_flags in zip(values, flags) if row_flags]
+    bulk_insert([row for row, row_flags in zip(values, flags) if not row_flags])
+    if flagged:
+        db.session.add_all([waste_load for waste_load, _, _ in flagged])
+        db.session.flush()
+        for waste_load, row, row_flags in flagged:
+            LoadFlag.add_for(waste_load.id, row, row_flags)
+    return len(flagged)
+
+def get_checkpoint(source, file_size, restart=False):
+    """Get or create the current tenant's checkpoint for a file, resetting it if the file has changed"""
+    checkpoint = ImportCheckpoint.tenant_query().filter_by(source=source).first()
+    if checkpoint is None:
+        checkpoint = ImportCheckpoint(tenant_id=current_tenant_id(), source=source, file_size=file_size,
+                                      rows_done=0, rows_imported=0, rows_rejected=0)
+        db.session.add(checkpoint)
+    elif restart or checkpoint.file_size != file_size:
+        if not restart:
+            logging.warning(f"{source} changed size since the last import; starting from the top")
+        checkpoint.file_size = file_size
+        checkpoint.rows_done = checkpoint.rows_imported = checkpoint.rows_rejected = 0
+        checkpoint.completed_at = None
+    db.session.commit()
+    return checkpoint
+
+def import_csv(path, chunk_size=10000, restart=False, report=print, detector=None):
+    """Bulk-import a weighbridge CSV file into the current tenant, resuming from its last committed chunk
+    
+    Each chunk's loads, anomaly flags (when an AnomalyDetector is given), rollup
+    increments and checkpoint commit in one transaction, so an interrupted import
+    can be rerun without duplicating or skipping rows.
+    Returns the final ImportCheckpoint.
+    """
+    source = os.path.abspath(path)
+    checkpoint = get_checkpoint(source, os.path.getsize(path), restart)
+    if checkpoint.completed_at and not restart:
+        report(f"{path} was already imported ({checkpoint.rows_imported} rows); use --restart to import it again")
+        return checkpoint
+    
+    started = time.perf_counter()
+    imported_this_run = 0
+    
+    with open(path, newline='', encoding='utf-8-sig') as csv_file:
+        reader = csv.DictReader(csv_file)
+        missing = [header for header, field in HEADER_FIELDS.items()
+                   if field in WasteLoad.REQUIRED_FIELDS and header not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+        
+        if checkpoint.rows_done:
+            report(f"Resuming {path} after row {checkpoint.rows_done}")
+            for _ in islice(reader, checkpoint.rows_done):
+                pass
+        
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                break
+            
+            # Line 1 is the header, so data row n sits on line n + 1
+            values, rejects = parse_chunk(rows, checkpoint.rows_done + 2)
+            flagged = 0
+            try:
+                if values:
+                    dimension_cache.ensure(values)
+                    flagged = insert_chunk(values, detector)
+                    DailyWasteRollup.add_loads(values)
+                    DataVersion.bump()
+                checkpoint.rows_done += len(rows)
+                checkpoint.rows_imported += len(values)
+                checkpoint.rows_rejected += len(rejects)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            if detector:
+                detector.record(values)
+            
+            for line_number, error in rejects[:10]:
+                report(f"  line {line_number}: {error}")
+            
+            imported_this_run += len(values)
+            elapsed = time.perf_counter() - started
+            report(f"{checkpoint.rows_done} rows read, {checkpoint.rows_imported} imported, "
+                   f"{checkpoint.rows_rejected} rejected, {flagged} flagged in this chunk "
+                   f"({imported_this_run / elapsed:.0f} rows/sec)")
+    
+    checkpoint.completed_at = datetime.now()
+    db.session.commit()
+    
+    elapsed = time.perf_counter() - started
+    report(f"Imported {imported_this_run} rows in {elapsed:.1f}s "
+           f"({imported_this_run / elapsed if elapsed else 0:.0f} rows/sec)")
+    return checkpoint
@@ -0,0 +1,165 @@
+import os
+import time
+import logging
+from datetime import datetime
+from sqlalchemy import func
+from exports import EXPORT_COLUMNS, generate_csv, gzip_stream, write_xlsx, write_summary_xlsx
+from models import db, Job, WasteLoad, DailyWasteRollup, use_read_replica, use_tenant
+from trends import build_trends
+
+# Output file extension per job kind
+JOB_KINDS = {
+    'csv': '.csv',
+    'csv.gz': '.csv.gz',
+    'xlsx': '.xlsx',
+    'summary': '.xlsx'
+}
+
+# Download names shown to users, formatted with the job's creation time
+DOWNLOAD_NAMES = {
+    'csv': 'waste_loads_{:%Y%m%d_%H%M%S}.csv',
+    'csv.gz': 'waste_loads_{:%Y%m%d_%H%M%S}.csv.gz',
+    'xlsx': 'waste_loads_{:%Y%m%d_%H%M%S}.xlsx',
+    'summary': 'waste_summary_{:%Y%m%d_%H%M%S}.xlsx'
+}
+
+class ProgressReporter:
+    """Counts rows as they stream past and stores progress on the job at most every interval seconds"""
+    
+    def __init__(self, job_id, interval=2.0):
+        self.job_id = job_id
+        self.interval = interval
+        self.done = 0
+        self._last_report = 0.0
+    
+    def report(self, total=None, force=False):
+        """Write the current progress (and total, if known) to the job row"""
+        now = time.monotonic()
+        if force or total is not None or now - self._last_report >= self.interval:
+            Job.record_progress(self.job_id, self.done, total)
+            self._last_report = now
+    
+    def track(self, rows):
+        """Yield rows unchanged, counting them"""
+        for row in rows:
+            self.done += 1
+            if not self.done % 1000:
+                self.report()
+            yield row
+
+def count_loads(filters):
+    """Count the loads matching filters, from the rollup when it can answer exactly"""
+    if DailyWasteRollup.supports(filters):
+        return int(DailyWasteRollup.filtered_query(filters)
+                   .with_entities(func.coalesce(func.sum(DailyWasteRollup.load_count), 0)).scalar())
+    return WasteLoad.count_filtered(filters)
+
+def iter_export_rows(filters, batch_size):
+    """Yield export rows newest first, one keyset page at a time
+    
+    Each page is read completely before its rows are handed on, so no read cursor
+    stays open while progress is committed from another connection (which SQLite
+    would otherwise block until the export finished).
+    """
+    columns = EXPORT_COLUMNS + ('id',)
+    cursor = None
+    while True:
+        rows, cursor = WasteLoad.get_page(filters, cursor, batch_size, columns)
+        for row in rows:
+            yield tuple(row)[:-1]
+        if cursor is None:
+            return
+
+def write_job_output(job, filters, path, progress, batch_size):
+    """Produce the output file for a job"""
+    if job.kind == 'summary':
+        progress.report(total=4)
+        grouped_totals = WasteLoad.get_grouped_totals(filters)
+        progress.done = 1
+        monthly = build_trends(WasteLoad.get_daily_totals(filters, 'waste_type'), 'month')
+        progress.done = 2
+        yearly = build_trends(WasteLoad.get_daily_totals(filters, 'panchayath'), 'year')
+        progress.done = 3
+        progress.report(force=True)
+        write_summary_xlsx(path, grouped_totals, monthly, yearly)
+        progress.done = 4
+        return
+    
+    progress.report(total=count_loads(filters))
+    rows = progress.track(iter_export_rows(filters, batch_size))
+    if job.kind == 'xlsx':
+        write_xlsx(path, rows)
+        return
+    
+    chunks = generate_csv(rows)
+    if job.kind == 'csv.gz':
+        chunks = gzip_stream(chunks)
+    with open(path, 'wb') as output_file:
+        for chunk in chunks:
+            output_file.write(chunk)
+
+def run_job(job, filters, output_dir, batch_size=1000):
+    """Run a claimed job to completion, marking it done or failed"""
+    filename = job.id + JOB_KINDS[job.kind]
+    path = os.path.join(output_dir, filename)
+    partial_path = path + '.part'
+    progress = ProgressReporter(job.id)
+    started = time.perf_counter()
+    
+    try:
+        # The export itself only reads, so it can run on the replica
+        previous = use_read_replica()
+        try:
+            write_job_output(job, filters, partial_path, progress, batch_size)
+        finally:
+            use_read_replica(previous)
+        os.replace(partial_path, path)
+        db.session.rollback()
+        job.status = 'done'
+        job.progress = progress.done
+        job.filename = filename
+        job.download_name = DOWNLOAD_NAMES[job.kind].format(job.created_at)
+        job.finished_at = datetime.now()
+        db.session.commit()
+        logging.info(f"Job {job.id} ({job.kind}) finished in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Job {job.id} ({job.kind}) failed: {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        job.status = 'failed'
+        job.error = str(e)
+        job.finished_at = datetime.now()
+        db.session.commit()
+
+def work(parse_filters, output_dir, batch_size=1000, poll_interval=2.0, stale_after=600,
+         retention_days=7, once=False):
+    """Claim and run queued jobs until stopped, or until the queue is empty with once
+    
+    parse_filters turns a job's stored request arguments into WasteLoad.filtered_query() criteria.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    last_housekeeping = 0.0
+    
+    while True:
+        if time.monotonic() - last_housekeeping > 60:
+            requeued = Job.requeue_stale(stale_after)
+            if requeued:
+                logging.warning(f"Requeued {requeued} jobs from stopped workers")
+            for filename in Job.expire(retention_days):
+                try:
+                    os.remove(os.path.join(output_dir, filename))
+                except FileNotFoundError:
+                    pass
+            last_housekeeping = time.monotonic()
+        
+        job = Job.claim_next()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        
+        logging.info(f"Running job {job.id} ({job.kind}) for tenant {job.tenant_id}")
+        use_tenant(job.tenant_id)
+        run_job(job, parse_filters(job.params), output_dir, batch_size)
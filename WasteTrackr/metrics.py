@@ -0,0 +1,151 @@
+import bisect
+import logging
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Bucket upper bounds; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+slow_query_logger = logging.getLogger('wastetrackr.slow_query')
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram with one series per label set"""
+    
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, labels, value):
+        """Record one observation for the given label values"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # One slot per bucket plus +Inf, then the running sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+    
+    def render(self):
+        """Render the histogram in the Prometheus text exposition format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            label_text = ','.join(f'{name}="{escape_label(value)}"'
+                                  for name, value in zip(self.label_names, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class RequestMetrics:
+    """Per-process route latency and SQL query metrics
+    
+    SQLAlchemy cursor events count and time every statement run while a request is
+    active; Flask hooks turn them into per-endpoint histograms when the request ends.
+    Streamed responses are measured until the stream is closed. Each worker process
+    keeps its own counters, so scrape every worker (or sum across them).
+    """
+    
+    def __init__(self):
+        self.slow_query_seconds = None
+        self.request_duration = Histogram(
+            'wastetrackr_request_duration_seconds', 'Time spent handling a request.',
+            ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+        self.request_queries = Histogram(
+            'wastetrackr_request_queries', 'SQL statements executed per request.',
+            ('endpoint', 'method'), QUERY_COUNT_BUCKETS)
+        self.request_query_duration = Histogram(
+            'wastetrackr_request_query_duration_seconds', 'Time spent in SQL per request.',
+            ('endpoint', 'method'), LATENCY_BUCKETS)
+    
+    def init_app(self, app):
+        """Register the request hooks on app and the query hooks on every engine
+        
+        SLOW_QUERY_MS in the app config turns on the slow query log.
+        """
+        if app.config.get('SLOW_QUERY_MS'):
+            self.slow_query_seconds = float(app.config['SLOW_QUERY_MS']) / 1000
+        app.before_request(self._start_request)
+        app.after_request(self._finish_response)
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+    
+    def _start_request(self):
+        """Start the request clock and query counters"""
+        g.request_metrics = {'started': time.perf_counter(), 'queries': 0, 'query_seconds': 0.0}
+    
+    def _finish_response(self, response):
+        """Expose the timings so far in a Server-Timing header and record them once the response closes
+        
+        Streamed bodies keep running queries after this hook, so the histograms are
+        only updated when the server has finished sending the response.
+        """
+        state = g.get('request_metrics')
+        if state is None:
+            return response
+        response.headers['Server-Timing'] = (
+            f'db;dur={state["query_seconds"] * 1000:.1f};desc="{state["queries"]} queries", '
+            f'app;dur={(time.perf_counter() - state["started"]) * 1000:.1f}'
+        )
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+        status = str(response.status_code)
+        
+        def record():
+            self.request_duration.observe((endpoint, method, status), time.perf_counter() - state['started'])
+            self.request_queries.observe((endpoint, method), state['queries'])
+            self.request_query_duration.observe((endpoint, method), state['query_seconds'])
+        
+        response.call_on_close(record)
+        return response
+    
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        """Start timing a statement"""
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        """Count and time a statement, logging it if it was slow"""
+        started = conn.info['query_started'].pop()
+        elapsed = time.perf_counter() - started
+        state = g.get('request_metrics') if has_request_context() else None
+        if state is not None:
+            state['queries'] += 1
+            state['query_seconds'] += elapsed
+        if self.slow_query_seconds is not None and elapsed >= self.slow_query_seconds:
+            if executemany:
+                parameters = f"<{len(parameters)} parameter sets>"
+            slow_query_logger.warning(f"Slow query ({elapsed * 1000:.1f} ms): {statement} {parameters!r}")
+    
+    def _handle_error(self, exception_context):
+        """Drop the start time of a statement that failed"""
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+    
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for histogram in (self.request_duration, self.request_queries, self.request_query_duration):
+            lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
@@ -1,15 +1,481 @@
-from datetime import datetime
+import re
+import base64
+import heapq
+import logging
+import threading
+import uuid
+from time import monotonic
+from types import SimpleNamespace
+from itertools import islice
+from datetime import datetime, time, timedelta, timezone
+from flask import current_app, g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
+from flask_sqlalchemy.session import Session
+from sqlalchemy import column, inspect, literal, table, tuple_
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import DeclarativeBase, declared_attr, validates
 from sqlalchemy.sql import func
+from archive import ARCHIVE_COLUMNS, Archive, PartitionCache, tenant_folder
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+# Bind key of the optional read replica engine (DATABASE_READ_URL)
+READ_REPLICA = 'replica'
 
-class Organization(db.Model):
+class RoutingSession(Session):
+    """Session that runs reads on the read replica once use_read_replica() is called
+    
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary, so a view
+    that reads from the replica can still record writes.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not getattr(clause, 'is_dml', False)
+                and has_app_context() and g.get('read_replica')):
+            return self._db.engines[READ_REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
+
+def use_read_replica(enabled=True):
+    """Route the current app context's reads to the replica, if one is configured
+    
+    Returns the previous setting so callers can restore it.
+    """
+    previous = g.get('read_replica', False)
+    g.read_replica = enabled and READ_REPLICA in db.engines
+    return previous
+
+def use_tenant(tenant_id):
+    """Scope the current app context's queries and writes to one tenant
+    
+    Returns the previous tenant id so callers can restore it.
+    """
+    previous = g.get('tenant_id')
+    g.tenant_id = tenant_id
+    return previous
+
+def current_tenant_id():
+    """Get the id of the tenant the current app context is scoped to
+    
+    Raises RuntimeError while no tenant is selected, so a query can never silently
+    read every tenant's rows.
+    """
+    tenant_id = g.get('tenant_id')
+    if tenant_id is None:
+        raise RuntimeError("No tenant selected; call use_tenant() first")
+    return tenant_id
+
+class TenantScoped:
+    """Mixin for models whose rows belong to one tenant"""
+    
+    @declared_attr
+    def tenant_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('tenants.id'), nullable=False)
+    
+    @classmethod
+    def tenant_query(cls, *entities):
+        """Query entities (default: the model) over the current tenant's rows only"""
+        query = db.session.query(*entities) if entities else cls.query
+        return query.filter(cls.tenant_id == current_tenant_id())
+
+# Low-cardinality category columns stored as small integer ids into dimension_values
+DIMENSIONS = ('waste_type', 'material_category', 'destination')
+
+def dialect_insert(dialect_name):
+    """Get the INSERT construct supporting ON CONFLICT for a dialect, or None"""
+    return {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(dialect_name)
+
+class DimensionCache:
+    """In-process label <-> id mapping for dimension_values
+    
+    Labels are append-only, so the mapping never goes stale; an unknown id or label
+    just triggers a reload of the (tiny) table. Unknown labels usually come from
+    filter parameters, so they reload it at most once every MISS_RELOAD_SECONDS;
+    labels written by this process are registered by ensure() and never wait.
+    """
+    
+    MISS_RELOAD_SECONDS = 5.0
+    
+    def __init__(self):
+        self._ids = {}
+        self._labels = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+    
+    def load(self):
+        """Reload the whole mapping on a connection of its own"""
+        with db.engine.connect() as connection:
+            rows = connection.execute(db.select(DimensionValue.id, DimensionValue.dimension,
+                                                DimensionValue.label)).all()
+        with self._lock:
+            self._loaded_at = monotonic()
+            self._ids = {(dimension, label): value_id for value_id, dimension, label in rows}
+            self._labels = {(dimension, value_id): label for value_id, dimension, label in rows}
+    
+    def id_for(self, dimension, label):
+        """Get the id of a label, or None if the label has never been stored
+        
+        A label stored by another process may read as None for up to
+        MISS_RELOAD_SECONDS after this process last reloaded the mapping.
+        """
+        value_id = self._ids.get((dimension, label))
+        if value_id is None and (self._loaded_at is None or
+                                 monotonic() - self._loaded_at >= self.MISS_RELOAD_SECONDS):
+            self.load()
+            value_id = self._ids.get((dimension, label))
+        return value_id
+    
+    def label_for(self, dimension, value_id):
+        """Get the label stored under an id"""
+        label = self._labels.get((dimension, value_id))
+        if label is None:
+            self.load()
+            label = self._labels[(dimension, value_id)]
+        return label
+    
+    def ensure(self, rows):
+        """Register any new dimension labels used by rows (dicts of WasteLoad column values)
+        
+        Labels are committed on a separate connection before the rows are written, so
+        the cache never holds an id from a transaction that might roll back.
+        """
+        missing = {(dimension, row[dimension]) for row in rows for dimension in DIMENSIONS
+                   if (dimension, row[dimension]) not in self._ids}
+        if not missing:
+            return
+        with db.engine.begin() as connection:
+            DimensionValue.register(connection, missing)
+        self.load()
+
+dimension_cache = DimensionCache()
+
+class DimensionType(TypeDecorator):
+    """Stores a dimension label as a smallint id; Python code only ever sees labels
+    
+    Labels that were never stored bind as NULL, so filtering on them matches nothing
+    and inserting them fails the NOT NULL constraint (call dimension_cache.ensure() first).
+    """
+    impl = db.SmallInteger
+    cache_ok = True
+    
+    def __init__(self, dimension):
+        super().__init__()
+        self.dimension = dimension
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return dimension_cache.id_for(self.dimension, value)
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return dimension_cache.label_for(self.dimension, value)
+
+def migrate_dimension_columns():
+    """Convert legacy free-text waste_type/material_category/destination columns to ids
+    
+    Registers every label in dimension_values, fills the new *_id columns, then drops
+    the text columns and their indexes. Safe to call repeatedly; it does nothing once
+    the table has been converted. On PostgreSQL run VACUUM FULL waste_loads afterwards
+    to reclaim the space of the dropped columns.
+    """
+    with db.engine.begin() as connection:
+        inspector = inspect(connection)
+        if not inspector.has_table(WasteLoad.__tablename__):
+            return
+        existing_columns = {column['name'] for column in inspector.get_columns(WasteLoad.__tablename__)}
+        legacy = [dimension for dimension in DIMENSIONS if dimension in existing_columns]
+        if not legacy:
+            return
+        
+        DimensionValue.__table__.create(connection, checkfirst=True)
+        for dimension in legacy:
+            labels = connection.exec_driver_sql(
+                f'SELECT DISTINCT {dimension} FROM waste_loads WHERE {dimension} IS NOT NULL'
+            ).scalars().all()
+            DimensionValue.register(connection, {(dimension, label) for label in labels})
+        
+        for dimension in legacy:
+            if f'{dimension}_id' not in existing_columns:
+                connection.exec_driver_sql(
+                    f'ALTER TABLE waste_loads ADD COLUMN {dimension}_id SMALLINT REFERENCES dimension_values (id)'
+                )
+            connection.execute(
+                db.text(f'UPDATE waste_loads SET {dimension}_id = (SELECT id FROM dimension_values '
+                        f'WHERE dimension = :dimension AND label = waste_loads.{dimension})'),
+                {'dimension': dimension}
+            )
+        
+        for index in inspector.get_indexes(WasteLoad.__tablename__):
+            if set(index['column_names']) & set(legacy):
+                connection.exec_driver_sql(f"DROP INDEX {index['name']}")
+        for dimension in legacy:
+            connection.exec_driver_sql(f'ALTER TABLE waste_loads DROP COLUMN {dimension}')
+    
+    dimension_cache.load()
+    logging.info(f"Converted waste_loads columns {', '.join(legacy)} to dimension ids")
+
+def migrate_tenant_columns():
+    """Add tenant_id to tables created before tenancy, giving existing rows to the default tenant
+    
+    Indexes the models no longer declare (replaced by ones leading with tenant_id) are
+    dropped so sync_schema() can create their replacements. The daily rollup is derived
+    data, so it is dropped and init_db rebuilds it per tenant. Safe to call repeatedly;
+    it does nothing once every table has the column.
+    """
+    migrated = []
+    with db.engine.begin() as connection:
+        Tenant.__table__.create(connection, checkfirst=True)
+        default_id = Tenant.ensure_default(connection)
+        inspector = inspect(connection)
+        
+        for model in (Organization, WasteLoad, Job, LoadFlag, ImportCheckpoint):
+            table = model.__table__
+            if not inspector.has_table(table.name):
+                continue
+            if 'tenant_id' in {column['name'] for column in inspector.get_columns(table.name)}:
+                continue
+            # The foreign key is left to fresh tables: SQLite cannot add one with a non-NULL default
+            connection.exec_driver_sql(
+                f'ALTER TABLE {table.name} ADD COLUMN tenant_id INTEGER NOT NULL DEFAULT {default_id}'
+            )
+            if connection.dialect.name == 'postgresql':
+                connection.exec_driver_sql(f'ALTER TABLE {table.name} ALTER COLUMN tenant_id DROP DEFAULT')
+            declared = {index.name for index in table.indexes}
+            for index in inspector.get_indexes(table.name):
+                if index['name'] not in declared and not index.get('duplicates_constraint'):
+                    connection.exec_driver_sql(f"DROP INDEX {index['name']}")
+            migrated.append(table.name)
+        
+        # Checkpoints were unique by file path across tenants. SQLite cannot drop that
+        # constraint, so the (small) table is recreated keyed by tenant and path
+        checkpoints = ImportCheckpoint.__table__
+        if inspector.has_table(checkpoints.name) and any(
+                constraint['column_names'] == ['source']
+                for constraint in inspector.get_unique_constraints(checkpoints.name)):
+            rows = connection.execute(db.select(*(c for c in checkpoints.columns if c.name != 'id'))).mappings().all()
+            connection.exec_driver_sql(f'DROP TABLE {checkpoints.name}')
+            checkpoints.create(connection)
+            if rows:
+                connection.execute(db.insert(checkpoints), [dict(row) for row in rows])
+            logging.info(f"Keyed {len(rows)} import checkpoints by tenant and file")
+        
+        rollups = DailyWasteRollup.__tablename__
+        if inspector.has_table(rollups) and \
+                'tenant_id' not in {column['name'] for column in inspector.get_columns(rollups)}:
+            connection.exec_driver_sql(f'DROP TABLE {rollups}')
+            migrated.append(rollups)
+    
+    if migrated:
+        logging.info(f"Assigned existing rows of {', '.join(migrated)} to the default tenant")
+
+def sync_schema():
+    """Bring existing tables up to date with the models
+    
+    db.create_all() only creates missing tables, so this also adds missing nullable
+    columns and missing indexes to tables that already exist.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        # Trigram indexes on the search columns need pg_trgm before tables are created
+        try:
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except Exception as e:
+            logging.warning(f"Could not enable pg_trgm, substring search will not be indexed: {e}")
+    
+    db.create_all()
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for model_table in db.metadata.sorted_tables:
+            existing_columns = {column['name'] for column in inspector.get_columns(model_table.name)}
+            for model_column in model_table.columns:
+                if model_column.name not in existing_columns and model_column.nullable:
+                    column_type = model_column.type.compile(dialect=connection.dialect)
+                    connection.exec_driver_sql(
+                        f'ALTER TABLE {model_table.name} ADD COLUMN {model_column.name} {column_type}'
+                    )
+            for index in model_table.indexes:
+                index.create(connection, checkfirst=True)
+
+# SQLite stand-in for the PostgreSQL trigram indexes: an external-content FTS5 table
+# using the trigram tokenizer, kept in sync with waste_loads by triggers
+SEARCH_INDEX_TABLE = 'waste_loads_search'
+search_index = table(SEARCH_INDEX_TABLE, column('rowid'), column('vehicle_search'), column('panchayath'))
+_search_index_available = {}
+
+SQLITE_SEARCH_INDEX_DDL = (
+    f"""CREATE VIRTUAL TABLE {SEARCH_INDEX_TABLE} USING fts5(
+        vehicle_search, panchayath, content='waste_loads', content_rowid='id', tokenize='trigram')""",
+    f"""CREATE TRIGGER {SEARCH_INDEX_TABLE}_ai AFTER INSERT ON waste_loads BEGIN
+        INSERT INTO {SEARCH_INDEX_TABLE}(rowid, vehicle_search, panchayath)
+        VALUES (new.id, new.vehicle_search, new.panchayath);
+    END""",
+    f"""CREATE TRIGGER {SEARCH_INDEX_TABLE}_ad AFTER DELETE ON waste_loads BEGIN
+        INSERT INTO {SEARCH_INDEX_TABLE}({SEARCH_INDEX_TABLE}, rowid, vehicle_search, panchayath)
+        VALUES ('delete', old.id, old.vehicle_search, old.panchayath);
+    END""",
+    f"""CREATE TRIGGER {SEARCH_INDEX_TABLE}_au AFTER UPDATE ON waste_loads BEGIN
+        INSERT INTO {SEARCH_INDEX_TABLE}({SEARCH_INDEX_TABLE}, rowid, vehicle_search, panchayath)
+        VALUES ('delete', old.id, old.vehicle_search, old.panchayath);
+        INSERT INTO {SEARCH_INDEX_TABLE}(rowid, vehicle_search, panchayath)
+        VALUES (new.id, new.vehicle_search, new.panchayath);
+    END""",
+    f"INSERT INTO {SEARCH_INDEX_TABLE}({SEARCH_INDEX_TABLE}) VALUES ('rebuild')",
+)
+
+def ensure_search_index():
+    """Create the SQLite FTS5 trigram search index if it is missing
+    
+    PostgreSQL needs nothing here: its trigram GIN indexes are declared on the model.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    if inspect(db.engine).has_table(SEARCH_INDEX_TABLE):
+        return
+    try:
+        with db.engine.begin() as connection:
+            for statement in SQLITE_SEARCH_INDEX_DDL:
+                connection.exec_driver_sql(statement)
+        logging.info("SQLite trigram search index created")
+    except Exception as e:
+        logging.warning(f"SQLite FTS5 trigram search unavailable, substring search will scan: {e}")
+    _search_index_available.pop(db.engine.url, None)
+
+def has_search_index():
+    """Check (once per engine) whether the SQLite trigram search index exists"""
+    engine = db.engine
+    if engine.url not in _search_index_available:
+        _search_index_available[engine.url] = (engine.dialect.name == 'sqlite' and
+                                               inspect(engine).has_table(SEARCH_INDEX_TABLE))
+    return _search_index_available[engine.url]
+
+def explain(query):
+    """Get the database's query plan for a query as a list of text lines
+    
+    On PostgreSQL sequential scans are disabled for the EXPLAIN, so the plan shows
+    whether a usable index exists rather than what the planner prefers on a small table.
+    """
+    connection = db.session.connection()
+    statement = query.statement if hasattr(query, 'statement') else query
+    compiled = statement.compile(dialect=connection.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+        return [row[-1] for row in rows]
+    
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    rows = connection.exec_driver_sql(f'EXPLAIN {compiled}', params).fetchall()
+    return [row[0] for row in rows]
+
+_archives = {}
+_partition_caches = {}
+
+def get_archive():
+    """Get the current tenant's cold-load archive, or None while nothing is archived
+    
+    Queries merge archived loads in only when this returns an archive, so a
+    deployment that never archives runs exactly the same SQL as before. The
+    archives of all tenants share one ARCHIVE_CACHE_MB partition cache.
+    """
+    root = current_app.config.get('ARCHIVE_FOLDER')
+    if not root:
+        return None
+    folder = tenant_folder(root, current_tenant_id())
+    archive = _archives.get(folder)
+    if archive is None:
+        cache = _partition_caches.get(root)
+        if cache is None:
+            cache = _partition_caches[root] = PartitionCache(current_app.config.get('ARCHIVE_CACHE_MB', 256) * 1024 * 1024)
+        archive = _archives[folder] = Archive(folder, cache=cache)
+    return archive if archive else None
+
+def merge_newest_first(*streams):
+    """Merge streams of rows that are each ordered newest first by (datetime, id)"""
+    return heapq.merge(*streams, key=lambda row: (row.datetime, row.id), reverse=True)
+
+def encode_cursor(waste_load):
+    """Encode the (datetime, id) keyset position of a waste load as an opaque cursor"""
+    raw = f"{waste_load.datetime.isoformat()}|{waste_load.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor into a (datetime, id) tuple, raising ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        datetime_str, id_str = raw.split('|')
+        return datetime.fromisoformat(datetime_str), int(id_str)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+class Tenant(db.Model):
+    """A site (MRF or panchayath) served by this deployment
+    
+    Requests select their tenant by subdomain or header; every tenant-owned row
+    carries the tenant's id, and the indexes on those rows lead with it.
+    """
+    __tablename__ = 'tenants'
+    
+    # Rows written before tenancy belong to this tenant
+    DEFAULT_SLUG = 'default'
+    # Slugs are valid DNS labels, so every tenant can have a subdomain
+    SLUG_PATTERN = re.compile(r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(63), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=func.now())
+    
+    def __repr__(self):
+        return f'<Tenant {self.slug}>'
+    
+    @classmethod
+    def get_id(cls, slug):
+        """Get the id of the tenant with a slug, or None if there is none"""
+        return db.session.query(cls.id).filter(cls.slug == slug).scalar()
+    
+    @classmethod
+    def get_all(cls):
+        """Get every tenant, oldest first"""
+        return cls.query.order_by(cls.id).all()
+    
+    @classmethod
+    def create(cls, slug):
+        """Add a tenant; the caller commits
+        
+        Raises ValueError if the slug is not a lowercase DNS label or is already taken.
+        """
+        if not cls.SLUG_PATTERN.fullmatch(slug or ''):
+            raise ValueError("Tenant slugs are 1-63 lowercase letters, digits and inner hyphens")
+        if cls.get_id(slug) is not None:
+            raise ValueError(f"Tenant {slug!r} already exists")
+        tenant = cls(slug=slug)
+        db.session.add(tenant)
+        db.session.flush()
+        return tenant
+    
+    @classmethod
+    def ensure_default(cls, connection):
+        """Create the default tenant on connection if it does not exist yet; returns its id"""
+        query = db.select(cls.id).where(cls.slug == cls.DEFAULT_SLUG)
+        tenant_id = connection.execute(query).scalar()
+        if tenant_id is None:
+            connection.execute(db.insert(cls.__table__).values(slug=cls.DEFAULT_SLUG))
+            tenant_id = connection.execute(query).scalar()
+        return tenant_id
+
+class Organization(TenantScoped, db.Model):
+    """Name, description and logo of a tenant's site"""
     __tablename__ = 'organization'
+    __table_args__ = (
+        db.Index('ix_organization_tenant_id', 'tenant_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -33,25 +499,96 @@ class Organization(db.Model):
     
     @classmethod
     def get_current(cls):
-        """Get the current organization (assumes single organization setup)"""
-        return cls.query.first()
+        """Get the current tenant's organization"""
+        return cls.tenant_query().first()
+    
+    @classmethod
+    def logo_in_use(cls, logo_filename):
+        """Check whether any organization, of any tenant, still shows a stored logo
+        
+        Logos are stored under content hashes, so tenants uploading the same image share its files.
+        """
+        return db.session.query(cls.id).filter(cls.logo_filename == logo_filename).first() is not None
+    
+    @classmethod
+    def get_current_snapshot(cls):
+        """Get a detached, read-only copy of the current organization that is safe to cache"""
+        organization = cls.get_current()
+        if organization is None:
+            return None
+        return SimpleNamespace(**{column.name: getattr(organization, column.name)
+                                  for column in cls.__table__.columns})
 
-class WasteLoad(db.Model):
+class WasteLoad(TenantScoped, db.Model):
     __tablename__ = 'waste_loads'
+    __table_args__ = (
+        # Every query is scoped to one tenant, so the B-tree indexes lead with tenant_id.
+        # Backs the (datetime, id) keyset used for pagination
+        db.Index('ix_waste_loads_tenant_id_datetime_id', 'tenant_id', 'datetime', 'id'),
+        # Category filters combined with date ranges and the newest-first keyset
+        db.Index('ix_waste_loads_tenant_id_waste_type_id_datetime', 'tenant_id', 'waste_type', 'datetime', 'id'),
+        db.Index('ix_waste_loads_tenant_id_material_category_id_datetime', 'tenant_id', 'material_category',
+                 'datetime', 'id'),
+        db.Index('ix_waste_loads_tenant_id_destination_id_datetime', 'tenant_id', 'destination', 'datetime', 'id'),
+        # Latest loads of one vehicle, read to warm the anomaly detector
+        db.Index('ix_waste_loads_tenant_id_vehicle_search_datetime', 'tenant_id', 'vehicle_search', 'datetime'),
+        # Distinct vehicles and panchayaths of a tenant
+        db.Index('ix_waste_loads_tenant_id_vehicle_number', 'tenant_id', 'vehicle_number'),
+        db.Index('ix_waste_loads_tenant_id_panchayath', 'tenant_id', 'panchayath'),
+        # Offline sync retries are idempotent per tenant
+        db.Index('ix_waste_loads_tenant_id_client_uuid', 'tenant_id', 'client_uuid', unique=True),
+        # Leading-wildcard substring search on PostgreSQL (SQLite uses waste_loads_search); the
+        # matches are intersected with the tenant's rows
+        db.Index('ix_waste_loads_vehicle_search_trgm', 'vehicle_search', postgresql_using='gin',
+                 postgresql_ops={'vehicle_search': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('ix_waste_loads_panchayath_trgm', 'panchayath', postgresql_using='gin',
+                 postgresql_ops={'panchayath': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
+    
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 1000
+    
+    # Fields every submitted waste load must carry
+    REQUIRED_FIELDS = ('vehicle_number', 'datetime', 'waste_weight', 'waste_type', 'material_category', 'destination')
+    
+    # Columns /api/trends can group by
+    TREND_GROUPS = ('waste_type', 'material_category', 'destination', 'panchayath', 'vehicle_number')
+    
+    # Columns the JSON API selects, in to_dict() order
+    API_COLUMNS = ('id', 'vehicle_number', 'datetime', 'waste_weight', 'waste_type', 'material_category',
+                   'destination', 'panchayath', 'client_uuid', 'created_at')
     
     id = db.Column(db.Integer, primary_key=True)
-    vehicle_number = db.Column(db.String(20), nullable=False, index=True)
-    datetime = db.Column(db.DateTime, nullable=False, index=True)
+    vehicle_number = db.Column(db.String(20), nullable=False)
+    # Uppercased, punctuation-stripped vehicle number used for substring search
+    vehicle_search = db.Column(db.String(20), nullable=True)
+    datetime = db.Column(db.DateTime, nullable=False)
     waste_weight = db.Column(db.Float, nullable=False)
-    waste_type = db.Column(db.String(20), nullable=False)
-    material_category = db.Column(db.String(50), nullable=False)
-    destination = db.Column(db.String(50), nullable=False)
-    panchayath = db.Column(db.String(100), nullable=True, index=True)
+    # Category labels are stored as smallint ids into dimension_values
+    waste_type = db.Column('waste_type_id', DimensionType('waste_type'), db.ForeignKey('dimension_values.id'),
+                           key='waste_type', nullable=False)
+    material_category = db.Column('material_category_id', DimensionType('material_category'),
+                                  db.ForeignKey('dimension_values.id'), key='material_category', nullable=False)
+    destination = db.Column('destination_id', DimensionType('destination'), db.ForeignKey('dimension_values.id'),
+                            key='destination', nullable=False)
+    panchayath = db.Column(db.String(100), nullable=True)
+    # Client-generated UUID that makes offline sync retries idempotent
+    client_uuid = db.Column(db.String(36), nullable=True)
     created_at = db.Column(db.DateTime, default=func.now())
     
     def __repr__(self):
         return f'<WasteLoad {self.vehicle_number} - {self.waste_weight}kg>'
     
+    @staticmethod
+    def normalize_vehicle_number(vehicle_number):
+        """Normalize a vehicle number for search: uppercase letters and digits only"""
+        return re.sub(r'[^A-Z0-9]', '', (vehicle_number or '').upper())
+    
+    @validates('vehicle_number')
+    def _sync_vehicle_search(self, key, vehicle_number):
+        self.vehicle_search = self.normalize_vehicle_number(vehicle_number)
+        return vehicle_number
+    
     def to_dict(self):
         """Convert model instance to dictionary for JSON serialization"""
         return {
@@ -63,39 +600,219 @@ class WasteLoad(db.Model):
             'material_category': self.material_category,
             'destination': self.destination,
             'panchayath': self.panchayath,
+            'client_uuid': self.client_uuid,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
     
+    @staticmethod
+    def row_to_dict(row):
+        """Convert an API_COLUMNS row tuple to the to_dict() layout without loading an ORM object
+        
+        created_at is left as a datetime for the JSON encoder, which writes the same
+        ISO 8601 text as to_dict().
+        """
+        load_id, vehicle_number, load_datetime, waste_weight, waste_type, material_category, \
+            destination, panchayath, client_uuid, created_at = row
+        return {
+            'id': load_id,
+            'vehicle_number': vehicle_number,
+            'datetime': load_datetime.isoformat(timespec='minutes'),
+            'waste_weight': waste_weight,
+            'waste_type': waste_type,
+            'material_category': material_category,
+            'destination': destination,
+            'panchayath': panchayath,
+            'client_uuid': client_uuid,
+            'created_at': created_at
+        }
+    
+    @classmethod
+    def from_archived(cls, row):
+        """Build a transient, read-only WasteLoad from an archived ARCHIVE_COLUMNS row"""
+        return cls(**row._asdict())
+    
+    @classmethod
+    def archive_filters(cls, filters):
+        """Translate filtered_query() criteria for Archive queries, which match the normalized vehicle number"""
+        archive_filters = dict(filters or {})
+        if archive_filters.get('vehicle_number'):
+            archive_filters['vehicle_search'] = cls.normalize_vehicle_number(archive_filters['vehicle_number'])
+        return archive_filters
+    
+    @classmethod
+    def parse_values(cls, data):
+        """Validate submitted waste load data and convert it to column values for the current tenant
+        
+        Raises ValueError describing the first problem found.
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Waste load must be an object")
+        
+        missing = [field for field in cls.REQUIRED_FIELDS if not str(data.get(field) or '').strip()]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+        
+        datetime_str = str(data['datetime']).strip()
+        datetime_obj = None
+        # fromisoformat is much cheaper than strptime and covers both accepted layouts
+        if len(datetime_str) == 16 and datetime_str[10] in 'T ':
+            try:
+                datetime_obj = datetime.fromisoformat(datetime_str)
+            except ValueError:
+                pass
+        if datetime_obj is None:
+            raise ValueError("datetime must be in YYYY-MM-DDTHH:MM format")
+        
+        try:
+            weight_float = float(data['waste_weight'])
+        except (TypeError, ValueError):
+            raise ValueError("waste_weight must be a number")
+        if not weight_float > 0:
+            raise ValueError("waste_weight must be positive")
+        
+        vehicle_number = str(data['vehicle_number']).strip()
+        return {
+            'tenant_id': current_tenant_id(),
+            'vehicle_number': vehicle_number,
+            'vehicle_search': cls.normalize_vehicle_number(vehicle_number),
+            'datetime': datetime_obj,
+            'waste_weight': weight_float,
+            'waste_type': str(data['waste_type']).strip(),
+            'material_category': str(data['material_category']).strip(),
+            'destination': str(data['destination']).strip(),
+            'panchayath': str(data.get('panchayath') or '').strip()
+        }
+    
     @classmethod
-    def get_summary_stats(cls):
-        """Get summary statistics for all waste loads"""
-        from sqlalchemy import func
+    def get_recent_weights(cls, tenant_id, vehicle_search, limit):
+        """Get (datetime, waste_weight) of a tenant's vehicle's latest loads, newest first"""
+        return (db.session.query(cls.datetime, cls.waste_weight)
+                .filter(cls.tenant_id == tenant_id, cls.vehicle_search == vehicle_search)
+                .order_by(cls.datetime.desc())
+                .limit(limit)
+                .all())
+    
+    @classmethod
+    def get_ids_by_client_uuid(cls, client_uuids):
+        """Get {client_uuid: id} for the given client UUIDs that are stored"""
+        if not client_uuids:
+            return {}
+        rows = cls.tenant_query(cls.client_uuid, cls.id).filter(cls.client_uuid.in_(list(client_uuids))).all()
+        return dict(rows)
+    
+    @classmethod
+    def get_existing_client_uuids(cls, client_uuids):
+        """Get the subset of the given client UUIDs that are already stored"""
+        if not client_uuids:
+            return set()
+        rows = cls.tenant_query(cls.client_uuid).filter(cls.client_uuid.in_(list(client_uuids))).all()
+        return {client_uuid for client_uuid, in rows}
+    
+    @classmethod
+    def get_summary_stats(cls, grouped_totals=None):
+        """Get summary statistics for all of the current tenant's waste loads
         
-        total_loads = db.session.query(func.count(cls.id)).scalar() or 0
-        total_weight = db.session.query(func.sum(cls.waste_weight)).scalar() or 0.0
-        unique_vehicles = db.session.query(func.count(func.distinct(cls.vehicle_number))).scalar() or 0
-        unique_waste_types = db.session.query(func.count(func.distinct(cls.waste_type))).scalar() or 0
+        Load and weight totals come from the daily rollup, which also covers archived
+        loads (or from grouped_totals, an unfiltered get_grouped_totals() result, when
+        given); only the distinct vehicle count needs waste_loads, and that is answered
+        from the vehicle_number index (merged with the archive's vehicle list).
+        """
+        totals = DailyWasteRollup.get_summary_totals(grouped_totals=grouped_totals)
+        archive = get_archive()
+        if archive:
+            live_vehicles = {vehicle_number for vehicle_number, in cls.tenant_query(cls.vehicle_number).distinct()}
+            unique_vehicles = len(live_vehicles.union(archive.vehicles()))
+        else:
+            unique_vehicles = cls.tenant_query(func.count(func.distinct(cls.vehicle_number))).scalar() or 0
         
         return {
-            'total_loads': total_loads,
-            'total_weight': float(total_weight),
+            'total_loads': totals['total_loads'],
+            'total_weight': totals['total_weight'],
             'unique_vehicles': unique_vehicles,
-            'unique_waste_types': unique_waste_types
+            'unique_waste_types': totals['unique_waste_types']
         }
     
     @classmethod
-    def get_all_ordered(cls):
-        """Get all waste loads ordered by datetime descending"""
-        return cls.query.order_by(cls.datetime.desc()).all()
+    def get_grouped_totals(cls, filters=None):
+        """Get load counts and weight sums per waste type, material category and destination
+        
+        Served from the daily rollup when the filters allow it; otherwise runs one
+        GROUP BY query per dimension over the filtered loads. Either way only a handful
+        of rows come back regardless of how many loads match.
+        Returns {dimension: {label: (load_count, total_weight)}}.
+        """
+        filters = filters or {}
+        if DailyWasteRollup.supports(filters):
+            return DailyWasteRollup.get_grouped_totals(filters)
+        
+        query = cls.filtered_query(filters)
+        totals = {}
+        for name in DailyWasteRollup.CHART_DIMENSIONS:
+            column = getattr(cls, name)
+            rows = (query.with_entities(column, func.count(cls.id), func.sum(cls.waste_weight))
+                    .group_by(column)
+                    .all())
+            totals[name] = {label: (count, float(weight or 0.0)) for label, count, weight in rows}
+        
+        archive = get_archive()
+        if archive:
+            archived_totals = archive.grouped_totals(cls.archive_filters(filters), DailyWasteRollup.CHART_DIMENSIONS)
+            for name, archived in archived_totals.items():
+                for label, (count, weight) in archived.items():
+                    live_count, live_weight = totals[name].get(label, (0, 0.0))
+                    totals[name][label] = (live_count + count, live_weight + weight)
+        
+        return totals
+    
+    @classmethod
+    def get_daily_totals(cls, filters=None, group_by=None):
+        """Get (day, group, load_count, total_weight) rows bucketed by day in SQL
+        
+        group_by names one of TREND_GROUPS; without it every row's group is ''.
+        Served from the daily rollup when it can answer the filters and grouping exactly.
+        """
+        filters = filters or {}
+        if group_by != 'vehicle_number' and DailyWasteRollup.supports(filters):
+            return DailyWasteRollup.get_daily_totals(filters, group_by)
+        
+        day = func.date(cls.datetime, type_=db.Date)
+        group_columns = [getattr(cls, group_by)] if group_by else []
+        rows = (cls.filtered_query(filters)
+                .with_entities(day, *(group_columns or [literal('')]), func.count(cls.id), func.sum(cls.waste_weight))
+                .group_by(day, *group_columns)
+                .all())
+        
+        archive = get_archive()
+        if archive:
+            # A day can have loads in both tiers; callers sum rows with the same key
+            rows += archive.daily_totals(cls.archive_filters(filters), group_by)
+        return rows
+    
+    @classmethod
+    def count_filtered(cls, filters):
+        """Count the loads matching filters in the live table and the archive"""
+        count = cls.filtered_query(filters).count()
+        archive = get_archive()
+        if archive:
+            count += archive.count(cls.archive_filters(filters))
+        return count
     
     @classmethod
-    def search_and_filter(cls, filters):
-        """Search and filter waste loads based on criteria"""
-        query = cls.query
+    def filtered_query(cls, filters):
+        """Build an unordered query over the current tenant's loads applying the search and filter criteria"""
+        vehicle_search = cls.normalize_vehicle_number(filters.get('vehicle_number') or '')
+        panchayath = filters.get('panchayath') or ''
+        if any(cls.uses_search_index(term) for term in (vehicle_search, panchayath)):
+            # Drive the query from the trigram matches: tenant_id + 0 cannot use the
+            # tenant-leading indexes, so SQLite looks the matching ids up by primary key
+            # instead of walking the tenant's datetime index and probing every row
+            query = cls.query.filter(cls.tenant_id + 0 == current_tenant_id())
+        else:
+            query = cls.tenant_query()
         
-        # Vehicle number search
-        if filters.get('vehicle_number'):
-            query = query.filter(cls.vehicle_number.ilike(f"%{filters['vehicle_number']}%"))
+        # Vehicle number search, ignoring case and punctuation
+        if vehicle_search:
+            query = query.filter(cls.substring_match('vehicle_search', vehicle_search))
         
         # Date range filtering
         if filters.get('date_from'):
@@ -116,7 +833,636 @@ class WasteLoad(db.Model):
             query = query.filter(cls.material_category == filters['material_category'])
         if filters.get('destination'):
             query = query.filter(cls.destination == filters['destination'])
-        if filters.get('panchayath'):
-            query = query.filter(cls.panchayath.ilike(f"%{filters['panchayath']}%"))
+        if panchayath:
+            query = query.filter(cls.substring_match('panchayath', panchayath))
+        
+        return query
+    
+    @staticmethod
+    def uses_search_index(term):
+        """Check whether substring_match() answers a term from the SQLite trigram index"""
+        return len(term) >= 3 and not set(term) & set('%_') and has_search_index()
+    
+    @classmethod
+    def substring_match(cls, column_name, term):
+        """Build a case-insensitive substring condition that can use a trigram index
+        
+        PostgreSQL answers ILIKE from the gin_trgm_ops indexes directly. On SQLite the
+        FTS5 trigram table answers LIKE for terms of three or more characters; shorter
+        terms and LIKE wildcards fall back to scanning.
+        """
+        if cls.uses_search_index(term):
+            matching_ids = db.select(search_index.c.rowid).where(
+                search_index.c[column_name].like(f"%{term}%")
+            )
+            return cls.id.in_(matching_ids)
+        return getattr(cls, column_name).ilike(f"%{term}%")
+    
+    @classmethod
+    def backfill_search_columns(cls, batch_size=5000):
+        """Fill vehicle_search for rows written before the column existed"""
+        updated = 0
+        while True:
+            rows = (db.session.query(cls.id, cls.vehicle_number)
+                    .filter(cls.vehicle_search.is_(None))
+                    .limit(batch_size)
+                    .all())
+            if not rows:
+                return updated
+            db.session.execute(
+                db.update(cls.__table__).where(cls.__table__.c.id == db.bindparam('row_id')),
+                [{'row_id': row_id, 'vehicle_search': cls.normalize_vehicle_number(vehicle_number)}
+                 for row_id, vehicle_number in rows]
+            )
+            db.session.commit()
+            updated += len(rows)
+    
+    @classmethod
+    def move_to_archive(cls, archive, cutoff, report=None):
+        """Move the current tenant's loads dated before cutoff into its archive, one month at a time
         
-        return query.order_by(cls.datetime.desc()).all()
\ No newline at end of file
+        Each month's partition and the manifest are written before its rows are deleted,
+        so an interrupted run leaves at worst loads present in both tiers, which the
+        next run resolves. The daily rollup keeps counting archived loads. Returns the
+        number of loads moved.
+        """
+        columns = [getattr(cls, name) for name in ARCHIVE_COLUMNS] + [cls.vehicle_search]
+        moved = 0
+        while True:
+            oldest = cls.tenant_query(func.min(cls.datetime)).filter(cls.datetime < cutoff).scalar()
+            if oldest is None:
+                return moved
+            month_start = datetime(oldest.year, oldest.month, 1)
+            month_end = datetime(oldest.year + oldest.month // 12, oldest.month % 12 + 1, 1)
+            rows = (cls.tenant_query(*columns)
+                    .filter(cls.datetime >= month_start, cls.datetime < min(month_end, cutoff))
+                    .all())
+            entry = archive.add([tuple(row) for row in rows])
+            
+            ids = [row.id for row in rows]
+            for start in range(0, len(ids), 500):
+                db.session.execute(db.delete(cls.__table__).where(cls.__table__.c.id.in_(ids[start:start + 500])))
+            DataVersion.bump()
+            db.session.commit()
+            moved += len(rows)
+            if report:
+                report(f"Archived {len(rows)} loads from {entry['month']} "
+                       f"({entry['rows']} in partition, {entry['bytes'] / 1024:.0f} KiB)")
+    
+    @classmethod
+    def iter_rows(cls, columns, filters=None, batch_size=1000, cursor=None, limit=None):
+        """Stream filtered loads newest first as plain column tuples
+        
+        Rows are fetched batch_size at a time through a server-side cursor where the
+        driver supports one, so memory stays flat however many rows match. Archived
+        loads are merged in month by month. A page cursor starts the stream after that
+        position; raises ValueError if malformed.
+        """
+        filters = filters or {}
+        query = cls.filtered_query(filters)
+        position = decode_cursor(cursor) if cursor else None
+        if position:
+            query = query.filter(tuple_(cls.datetime, cls.id) < tuple_(*position))
+        
+        # Merging needs each row's (datetime, id); they are dropped again afterwards
+        archive = get_archive()
+        selected = tuple(columns)
+        if archive:
+            selected += tuple(name for name in ('datetime', 'id') if name not in columns)
+        
+        rows = (query
+                .with_entities(*[getattr(cls, column) for column in selected])
+                .order_by(cls.datetime.desc(), cls.id.desc())
+                .execution_options(yield_per=batch_size))
+        if limit:
+            rows = rows.limit(limit)
+        if not archive:
+            return rows
+        
+        rows = merge_newest_first(rows, archive.iter_rows(selected, cls.archive_filters(filters), position, batch_size))
+        if limit:
+            rows = islice(rows, limit)
+        if len(selected) > len(columns):
+            rows = (tuple(row)[:len(columns)] for row in rows)
+        return rows
+    
+    @classmethod
+    def page_query(cls, filters=None, cursor=None, limit=None, columns=None):
+        """Build the keyset page query used by get_page(), fetching limit + 1 rows
+        
+        Selects only the named columns as tuples when columns is given (they must
+        include datetime and id). Raises ValueError if the cursor is malformed.
+        """
+        limit = max(1, min(limit or cls.DEFAULT_PAGE_SIZE, cls.MAX_PAGE_SIZE))
+        query = cls.filtered_query(filters or {})
+        
+        if cursor:
+            cursor_datetime, cursor_id = decode_cursor(cursor)
+            query = query.filter(tuple_(cls.datetime, cls.id) < tuple_(cursor_datetime, cursor_id))
+        if columns:
+            query = query.with_entities(*[getattr(cls, column) for column in columns])
+        
+        # Fetch one extra row to find out whether another page follows
+        return query.order_by(cls.datetime.desc(), cls.id.desc()).limit(limit + 1)
+    
+    @classmethod
+    def get_page(cls, filters=None, cursor=None, limit=None, columns=None):
+        """Get one page of live and archived waste loads, newest first, using keyset pagination on (datetime, id)
+        
+        Returns a (waste_loads, next_cursor) tuple where next_cursor is None on the last page;
+        waste_loads are row tuples instead of model instances when columns is given.
+        Raises ValueError if the cursor is malformed.
+        """
+        limit = max(1, min(limit or cls.DEFAULT_PAGE_SIZE, cls.MAX_PAGE_SIZE))
+        waste_loads = cls.page_query(filters, cursor, limit, columns).all()
+        
+        archive = get_archive()
+        if archive:
+            archived = archive.iter_rows(columns or ARCHIVE_COLUMNS, cls.archive_filters(filters),
+                                         decode_cursor(cursor) if cursor else None, limit + 1)
+            if not columns:
+                archived = map(cls.from_archived, archived)
+            waste_loads = list(islice(merge_newest_first(waste_loads, archived), limit + 1))
+        
+        next_cursor = None
+        if len(waste_loads) > limit:
+            waste_loads = waste_loads[:limit]
+            next_cursor = encode_cursor(waste_loads[-1])
+        
+        return waste_loads, next_cursor
+
+class DailyWasteRollup(TenantScoped, db.Model):
+    """Load counts and weight totals per tenant, day and category, maintained alongside waste_loads"""
+    __tablename__ = 'waste_daily_rollups'
+    __table_args__ = (
+        # Also serves each tenant's date range queries
+        db.UniqueConstraint('tenant_id', 'day', 'waste_type', 'material_category', 'destination', 'panchayath',
+                            name='uq_waste_daily_rollups_key'),
+    )
+    
+    KEY_COLUMNS = ('tenant_id', 'day', 'waste_type', 'material_category', 'destination', 'panchayath')
+    CHART_DIMENSIONS = DIMENSIONS
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    waste_type = db.Column(db.String(20), nullable=False)
+    material_category = db.Column(db.String(50), nullable=False)
+    destination = db.Column(db.String(50), nullable=False)
+    panchayath = db.Column(db.String(100), nullable=False, default='')
+    load_count = db.Column(db.Integer, nullable=False, default=0)
+    total_weight = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f'<DailyWasteRollup {self.day} {self.waste_type}/{self.material_category} - {self.load_count} loads>'
+    
+    @classmethod
+    def add_loads(cls, rows):
+        """Add waste load rows (dicts of WasteLoad column values) to the rollup
+        
+        Runs inside the caller's transaction, so the rollup commits or rolls back
+        together with the loads themselves.
+        """
+        increments = {}
+        for row in rows:
+            key = (row['tenant_id'], row['datetime'].date(), row['waste_type'], row['material_category'],
+                   row['destination'], row.get('panchayath') or '')
+            count, weight = increments.get(key, (0, 0.0))
+            increments[key] = (count + 1, weight + float(row['waste_weight']))
+        
+        cls.add_totals([(*key, count, weight) for key, (count, weight) in increments.items()])
+    
+    @classmethod
+    def add_totals(cls, totals):
+        """Add (tenant_id, day, waste_type, material_category, destination, panchayath, load_count,
+        total_weight) tuples to the rollup, inside the caller's transaction"""
+        if not totals:
+            return
+        
+        values = [dict(zip(cls.KEY_COLUMNS, key), load_count=count, total_weight=weight)
+                  for *key, count, weight in totals]
+        
+        insert = dialect_insert(db.session.get_bind().dialect.name)
+        if insert:
+            # One statement executed for every row; a single multi-VALUES insert would
+            # exceed SQLite's bind variable limit on large import chunks
+            table = cls.__table__
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(cls.KEY_COLUMNS),
+                set_={
+                    'load_count': table.c.load_count + stmt.excluded.load_count,
+                    'total_weight': table.c.total_weight + stmt.excluded.total_weight
+                }
+            )
+            db.session.execute(stmt, values)
+            return
+        
+        # Portable fallback for databases without INSERT ... ON CONFLICT
+        for value in values:
+            rollup = cls.query.filter_by(**{column: value[column] for column in cls.KEY_COLUMNS}).first()
+            if rollup:
+                rollup.load_count += value['load_count']
+                rollup.total_weight += value['total_weight']
+            else:
+                db.session.add(cls(**value))
+        db.session.flush()
+    
+    @classmethod
+    def rebuild(cls):
+        """Regenerate the current tenant's rollup from waste_loads and its archive; the caller commits"""
+        tenant_id = current_tenant_id()
+        day = func.date(WasteLoad.datetime)
+        panchayath = func.coalesce(WasteLoad.panchayath, '')
+        labels = {dimension: db.aliased(DimensionValue) for dimension in DIMENSIONS}
+        label_columns = [labels[dimension].label for dimension in DIMENSIONS]
+        
+        grouped = db.select(WasteLoad.tenant_id, day, *label_columns, panchayath,
+                            func.count(WasteLoad.id), func.sum(WasteLoad.waste_weight)).select_from(WasteLoad)
+        for dimension in DIMENSIONS:
+            grouped = grouped.join(labels[dimension], labels[dimension].id == getattr(WasteLoad, dimension))
+        grouped = (grouped.where(WasteLoad.tenant_id == tenant_id)
+                   .group_by(WasteLoad.tenant_id, day, *label_columns, panchayath))
+        
+        db.session.execute(db.delete(cls).where(cls.tenant_id == tenant_id))
+        db.session.execute(db.insert(cls).from_select(
+            list(cls.KEY_COLUMNS) + ['load_count', 'total_weight'], grouped
+        ))
+        
+        archive = get_archive()
+        if archive:
+            archived_totals = archive.rollup_totals()
+            while True:
+                batch = [(tenant_id, *totals) for totals in islice(archived_totals, 1000)]
+                if not batch:
+                    break
+                cls.add_totals(batch)
+    
+    @classmethod
+    def supports(cls, filters):
+        """Check whether the rollup can answer a filtered_query() criteria dict exactly
+        
+        Category filters are exact matches and date bounds must fall on whole days;
+        substring and weight filters need the individual loads.
+        """
+        allowed = {'date_from', 'date_to'} | set(cls.CHART_DIMENSIONS)
+        if not set(key for key, value in filters.items() if value) <= allowed:
+            return False
+        if filters.get('date_from') and filters['date_from'].time() != time.min:
+            return False
+        if filters.get('date_to') and filters['date_to'].time() != time.max:
+            return False
+        return True
+    
+    @classmethod
+    def filtered_query(cls, filters):
+        """Build a query over the current tenant's rollup for filters accepted by supports()"""
+        query = cls.tenant_query()
+        if filters.get('date_from'):
+            query = query.filter(cls.day >= filters['date_from'].date())
+        if filters.get('date_to'):
+            query = query.filter(cls.day <= filters['date_to'].date())
+        for name in cls.CHART_DIMENSIONS:
+            if filters.get(name):
+                query = query.filter(getattr(cls, name) == filters[name])
+        return query
+    
+    @classmethod
+    def get_grouped_totals(cls, filters=None):
+        """Get {dimension: {label: (load_count, total_weight)}} from the rollup
+        
+        Runs a single GROUP BY over every chart dimension at once, which returns one row
+        per label combination (a few dozen at most), and sums each dimension's totals
+        from those rows, so the rollup is scanned once instead of once per dimension.
+        """
+        columns = [getattr(cls, name) for name in cls.CHART_DIMENSIONS]
+        rows = (cls.filtered_query(filters or {})
+                .with_entities(*columns, func.sum(cls.load_count), func.sum(cls.total_weight))
+                .group_by(*columns)
+                .all())
+        totals = {name: {} for name in cls.CHART_DIMENSIONS}
+        for *labels, count, weight in rows:
+            for name, label in zip(cls.CHART_DIMENSIONS, labels):
+                label_count, label_weight = totals[name].get(label, (0, 0.0))
+                totals[name][label] = (label_count + int(count), label_weight + float(weight or 0.0))
+        return totals
+    
+    @classmethod
+    def get_daily_totals(cls, filters=None, group_by=None):
+        """Get (day, group, load_count, total_weight) rows for filters accepted by supports()"""
+        group_columns = [getattr(cls, group_by)] if group_by else []
+        return (cls.filtered_query(filters or {})
+                .with_entities(cls.day, *(group_columns or [literal('')]),
+                               func.sum(cls.load_count), func.sum(cls.total_weight))
+                .group_by(cls.day, *group_columns)
+                .all())
+    
+    @classmethod
+    def get_distinct_values(cls):
+        """Get the sorted distinct category and panchayath values for filter dropdowns
+        
+        The rollup holds every combination that occurs in waste_loads, so SELECT DISTINCT
+        over it gives the same answer while reading far fewer rows.
+        """
+        def distinct(column):
+            return [value for value, in cls.tenant_query(column).distinct().order_by(column) if value]
+        
+        return {
+            'waste_types': distinct(cls.waste_type),
+            'material_categories': distinct(cls.material_category),
+            'destinations': distinct(cls.destination),
+            'panchayaths': distinct(cls.panchayath)
+        }
+    
+    @classmethod
+    def get_summary_totals(cls, filters=None, grouped_totals=None):
+        """Get total loads, total weight and distinct waste types from the rollup
+        
+        Callers that already hold get_grouped_totals() for the same filters can pass
+        it; the totals are then derived from it without another pass over the rollup.
+        """
+        if grouped_totals is not None:
+            by_type = grouped_totals['waste_type'].values()
+            return {
+                'total_loads': sum(count for count, _ in by_type),
+                'total_weight': sum(weight for _, weight in by_type),
+                'unique_waste_types': len(by_type)
+            }
+        
+        query = cls.filtered_query(filters or {})
+        total_loads, total_weight, unique_waste_types = query.with_entities(
+            func.sum(cls.load_count), func.sum(cls.total_weight), func.count(func.distinct(cls.waste_type))
+        ).one()
+        return {
+            'total_loads': int(total_loads or 0),
+            'total_weight': float(total_weight or 0.0),
+            'unique_waste_types': unique_waste_types or 0
+        }
+
+class ImportCheckpoint(TenantScoped, db.Model):
+    """Progress of a bulk CSV import into one tenant, committed together with each imported chunk"""
+    __tablename__ = 'import_checkpoints'
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'source', name='uq_import_checkpoints_tenant_id_source'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(500), nullable=False)
+    file_size = db.Column(db.BigInteger, nullable=False)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    rows_imported = db.Column(db.Integer, nullable=False, default=0)
+    rows_rejected = db.Column(db.Integer, nullable=False, default=0)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f'<ImportCheckpoint {self.source} - {self.rows_done} rows>'
+
+class DataVersion(db.Model):
+    """Per-tenant counter bumped in every write transaction, one row per tenant keyed by tenant id
+    
+    Read-only views derive ETags and response cache keys from it, so unchanged data
+    can be answered with a 304 or a cached response without re-running queries, and
+    writes to one tenant leave the other tenants' caches warm.
+    """
+    __tablename__ = 'data_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)  # UTC
+    
+    def __repr__(self):
+        return f'<DataVersion {self.version}>'
+    
+    @classmethod
+    def ensure(cls, tenant_id):
+        """Create a tenant's counter row if it does not exist yet"""
+        if db.session.get(cls, tenant_id) is None:
+            db.session.add(cls(id=tenant_id, version=0, updated_at=datetime.now(timezone.utc).replace(tzinfo=None)))
+            db.session.commit()
+    
+    @classmethod
+    def bump(cls):
+        """Increment the current tenant's version inside the caller's transaction"""
+        tenant_id = current_tenant_id()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        result = db.session.execute(
+            db.update(cls).where(cls.id == tenant_id).values(version=cls.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            db.session.add(cls(id=tenant_id, version=1, updated_at=now))
+    
+    @classmethod
+    def get(cls):
+        """Get the current tenant's (version, updated_at) pair"""
+        row = db.session.query(cls.version, cls.updated_at).filter(cls.id == current_tenant_id()).first()
+        if row is None:
+            return 0, None
+        return row.version, row.updated_at.replace(tzinfo=timezone.utc)
+
+class Job(TenantScoped, db.Model):
+    """Background export or report, queued by the web app and run by `flask run-jobs` workers
+    
+    The jobs table is the queue: workers claim queued rows with a conditional UPDATE,
+    so any number of worker processes can share it without an external broker. One
+    queue serves every tenant; a job runs scoped to the tenant that queued it.
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_created_at', 'status', 'created_at'),
+        db.Index('ix_jobs_tenant_id_created_at', 'tenant_id', 'created_at'),
+    )
+    
+    STATUSES = ('queued', 'running', 'done', 'failed')
+    
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    kind = db.Column(db.String(20), nullable=False)
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(10), nullable=False, default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=True)
+    filename = db.Column(db.String(255), nullable=True)
+    download_name = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+    
+    def to_dict(self):
+        """Convert job to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    @classmethod
+    def get_recent(cls, limit=20):
+        """Get the current tenant's most recently submitted jobs"""
+        return cls.tenant_query().order_by(cls.created_at.desc()).limit(limit).all()
+    
+    @classmethod
+    def get_for_tenant(cls, job_id):
+        """Get one of the current tenant's jobs by id, or None"""
+        return cls.tenant_query().filter(cls.id == job_id).first()
+    
+    @classmethod
+    def claim_next(cls):
+        """Atomically mark the oldest queued job as running and return it, or None
+        
+        The UPDATE only succeeds while the row is still queued, so two workers racing
+        for the same job cannot both claim it.
+        """
+        while True:
+            job_id = (db.session.query(cls.id).filter(cls.status == 'queued')
+                      .order_by(cls.created_at).limit(1).scalar())
+            if job_id is None:
+                db.session.commit()
+                return None
+            now = datetime.now()
+            claimed = db.session.execute(
+                db.update(cls).where(cls.id == job_id, cls.status == 'queued')
+                .values(status='running', started_at=now, heartbeat_at=now, progress=0)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(cls, job_id)
+    
+    @classmethod
+    def record_progress(cls, job_id, progress, total=None):
+        """Store progress on a separate connection so it is visible while the job's own transaction runs"""
+        values = {'progress': progress, 'heartbeat_at': datetime.now()}
+        if total is not None:
+            values['total'] = total
+        with db.engine.begin() as connection:
+            connection.execute(db.update(cls).where(cls.id == job_id).values(**values))
+    
+    @classmethod
+    def requeue_stale(cls, stale_after):
+        """Put running jobs whose worker stopped sending heartbeats back in the queue"""
+        cutoff = datetime.now() - timedelta(seconds=stale_after)
+        requeued = db.session.execute(
+            db.update(cls).where(cls.status == 'running', cls.heartbeat_at < cutoff)
+            .values(status='queued', started_at=None, heartbeat_at=None, progress=0)
+        ).rowcount
+        db.session.commit()
+        return requeued
+    
+    @classmethod
+    def expire(cls, retention_days):
+        """Delete finished jobs older than retention_days; returns the output filenames to remove"""
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        expired = cls.query.filter(cls.status.in_(('done', 'failed')), cls.finished_at < cutoff).all()
+        filenames = [job.filename for job in expired if job.filename]
+        for job in expired:
+            db.session.delete(job)
+        db.session.commit()
+        return filenames
+
+class LoadFlag(TenantScoped, db.Model):
+    """A possible data-entry problem the anomaly detector found in an ingested load
+    
+    The load's vehicle, time and weight are copied onto the flag, so flags can be
+    listed without a join and stay readable after the load is archived.
+    """
+    __tablename__ = 'load_flags'
+    __table_args__ = (
+        db.Index('ix_load_flags_tenant_id_id', 'tenant_id', 'id'),
+        db.Index('ix_load_flags_tenant_id_kind_id', 'tenant_id', 'kind', 'id'),
+    )
+    
+    KINDS = ('duplicate', 'magnitude', 'outlier')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    waste_load_id = db.Column(db.Integer, nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)
+    detail = db.Column(db.String(200), nullable=False)
+    vehicle_number = db.Column(db.String(20), nullable=False)
+    datetime = db.Column(db.DateTime, nullable=False)
+    waste_weight = db.Column(db.Float, nullable=False)
+    # The earlier reading (duplicate, magnitude) or typical weight (outlier) it was compared with
+    reference_weight = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=func.now())
+    
+    def __repr__(self):
+        return f'<LoadFlag {self.kind} {self.vehicle_number} - {self.waste_weight}kg>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'waste_load_id': self.waste_load_id,
+            'kind': self.kind,
+            'detail': self.detail,
+            'vehicle_number': self.vehicle_number,
+            'datetime': self.datetime.strftime('%Y-%m-%dT%H:%M'),
+            'waste_weight': self.waste_weight,
+            'reference_weight': self.reference_weight,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    @classmethod
+    def add_for(cls, waste_load_id, values, flags):
+        """Stage flags for a load (a dict of WasteLoad column values); the caller commits"""
+        for kind, detail, reference_weight in flags:
+            db.session.add(cls(tenant_id=values['tenant_id'], waste_load_id=waste_load_id, kind=kind,
+                               detail=detail, vehicle_number=values['vehicle_number'], datetime=values['datetime'],
+                               waste_weight=values['waste_weight'], reference_weight=reference_weight))
+    
+    @classmethod
+    def get_page(cls, kind=None, vehicle_number=None, before_id=None, limit=None):
+        """Get the current tenant's newest flags first, optionally by kind and vehicle substring
+        
+        Returns (flags, next_before_id) where next_before_id is None on the last page.
+        """
+        limit = max(1, min(limit or WasteLoad.DEFAULT_PAGE_SIZE, WasteLoad.MAX_PAGE_SIZE))
+        query = cls.tenant_query()
+        if kind:
+            query = query.filter(cls.kind == kind)
+        if vehicle_number:
+            query = query.filter(cls.vehicle_number.ilike(f"%{vehicle_number}%"))
+        if before_id:
+            query = query.filter(cls.id < before_id)
+        flags = query.order_by(cls.id.desc()).limit(limit + 1).all()
+        if len(flags) > limit:
+            return flags[:limit], flags[limit - 1].id
+        return flags, None
+
+class DimensionValue(db.Model):
+    """Lookup table of category labels referenced by smallint ids from waste_loads"""
+    __tablename__ = 'dimension_values'
+    __table_args__ = (
+        db.UniqueConstraint('dimension', 'label', name='uq_dimension_values_dimension_label'),
+    )
+    
+    # SQLite only auto-assigns INTEGER PRIMARY KEY columns
+    id = db.Column(db.SmallInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    dimension = db.Column(db.String(30), nullable=False)
+    label = db.Column(db.String(50), nullable=False)
+    
+    def __repr__(self):
+        return f'<DimensionValue {self.dimension}={self.label}>'
+    
+    @classmethod
+    def register(cls, connection, dimension_labels):
+        """Insert (dimension, label) pairs that do not exist yet on the given connection"""
+        values = [{'dimension': dimension, 'label': label} for dimension, label in sorted(dimension_labels)]
+        if not values:
+            return
+        insert = dialect_insert(connection.dialect.name)
+        if insert:
+            connection.execute(insert(cls.__table__).values(values).on_conflict_do_nothing())
+            return
+        existing = set(connection.execute(db.select(cls.dimension, cls.label)).tuples())
+        new_values = [value for value in values if (value['dimension'], value['label']) not in existing]
+        if new_values:
+            connection.execute(db.insert(cls.__table__), new_values)
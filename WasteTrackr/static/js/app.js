@@ -38,25 +38,54 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             
             // Save to localStorage for offline support (bonus feature)
-            saveToLocalStorage();
+            if (saveToLocalStorage()) {
+                e.preventDefault();
+                wasteForm.reset();
+            }
         });
     }
 
     // Offline support functions
+    const OFFLINE_STORAGE_KEY = 'offlineWasteLogs';
+    const SYNC_BATCH_SIZE = 100;
+    let syncInProgress = false;
+
+    function loadOfflineQueue() {
+        return JSON.parse(localStorage.getItem(OFFLINE_STORAGE_KEY) || '[]');
+    }
+
+    function storeOfflineQueue(queue) {
+        localStorage.setItem(OFFLINE_STORAGE_KEY, JSON.stringify(queue));
+    }
+
+    function generateUUID() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        // Fallback for insecure contexts where randomUUID is unavailable
+        return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, c => {
+            const r = Math.random() * 16 | 0;
+            return (c === 'x' ? r : (r & 0x3 | 0x8)).toString(16);
+        });
+    }
+
     function saveToLocalStorage() {
         if (!navigator.onLine) {
             const formData = getFormData();
             if (formData) {
-                let offlineData = JSON.parse(localStorage.getItem('offlineWasteLogs') || '[]');
+                let offlineData = loadOfflineQueue();
                 offlineData.push({
                     ...formData,
+                    client_uuid: generateUUID(),
                     timestamp: new Date().toISOString(),
                     synced: false
                 });
-                localStorage.setItem('offlineWasteLogs', JSON.stringify(offlineData));
+                storeOfflineQueue(offlineData);
                 showAlert('Data saved locally. Will sync when online.', 'info');
+                return true;
             }
         }
+        return false;
     }
 
     function getFormData() {
@@ -69,24 +98,70 @@ document.addEventListener('DOMContentLoaded', function() {
             waste_weight: form.waste_weight.value,
             waste_type: form.waste_type.value,
             material_category: form.material_category.value,
-            destination: form.destination.value
+            destination: form.destination.value,
+            panchayath: form.panchayath ? form.panchayath.value : ''
         };
     }
 
-    // Sync offline data when online
-    function syncOfflineData() {
-        const offlineData = JSON.parse(localStorage.getItem('offlineWasteLogs') || '[]');
-        const unsyncedData = offlineData.filter(item => !item.synced);
-        
-        if (unsyncedData.length > 0 && navigator.onLine) {
-            // Note: In a real implementation, you would send this data to the server
-            // For this application, we'll just mark as synced since we can't make fetch calls
-            const updatedData = offlineData.map(item => ({
-                ...item,
-                synced: true
-            }));
-            localStorage.setItem('offlineWasteLogs', JSON.stringify(updatedData));
-            showAlert(`Synced ${unsyncedData.length} offline entries`, 'success');
+    // Sync offline data when online, draining the queue in batches
+    async function syncOfflineData() {
+        if (syncInProgress || !navigator.onLine) return;
+        syncInProgress = true;
+
+        try {
+            // Entries queued before client UUIDs existed get one now, before their first send
+            let queue = loadOfflineQueue().filter(item => !item.synced);
+            queue.forEach(item => {
+                if (!item.client_uuid) item.client_uuid = generateUUID();
+            });
+            storeOfflineQueue(queue);
+
+            let syncedCount = 0;
+            let rejectedCount = 0;
+            const pending = queue.filter(item => !item.rejected);
+
+            for (let start = 0; start < pending.length; start += SYNC_BATCH_SIZE) {
+                const chunk = pending.slice(start, start + SYNC_BATCH_SIZE);
+                const response = await fetch('/api/waste-loads/batch', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({waste_loads: chunk})
+                });
+                if (!response.ok) break;
+
+                const payload = await response.json();
+                const outcomes = {};
+                payload.results.forEach(result => {
+                    outcomes[chunk[result.index].client_uuid] = result;
+                });
+
+                // Created and duplicate entries are safely stored; invalid ones are kept but not resent
+                queue = loadOfflineQueue().filter(item => {
+                    const outcome = outcomes[item.client_uuid];
+                    if (!outcome) return true;
+                    if (outcome.status === 'invalid') {
+                        item.rejected = true;
+                        item.error = outcome.error;
+                        rejectedCount++;
+                        return true;
+                    }
+                    syncedCount++;
+                    return false;
+                });
+                storeOfflineQueue(queue);
+            }
+
+            if (syncedCount > 0) {
+                showAlert(`Synced ${syncedCount} offline entries`, 'success');
+            }
+            if (rejectedCount > 0) {
+                showAlert(`${rejectedCount} offline entries were rejected by the server`, 'warning');
+            }
+        } catch (error) {
+            // Network dropped mid-sync; the remaining entries stay queued for the next attempt
+            console.error('Offline sync failed:', error);
+        } finally {
+            syncInProgress = false;
         }
     }
 
@@ -94,10 +169,14 @@ document.addEventListener('DOMContentLoaded', function() {
     window.addEventListener('online', syncOfflineData);
     
     // Check for existing offline data
-    const offlineData = JSON.parse(localStorage.getItem('offlineWasteLogs') || '[]');
-    const unsyncedCount = offlineData.filter(item => !item.synced).length;
+    const offlineData = loadOfflineQueue();
+    const unsyncedCount = offlineData.filter(item => !item.synced && !item.rejected).length;
     if (unsyncedCount > 0) {
-        showAlert(`You have ${unsyncedCount} entries saved offline. They will sync when you submit the form.`, 'info');
+        if (navigator.onLine) {
+            syncOfflineData();
+        } else {
+            showAlert(`You have ${unsyncedCount} entries saved offline. They will sync when you are back online.`, 'info');
+        }
     }
 
     // Utility functions
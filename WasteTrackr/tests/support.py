@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+from app import anomaly_detector, create_app, init_db, metadata_cache, response_cache
+from models import db, dimension_cache
+
+class AppTestCase(unittest.TestCase):
+    """Runs each test against a fresh app with its own SQLite database and archive folder"""
+    
+    config = {}
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix='wastetrackr-test-')
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.database = os.path.join(self.folder, 'test.db')
+        self.create_database(self.database)
+        
+        # The caches, detector and dimension mapping are per process, so clear what earlier tests left behind
+        metadata_cache.invalidate()
+        response_cache.invalidate()
+        anomaly_detector._vehicles.clear()
+        
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + self.database,
+            'SQLALCHEMY_ENGINE_OPTIONS': {},
+            'ARCHIVE_FOLDER': os.path.join(self.folder, 'archive'),
+            'JOB_OUTPUT_FOLDER': os.path.join(self.folder, 'job_output'),
+            **self.config
+        })
+        with self.app.app_context():
+            init_db()
+            dimension_cache.load()
+        self.addCleanup(self.dispose)
+        self.client = self.app.test_client()
+    
+    def create_database(self, path):
+        """Hook for tests that start from an existing database file; init_db() runs on it next"""
+    
+    def dispose(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    
+    def load(self, when, weight=1000, vehicle_number='KA-19-AB-1234', **fields):
+        """Form/API fields for a waste load at an ISO minute such as '2025-06-09T15:29'"""
+        return dict({
+            'vehicle_number': vehicle_number,
+            'datetime': when,
+            'waste_weight': weight,
+            'waste_type': 'Mixed',
+            'material_category': 'Plastic',
+            'destination': 'Recycler',
+            'panchayath': 'Ullal'
+        }, **fields)
+    
+    def post_load(self, when, weight=1000, headers=None, **fields):
+        """Create a waste load through the API and check that it was saved"""
+        response = self.client.post('/api/waste-loads', json=self.load(when, weight, **fields), headers=headers)
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        return response
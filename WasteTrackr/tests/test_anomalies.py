@@ -0,0 +1,58 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+from anomalies import RECENT_LOADS, AnomalyDetector, VehicleState
+
+KEY = (1, 'KA00AA0000')
+
+def load(when, weight):
+    return {'tenant_id': KEY[0], 'vehicle_search': KEY[1],
+            'datetime': datetime.fromisoformat(when), 'waste_weight': weight}
+
+class AnomalyDetectorTest(unittest.TestCase):
+    def setUp(self):
+        self.detector = AnomalyDetector()
+        # Seed the vehicle so check() does not warm it from the database
+        self.detector._vehicles[KEY] = VehicleState()
+    
+    def test_duplicate_wins_over_older_magnitude_slip(self):
+        # The first rows of waste_logs.csv: a 100 kg slip followed by three 1000 kg loads
+        rows = [load('2025-06-09T15:29', 100), load('2025-06-09T15:29', 1000),
+                load('2025-06-09T15:34', 1000), load('2025-06-09T15:35', 1000)]
+        flags = self.detector.check(rows)
+        
+        self.assertEqual(flags[0], [])
+        self.assertEqual([kind for kind, _, _ in flags[1]], ['magnitude'])
+        self.assertEqual([(kind, reference) for kind, _, reference in flags[2]], [('duplicate', 1000)])
+        self.assertEqual([(kind, reference) for kind, _, reference in flags[3]], [('duplicate', 1000)])
+        self.assertIn('15:34', flags[3][0][1])
+    
+    def test_magnitude_prefers_newest_reference(self):
+        rows = [load('2025-06-09T15:00', 1000), load('2025-06-09T15:05', 1010), load('2025-06-09T15:06', 101)]
+        flags = self.detector.check(rows)
+        
+        self.assertEqual([kind for kind, _, _ in flags[2]], ['magnitude'])
+        self.assertIn('1010 kg logged at 2025-06-09 15:05', flags[2][0][1])
+    
+    def test_batch_rows_are_compared_with_the_last_recent_loads_only(self):
+        start = datetime(2025, 6, 9, 15, 0)
+        rows = [load(start.isoformat(), 1000)]
+        rows += [load((start + timedelta(seconds=index + 1)).isoformat(), 3000 + 200 * index)
+                 for index in range(RECENT_LOADS)]
+        rows.append(load((start + timedelta(minutes=1)).isoformat(), 1000))
+        flags = self.detector.check(rows)
+        
+        self.assertEqual(flags[1:], [[]] * (RECENT_LOADS + 1))
+    
+    def test_large_batch_of_one_vehicle_checks_quickly(self):
+        # Every load of the batch falls within the duplicate window of every other one
+        start = datetime(2025, 6, 9, 15, 0)
+        rows = [load((start + timedelta(milliseconds=index)).isoformat(), 1000 + index % 7 * 100)
+                for index in range(10000)]
+        started = time.perf_counter()
+        self.detector.check(rows)
+        
+        self.assertLess(time.perf_counter() - started, 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from archive import MANIFEST_NAME, Archive, PartitionCache, migrate_legacy_archive, tenant_folder
+from app import parse_filters
+from models import Tenant, WasteLoad, use_tenant
+from tests.support import AppTestCase
+
+VEHICLES = ['KA-19-AB-1234', 'KL 13 X 99', 'ka19c7']
+PANCHAYATHS = ['Ullal', 'Kotekar', 'Someshwara']
+WASTE_TYPES = ['Dry', 'Wet', 'Mixed']
+
+# Filters compared before and after archiving; substring filters cannot be answered by the rollup
+QUERIES = ['', 'vehicle_number=ab-1234', 'vehicle_number=19', 'panchayath=KOTE', 'waste_type=Dry',
+           'date_from=2025-05-10&date_to=2025-05-20', 'panchayath=ullal&weight_min=450']
+
+class ArchiveTest(AppTestCase):
+    """Archives the older loads and checks every read path answers exactly as before"""
+    
+    def setUp(self):
+        super().setUp()
+        # Loads every other day from April to June; some pairs share a minute so the id breaks the tie
+        self.datetimes = []
+        for index in range(45):
+            month, day = divmod(index * 2, 30)
+            when = f'2025-{4 + month:02d}-{day + 1:02d}T{8 + index % 3:02d}:{15 * (index % 2):02d}'
+            self.post_load(when, 100 + 37 * index % 900, vehicle_number=VEHICLES[index % 3],
+                           panchayath=PANCHAYATHS[index // 3 % 3], waste_type=WASTE_TYPES[index % 4 % 3])
+            self.datetimes.append(when)
+            if index % 5 == 0:
+                self.post_load(when, 250, vehicle_number=VEHICLES[(index + 1) % 3], panchayath=PANCHAYATHS[index % 3])
+                self.datetimes.append(when)
+        with self.app.app_context():
+            self.tenant_id = Tenant.get_id(Tenant.DEFAULT_SLUG)
+        self.folder_of_tenant = tenant_folder(self.app.config['ARCHIVE_FOLDER'], self.tenant_id)
+    
+    def dated_before(self, day):
+        return sum(when < day for when in self.datetimes)
+    
+    def archive(self, before='2025-05-15'):
+        result = self.app.test_cli_runner().invoke(args=['archive-loads', '--before', before])
+        self.assertEqual(result.exit_code, 0, result.output)
+        return result.output
+    
+    def pages(self, query, limit=4):
+        """Every page of /api/waste-loads with the cursors that lead to them"""
+        pages = []
+        cursor = None
+        while True:
+            url = f'/api/waste-loads?limit={limit}&{query}' + (f'&cursor={cursor}' if cursor else '')
+            payload = self.client.get(url).get_json()
+            pages.append((cursor, payload['waste_loads']))
+            cursor = payload['next_cursor']
+            if not cursor:
+                return pages
+    
+    def snapshot(self):
+        """Everything the read paths return for QUERIES"""
+        snapshot = {}
+        for query in QUERIES:
+            snapshot[query, 'pages'] = self.pages(query)
+            snapshot[query, 'ndjson'] = self.client.get(f'/api/waste-loads?format=ndjson&{query}').get_data()
+            snapshot[query, 'csv'] = self.client.get(f'/export/csv?{query}').get_data()
+            snapshot[query, 'trends'] = self.client.get(f'/api/trends?group_by=panchayath&{query}').get_json()
+        
+        with self.app.test_request_context():
+            use_tenant(self.tenant_id)
+            for query in QUERIES:
+                filters = parse_filters(dict(part.split('=') for part in query.split('&') if part))
+                snapshot[query, 'count'] = WasteLoad.count_filtered(filters)
+                snapshot[query, 'grouped'] = WasteLoad.get_grouped_totals(filters)
+                snapshot[query, 'rows'] = list(WasteLoad.iter_rows(WasteLoad.API_COLUMNS, filters, batch_size=3))
+                for group_by in (None, 'waste_type', 'vehicle_number'):
+                    snapshot[query, 'daily', group_by] = sorted(tuple(row) for row in
+                                                                WasteLoad.get_daily_totals(filters, group_by))
+            snapshot['stats'] = WasteLoad.get_summary_stats()
+        return snapshot
+    
+    def assertSnapshotEqual(self, before, after):
+        self.assertEqual(before.keys(), after.keys())
+        for key in before:
+            with self.subTest(key=key):
+                self.assertEqual(after[key], before[key])
+    
+    def test_reads_are_unchanged_by_archiving(self):
+        before = self.snapshot()
+        
+        output = self.archive()
+        
+        self.assertIn(f"Archived {self.dated_before('2025-05-15')} waste loads", output)
+        with self.app.app_context():
+            use_tenant(self.tenant_id)
+            self.assertEqual(WasteLoad.tenant_query().count(), len(self.datetimes) - self.dated_before('2025-05-15'))
+        after = self.snapshot()
+        self.assertSnapshotEqual(before, after)
+        # The archive cut runs through May, so pages straddle the two tiers
+        self.assertGreater(len(after['', 'pages']), 10)
+        self.assertEqual(after['', 'count'], len(self.datetimes))
+    
+    def test_second_archive_run_changes_nothing(self):
+        before = self.snapshot()
+        self.archive()
+        with open(os.path.join(self.folder_of_tenant, MANIFEST_NAME)) as manifest_file:
+            manifest = manifest_file.read()
+        
+        output = self.archive()
+        
+        self.assertIn('Archived 0 waste loads', output)
+        with open(os.path.join(self.folder_of_tenant, MANIFEST_NAME)) as manifest_file:
+            self.assertEqual(manifest_file.read(), manifest)
+        self.assertSnapshotEqual(before, self.snapshot())
+    
+    def test_later_run_extends_a_partly_archived_month(self):
+        before = self.snapshot()
+        self.archive('2025-05-15')
+        
+        self.archive('2025-06-01')
+        
+        self.assertSnapshotEqual(before, self.snapshot())
+        archive = Archive(self.folder_of_tenant)
+        self.assertEqual([entry['month'] for entry in archive.manifest()['partitions']], ['2025-04', '2025-05'])
+        self.assertEqual(sum(entry['rows'] for entry in archive.manifest()['partitions']), self.dated_before('2025-06'))
+    
+    def test_legacy_archive_is_moved_to_the_default_tenant(self):
+        before = self.snapshot()
+        self.archive()
+        root = self.app.config['ARCHIVE_FOLDER']
+        # Lay the archive out as it was before tenancy, at the root of ARCHIVE_FOLDER
+        for name in os.listdir(self.folder_of_tenant):
+            shutil.move(os.path.join(self.folder_of_tenant, name), root)
+        os.rmdir(self.folder_of_tenant)
+        
+        result = self.app.test_cli_runner().invoke(args=['init-db'])
+        
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(sorted(os.listdir(root)), [f'tenant-{self.tenant_id}'])
+        self.assertSnapshotEqual(before, self.snapshot())
+        self.assertFalse(migrate_legacy_archive(root, self.tenant_id))
+
+class PartitionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix='wastetrackr-test-')
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.archive = Archive(self.folder)
+        for month in (4, 5, 6):
+            self.archive.add([(month * 10 + day, 'KA-19-AB-1234', datetime(2025, month, day + 1, 9), 100.0 * day,
+                               'Dry', 'Plastic', 'Recycler', 'Ullal', None, None, 'KA19AB1234')
+                              for day in range(5)])
+        self.entries = self.archive.manifest()['partitions']
+    
+    def test_least_recently_used_partitions_are_evicted(self):
+        size = self.archive.load(self.entries[0]).nbytes
+        cache = PartitionCache(max_bytes=2 * size)
+        first, second, third = (cache.get_or_read(os.path.join(self.folder, entry['file']), entry['written_at'])
+                                for entry in self.entries)
+        
+        self.assertIs(cache.get_or_read(os.path.join(self.folder, self.entries[2]['file']),
+                                        self.entries[2]['written_at']), third)
+        self.assertIs(cache.get_or_read(os.path.join(self.folder, self.entries[1]['file']),
+                                        self.entries[1]['written_at']), second)
+        self.assertIsNot(cache.get_or_read(os.path.join(self.folder, self.entries[0]['file']),
+                                           self.entries[0]['written_at']), first)
+        self.assertLessEqual(cache._cached_bytes, 2 * size)
+    
+    def test_rewritten_partitions_are_reread(self):
+        self.assertEqual(self.archive.count(), 15)
+        
+        self.archive.add([(100, 'KL 13 X 99', datetime(2025, 6, 30, 9), 5.0, 'Wet', 'Organic', 'Compost',
+                           'Kotekar', None, None, 'KL13X99')])
+        
+        self.assertEqual(self.archive.count({'waste_type': 'Wet'}), 1)
+        self.assertEqual([row.id for row in self.archive.iter_rows(('id', 'datetime'))][:2], [100, 64])
+
+if __name__ == '__main__':
+    unittest.main()
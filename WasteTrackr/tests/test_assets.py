@@ -0,0 +1,114 @@
+import io
+import os
+import re
+import unittest
+from PIL import Image
+from assets import IMMUTABLE_MAX_AGE, LOGO_SIZES, logo_variant_filename
+from tests.support import AppTestCase
+
+KANNUR = 'http://kannur.example.org'
+DEFAULT = 'http://example.org'
+
+def png(color, size=(1600, 400)):
+    """An in-memory PNG upload"""
+    data = io.BytesIO()
+    Image.new('RGB', size, color).save(data, 'PNG')
+    data.seek(0)
+    return data
+
+class StaticAssetsTest(AppTestCase):
+    def stylesheet_url(self):
+        page = self.client.get('/').get_data(as_text=True)
+        match = re.search(r'/static/css/custom\.([0-9a-f]{12})\.css', page)
+        self.assertIsNotNone(match, 'stylesheet URL is not fingerprinted')
+        return match
+    
+    def test_fingerprinted_urls_are_immutable(self):
+        match = self.stylesheet_url()
+        
+        response = self.client.get(match[0])
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.cache_control.immutable)
+        self.assertEqual(response.cache_control.max_age, IMMUTABLE_MAX_AGE)
+        with open(os.path.join(self.app.static_folder, 'css', 'custom.css'), 'rb') as stylesheet:
+            self.assertEqual(response.get_data(), stylesheet.read())
+        response.close()
+    
+    def test_plain_and_outdated_urls_are_revalidated(self):
+        for url in ('/static/css/custom.css', '/static/css/custom.0123456789ab.css'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.cache_control.immutable)
+                self.assertIn('ETag', response.headers)
+                response.close()
+    
+    def test_missing_files_are_not_found(self):
+        self.assertEqual(self.client.get('/static/css/missing.0123456789ab.css').status_code, 404)
+
+class LogoRenditionsTest(AppTestCase):
+    config = {'TENANT_DOMAIN': 'example.org'}
+    
+    def setUp(self):
+        super().setUp()
+        self.uploads = os.path.join(self.folder, 'uploads')
+        self.app.config['UPLOAD_FOLDER'] = self.uploads
+        result = self.app.test_cli_runner().invoke(args=['add-tenant', 'kannur'])
+        self.assertEqual(result.exit_code, 0, result.output)
+    
+    def upload(self, image, base_url=DEFAULT):
+        response = self.client.post('/organization', base_url=base_url, data={
+            'name': 'MRF', 'description': '', 'logo': (image, 'logo.png')
+        })
+        self.assertEqual(response.status_code, 302)
+        return self.logo_key(base_url)
+    
+    def logo_key(self, base_url=DEFAULT):
+        page = self.client.get('/organization', base_url=base_url).get_data(as_text=True)
+        return re.search(r'/uploads/([0-9a-f]{20})-large\.webp', page)[1]
+    
+    def stored(self, logo_key):
+        return [os.path.exists(os.path.join(self.uploads, logo_variant_filename(logo_key, size))) for size in LOGO_SIZES]
+    
+    def test_renditions_are_resized_and_cached_for_good(self):
+        logo_key = self.upload(png('green'))
+        
+        for size, (width, height) in LOGO_SIZES.items():
+            with self.subTest(size=size):
+                response = self.client.get(f'/uploads/{logo_variant_filename(logo_key, size)}', base_url=DEFAULT)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.cache_control.immutable)
+                self.assertEqual(response.cache_control.max_age, IMMUTABLE_MAX_AGE)
+                with Image.open(io.BytesIO(response.get_data())) as rendition:
+                    self.assertEqual(rendition.format, 'WEBP')
+                    self.assertEqual(rendition.size, (width, height))
+                response.close()
+    
+    def test_replaced_logo_is_removed(self):
+        first = self.upload(png('green'))
+        second = self.upload(png('blue'))
+        
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.stored(first), [False] * len(LOGO_SIZES))
+        self.assertEqual(self.stored(second), [True] * len(LOGO_SIZES))
+    
+    def test_reuploading_the_current_logo_keeps_it(self):
+        first = self.upload(png('green'))
+        
+        self.assertEqual(self.upload(png('green')), first)
+        self.assertEqual(self.stored(first), [True] * len(LOGO_SIZES))
+    
+    def test_logo_shared_with_another_tenant_is_kept_until_unused(self):
+        shared = self.upload(png('green'))
+        self.assertEqual(self.upload(png('green'), KANNUR), shared)
+        
+        self.upload(png('blue'))
+        self.assertEqual(self.stored(shared), [True] * len(LOGO_SIZES))
+        
+        self.upload(png('red'), KANNUR)
+        self.assertEqual(self.stored(shared), [False] * len(LOGO_SIZES))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import uuid
+from tests.support import AppTestCase
+
+class BatchSyncTest(AppTestCase):
+    def records(self, count):
+        return [dict(self.load(f'2025-06-09T{10 + index:02d}:00'), client_uuid=str(uuid.uuid4()))
+                for index in range(count)]
+    
+    def sync(self, records):
+        response = self.client.post('/api/waste-loads/batch', json={'waste_loads': records})
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        return response.get_json()
+    
+    def stored_ids(self):
+        return [load['id'] for load in self.client.get('/api/waste-loads').get_json()['waste_loads']]
+    
+    def test_retried_batch_creates_nothing_twice(self):
+        records = self.records(3)
+        first = self.sync(records)
+        ids = self.stored_ids()
+        retry = self.sync(records)
+        
+        self.assertEqual((first['created'], first['duplicates']), (3, 0))
+        self.assertEqual((retry['created'], retry['duplicates']), (0, 3))
+        self.assertEqual([result['status'] for result in retry['results']], ['duplicate'] * 3)
+        self.assertEqual(self.stored_ids(), ids)
+    
+    def test_partly_synced_batch_only_adds_new_records(self):
+        records = self.records(4)
+        self.sync(records[:2])
+        result = self.sync(records)
+        
+        self.assertEqual([entry['status'] for entry in result['results']], ['duplicate', 'duplicate', 'created', 'created'])
+        self.assertEqual(len(self.stored_ids()), 4)
+    
+    def test_repeated_uuid_within_a_batch_is_stored_once(self):
+        record = self.records(1)[0]
+        result = self.sync([record, dict(record)])
+        
+        self.assertEqual([entry['status'] for entry in result['results']], ['created', 'duplicate'])
+        self.assertEqual(len(self.stored_ids()), 1)
+    
+    def test_invalid_records_do_not_block_the_rest(self):
+        records = self.records(2)
+        records[0]['waste_weight'] = -5
+        records.append(dict(self.load('2025-06-09T18:00'), client_uuid='not-a-uuid'))
+        result = self.sync(records)
+        
+        self.assertEqual([entry['status'] for entry in result['results']], ['invalid', 'created', 'invalid'])
+        self.assertEqual(len(self.stored_ids()), 1)
+
+if __name__ == '__main__':
+    unittest.main()
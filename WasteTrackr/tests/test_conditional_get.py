@@ -0,0 +1,101 @@
+import unittest
+from datetime import timedelta
+from unittest import mock
+from sqlalchemy.exc import OperationalError
+from models import db, DataVersion, Organization, Tenant, use_tenant
+from tests.support import AppTestCase
+
+class ConditionalGetTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post_load('2025-06-09T15:29')
+    
+    def test_unchanged_data_is_not_modified(self):
+        for url in ('/report', '/api/waste-loads', '/export/csv'):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                first.close()
+                etag = first.headers['ETag']
+                again = self.client.get(url, headers={'If-None-Match': etag})
+                
+                self.assertEqual(first.status_code, 200)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.headers['ETag'], etag)
+    
+    def test_write_changes_the_etag(self):
+        first = self.client.get('/api/waste-loads')
+        self.post_load('2025-06-09T16:00', 750)
+        after_write = self.client.get('/api/waste-loads', headers={'If-None-Match': first.headers['ETag']})
+        
+        self.assertEqual(after_write.status_code, 200)
+        self.assertNotEqual(after_write.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(len(after_write.get_json()['waste_loads']), 2)
+    
+    def test_write_bypasses_the_response_cache(self):
+        self.assertEqual(len(self.client.get('/api/waste-loads').get_json()['waste_loads']), 1)
+        self.client.post('/api/waste-loads/batch', json={'waste_loads': [
+            dict(self.load('2025-06-09T16:00'), client_uuid='8c6a1b5e-2f43-4d7e-9a51-0c3f2d7b6e19')
+        ]})
+        
+        self.assertEqual(len(self.client.get('/api/waste-loads').get_json()['waste_loads']), 2)
+    
+    def test_etag_depends_on_filters(self):
+        unfiltered = self.client.get('/api/waste-loads')
+        filtered = self.client.get('/api/waste-loads?waste_type=Dry',
+                                   headers={'If-None-Match': unfiltered.headers['ETag']})
+        
+        self.assertEqual(filtered.status_code, 200)
+        self.assertEqual(filtered.get_json()['waste_loads'], [])
+    
+    def test_if_modified_since_needs_a_later_date(self):
+        first = self.client.get('/api/waste-loads')
+        last_modified = first.headers['Last-Modified']
+        # A write in the same second keeps the same whole-second Last-Modified
+        self.post_load('2025-06-09T16:00', 750)
+        same_second = self.client.get('/api/waste-loads', headers={'If-Modified-Since': last_modified})
+        later = self.client.get('/api/waste-loads', headers={
+            'If-Modified-Since': (first.last_modified + timedelta(seconds=5)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+        })
+        
+        self.assertEqual(same_second.status_code, 200)
+        self.assertEqual(len(same_second.get_json()['waste_loads']), 2)
+        self.assertEqual(later.status_code, 304)
+    
+    def test_if_none_match_takes_precedence_over_if_modified_since(self):
+        first = self.client.get('/api/waste-loads')
+        self.post_load('2025-06-09T16:00', 750)
+        response = self.client.get('/api/waste-loads', headers={
+            'If-None-Match': first.headers['ETag'],
+            'If-Modified-Since': (first.last_modified + timedelta(days=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+        })
+        
+        self.assertEqual(response.status_code, 200)
+    
+    def test_unreadable_data_version_runs_the_view_uncached(self):
+        error = OperationalError('SELECT', {}, Exception('database is locked'))
+        with mock.patch.object(DataVersion, 'get', side_effect=error):
+            response = self.client.get('/api/waste-loads')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response.headers)
+        self.assertEqual(len(response.get_json()['waste_loads']), 1)
+    
+    def test_cached_metadata_follows_the_data_version(self):
+        with self.app.app_context():
+            use_tenant(Tenant.get_id(Tenant.DEFAULT_SLUG))
+            db.session.add(Organization(tenant_id=Tenant.get_id(Tenant.DEFAULT_SLUG), name='Old Name MRF'))
+            DataVersion.bump()
+            db.session.commit()
+        self.assertIn('Old Name MRF', self.client.get('/report').get_data(as_text=True))
+        
+        # Another worker renames the organization; this worker's metadata cache is not told
+        with self.app.app_context():
+            use_tenant(Tenant.get_id(Tenant.DEFAULT_SLUG))
+            Organization.get_current().name = 'New Name MRF'
+            DataVersion.bump()
+            db.session.commit()
+        
+        self.assertIn('New Name MRF', self.client.get('/report').get_data(as_text=True))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import unittest
+from app import anomaly_detector
+from importer import import_csv
+from models import db, LoadFlag, Tenant, WasteLoad, use_tenant
+from tests.support import AppTestCase
+
+HEADER = 'Vehicle Number,Date & Time,Waste Weight (kg),Waste Type,Material Category,Destination,Panchayath\n'
+
+class ImportCsvTest(AppTestCase):
+    def write_csv(self, lines):
+        path = os.path.join(self.folder, 'logs.csv')
+        with open(path, 'w') as csv_file:
+            csv_file.write(HEADER + ''.join(line + '\n' for line in lines))
+        return path
+    
+    def test_imported_loads_are_checked_for_anomalies(self):
+        path = self.write_csv([
+            'KA-19-AB-1234,2025-06-09T15:00,1000,Mixed,Plastic,Recycler,Ullal',
+            'KA-19-AB-1234,2025-06-09T15:03,1005,Mixed,Plastic,Recycler,Ullal',
+            'KA-19-AB-1234,2025-06-09T15:05,100,Mixed,Plastic,Recycler,Ullal',
+            'KA-19-AB-1234,2025-06-10T09:00,950,Mixed,Plastic,Recycler,Ullal',
+            'KA-19-AB-1234,not a date,950,Mixed,Plastic,Recycler,Ullal',
+        ])
+        with self.app.app_context():
+            use_tenant(Tenant.get_id(Tenant.DEFAULT_SLUG))
+            checkpoint = import_csv(path, chunk_size=2, report=lambda message: None, detector=anomaly_detector)
+            
+            self.assertEqual((checkpoint.rows_imported, checkpoint.rows_rejected), (4, 1))
+            self.assertEqual(WasteLoad.tenant_query(WasteLoad.id).count(), 4)
+            flags = {(flag.kind, flag.waste_weight) for flag in LoadFlag.tenant_query()}
+            self.assertEqual(flags, {('duplicate', 1005.0), ('magnitude', 100.0)})
+            for flag in LoadFlag.tenant_query():
+                self.assertEqual(db.session.get(WasteLoad, flag.waste_load_id).waste_weight, flag.waste_weight)
+
+if __name__ == '__main__':
+    unittest.main()
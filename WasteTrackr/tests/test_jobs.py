@@ -0,0 +1,87 @@
+import csv
+import gzip
+import io
+import unittest
+import zipfile
+from tests.support import AppTestCase
+
+KANNUR = 'http://kannur.example.org'
+DEFAULT = 'http://example.org'
+
+class JobLifecycleTest(AppTestCase):
+    config = {'TENANT_DOMAIN': 'example.org', 'EXPORT_BATCH_SIZE': 2}
+    
+    def setUp(self):
+        super().setUp()
+        result = self.app.test_cli_runner().invoke(args=['add-tenant', 'kannur'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        for day in range(1, 6):
+            self.post_load(f'2025-06-{day:02d}T10:00', 100 * day, waste_type='Dry' if day % 2 else 'Wet')
+    
+    def queue(self, kind, filters=None):
+        response = self.client.post('/api/jobs', json={'kind': kind, 'filters': filters or {}}, base_url=DEFAULT)
+        self.assertEqual(response.status_code, 202, response.get_data(as_text=True))
+        return response.headers['Location']
+    
+    def status(self, location, base_url=DEFAULT):
+        response = self.client.get(location, base_url=base_url)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+    
+    def run_jobs(self):
+        result = self.app.test_cli_runner().invoke(args=['run-jobs', '--once'])
+        self.assertEqual(result.exit_code, 0, result.output)
+    
+    def download(self, job):
+        response = self.client.get(job['download_url'], base_url=DEFAULT)
+        self.assertEqual(response.status_code, 200)
+        return response.get_data()
+    
+    def test_each_kind_runs_to_a_download(self):
+        locations = {kind: self.queue(kind, {'waste_type': 'Dry'}) for kind in ('csv', 'csv.gz', 'xlsx', 'summary')}
+        for location in locations.values():
+            job = self.status(location)
+            self.assertEqual((job['status'], job['progress'], job['download_url']), ('queued', 0, None))
+        
+        self.run_jobs()
+        
+        jobs = {kind: self.status(location) for kind, location in locations.items()}
+        for kind, job in jobs.items():
+            with self.subTest(kind=kind):
+                self.assertEqual(job['status'], 'done', job['error'])
+                self.assertEqual(job['progress'], job['total'])
+                self.assertIsNotNone(job['finished_at'])
+        self.assertEqual(jobs['csv']['total'], 3)
+        self.assertEqual(jobs['summary']['total'], 4)
+        
+        exported = list(csv.reader(io.StringIO(self.download(jobs['csv']).decode())))
+        self.assertEqual([row[2] for row in exported[1:]], ['500.0', '300.0', '100.0'])
+        self.assertEqual(gzip.decompress(self.download(jobs['csv.gz'])), self.download(jobs['csv']))
+        for kind in ('xlsx', 'summary'):
+            with zipfile.ZipFile(io.BytesIO(self.download(jobs[kind]))) as workbook:
+                self.assertIn('xl/workbook.xml', workbook.namelist())
+        response = self.client.get(jobs['xlsx']['download_url'], base_url=DEFAULT)
+        self.assertIn('attachment; filename=waste_loads_', response.headers['Content-Disposition'])
+    
+    def test_other_tenants_cannot_see_a_job(self):
+        location = self.queue('csv')
+        self.run_jobs()
+        job = self.status(location)
+        
+        self.assertEqual(self.client.get(location, base_url=KANNUR).status_code, 404)
+        self.assertEqual(self.client.get(job['download_url'], base_url=KANNUR).status_code, 404)
+        self.assertNotIn(job['id'], self.client.get('/jobs', base_url=KANNUR).get_data(as_text=True))
+        self.assertIn(job['id'], self.client.get('/jobs', base_url=DEFAULT).get_data(as_text=True))
+    
+    def test_queued_jobs_cannot_be_downloaded(self):
+        job = self.status(self.queue('csv'))
+        
+        self.assertEqual(self.client.get(f"/jobs/{job['id']}/download", base_url=DEFAULT).status_code, 404)
+    
+    def test_unknown_kind_is_rejected(self):
+        response = self.client.post('/api/jobs', json={'kind': 'pdf'}, base_url=DEFAULT)
+        
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import sqlite3
+import unittest
+from app import init_db
+from models import db, DailyWasteRollup, DimensionValue, Tenant, use_tenant
+from tests.support import AppTestCase
+
+# waste_loads and organization as the first release created them, with text category columns
+BASELINE_SCHEMA = """
+CREATE TABLE organization (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(200) NOT NULL, description TEXT,
+    logo_filename VARCHAR(255), created_at DATETIME, updated_at DATETIME
+);
+CREATE TABLE waste_loads (
+    id INTEGER NOT NULL PRIMARY KEY, vehicle_number VARCHAR(20) NOT NULL, datetime DATETIME NOT NULL,
+    waste_weight FLOAT NOT NULL, waste_type VARCHAR(20) NOT NULL, material_category VARCHAR(50) NOT NULL,
+    destination VARCHAR(50) NOT NULL, panchayath VARCHAR(100), created_at DATETIME
+);
+CREATE INDEX ix_waste_loads_vehicle_number ON waste_loads (vehicle_number);
+CREATE INDEX ix_waste_loads_datetime ON waste_loads (datetime);
+CREATE INDEX ix_waste_loads_panchayath ON waste_loads (panchayath);
+"""
+
+BASELINE_LOADS = [
+    ('KA-19-AB-1234', '2025-06-09 15:29:00.000000', 1000.0, 'Mixed', 'Plastic', 'Recycler', 'Ullal'),
+    ('KA-19-AB-1234', '2025-06-09 16:10:00.000000', 640.5, 'Dry', 'Glass', 'Landfill', 'Ullal'),
+    ('KA 20 CD 42', '2025-06-10 09:00:00.000000', 1200.0, 'Wet', 'MLP', 'Cement Factory', None),
+    ('KA 20 CD 42', '2025-06-11 09:30:00.000000', 980.0, 'Mixed', 'Plastic', 'Landfill', 'Mulky'),
+]
+
+class BaselineMigrationTest(AppTestCase):
+    def create_database(self, path):
+        connection = sqlite3.connect(path)
+        connection.executescript(BASELINE_SCHEMA)
+        connection.executemany(
+            'INSERT INTO waste_loads (vehicle_number, datetime, waste_weight, waste_type, material_category, '
+            'destination, panchayath) VALUES (?, ?, ?, ?, ?, ?, ?)', BASELINE_LOADS)
+        connection.execute("INSERT INTO organization (name) VALUES ('Ullal MRF')")
+        connection.commit()
+        connection.close()
+    
+    def dimension_ids(self):
+        return {(value.dimension, value.label): value.id for value in DimensionValue.query}
+    
+    def test_text_columns_become_dimension_ids(self):
+        with self.app.app_context():
+            ids = self.dimension_ids()
+            # Running it again, as every deploy does, changes nothing
+            init_db()
+            
+            self.assertEqual(self.dimension_ids(), ids)
+            self.assertEqual(set(ids), {
+                ('waste_type', 'Mixed'), ('waste_type', 'Dry'), ('waste_type', 'Wet'),
+                ('material_category', 'Plastic'), ('material_category', 'Glass'), ('material_category', 'MLP'),
+                ('destination', 'Recycler'), ('destination', 'Landfill'), ('destination', 'Cement Factory'),
+            })
+            
+            columns = {column['name'] for column in db.inspect(db.engine).get_columns('waste_loads')}
+            self.assertTrue({'waste_type_id', 'material_category_id', 'destination_id', 'tenant_id'} <= columns)
+            self.assertFalse({'waste_type', 'material_category', 'destination'} & columns)
+            
+            stored = db.session.execute(db.text(
+                'SELECT waste_type_id, material_category_id, destination_id FROM waste_loads ORDER BY id'
+            )).all()
+            self.assertEqual([tuple(row) for row in stored], [
+                (ids[('waste_type', waste_type)], ids[('material_category', category)], ids[('destination', destination)])
+                for _, _, _, waste_type, category, destination, _ in BASELINE_LOADS
+            ])
+            
+            use_tenant(Tenant.get_id(Tenant.DEFAULT_SLUG))
+            self.assertEqual(DailyWasteRollup.get_summary_totals()['total_loads'], 4)
+    
+    def test_existing_loads_are_served_unchanged(self):
+        loads = self.client.get('/api/waste-loads').get_json()['waste_loads']
+        
+        self.assertEqual([(load['vehicle_number'], load['datetime'], load['waste_weight'], load['waste_type'],
+                           load['material_category'], load['destination'], load['panchayath'])
+                          for load in reversed(loads)],
+                         [(vehicle, when[:16].replace(' ', 'T'), weight, waste_type, category, destination, panchayath)
+                          for vehicle, when, weight, waste_type, category, destination, panchayath in BASELINE_LOADS])
+        self.assertEqual(len(self.client.get('/api/waste-loads?vehicle_number=20cd').get_json()['waste_loads']), 2)
+        self.assertIn('Ullal MRF', self.client.get('/report').get_data(as_text=True))
+
+if __name__ == '__main__':
+    unittest.main()
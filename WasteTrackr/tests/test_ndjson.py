@@ -0,0 +1,50 @@
+import gzip
+import unittest
+import orjson
+from tests.support import AppTestCase
+
+class NdjsonStreamTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 8):
+            self.post_load(f'2025-06-{day:02d}T10:00', 100 * day, waste_type='Dry' if day % 2 else 'Wet')
+        # Stream in several batches
+        self.app.config['EXPORT_BATCH_SIZE'] = 2
+    
+    def stream(self, query='', headers=None):
+        response = self.client.get('/api/waste-loads?format=ndjson' + query, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertTrue(response.is_streamed)
+        body = response.get_data()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        self.assertTrue(body.endswith(b'\n'))
+        return [orjson.loads(line) for line in body.split(b'\n')[:-1]]
+    
+    def test_one_object_per_line_newest_first(self):
+        loads = self.stream()
+        
+        self.assertEqual(len(loads), 7)
+        self.assertEqual([load['datetime'][:10] for load in loads], [f'2025-06-{day:02d}' for day in range(7, 0, -1)])
+        self.assertEqual(set(loads[0]), set(self.client.get('/api/waste-loads').get_json()['waste_loads'][0]))
+    
+    def test_filters_and_limit(self):
+        self.assertEqual([load['waste_weight'] for load in self.stream('&waste_type=Dry')], [700, 500, 300, 100])
+        self.assertEqual(len(self.stream('&date_from=2025-06-03&date_to=2025-06-05')), 3)
+        self.assertEqual(len(self.stream('&limit=5')), 5)
+        self.assertEqual(len(self.stream('&waste_type=Dry&limit=3')), 3)
+    
+    def test_cursor_continues_after_a_page(self):
+        cursor = self.client.get('/api/waste-loads?limit=3').get_json()['next_cursor']
+        
+        self.assertEqual([load['datetime'][:10] for load in self.stream(f'&cursor={cursor}')],
+                         [f'2025-06-{day:02d}' for day in range(4, 0, -1)])
+    
+    def test_accept_header_and_gzip(self):
+        loads = self.stream(headers={'Accept': 'application/x-ndjson', 'Accept-Encoding': 'gzip'})
+        
+        self.assertEqual(len(loads), 7)
+
+if __name__ == '__main__':
+    unittest.main()
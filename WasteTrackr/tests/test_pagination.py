@@ -0,0 +1,57 @@
+import unittest
+from tests.support import AppTestCase
+
+class KeysetPaginationTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        # Four loads share one minute, so only the id breaks the tie between them
+        for when in ['2025-06-09T15:29'] * 4 + ['2025-06-09T15:00', '2025-06-10T08:15', '2025-06-08T11:45']:
+            self.post_load(when)
+    
+    def fetch_all(self, limit, query=''):
+        pages = []
+        cursor = None
+        while True:
+            url = f'/api/waste-loads?limit={limit}{query}' + (f'&cursor={cursor}' if cursor else '')
+            payload = self.client.get(url).get_json()
+            pages.append(payload['waste_loads'])
+            cursor = payload['next_cursor']
+            if not cursor:
+                return pages
+    
+    def test_pages_cover_every_load_once_newest_first(self):
+        pages = self.fetch_all(limit=3)
+        loads = [load for page in pages for load in page]
+        
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(len({load['id'] for load in loads}), 7)
+        keys = [(load['datetime'], load['id']) for load in loads]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+    
+    def test_equal_datetimes_split_across_pages(self):
+        # limit=2 puts the page boundary between loads logged in the same minute
+        pages = self.fetch_all(limit=2)
+        tied = [load['id'] for page in pages for load in page if load['datetime'].startswith('2025-06-09T15:29')]
+        
+        self.assertEqual(len(tied), 4)
+        self.assertEqual(tied, sorted(tied, reverse=True))
+    
+    def test_cursor_keeps_filters(self):
+        pages = self.fetch_all(limit=1, query='&date_from=2025-06-09&date_to=2025-06-09')
+        
+        self.assertEqual(len(pages), 5)
+        self.assertTrue(all(load['datetime'].startswith('2025-06-09') for page in pages for load in page))
+    
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/waste-loads?cursor=not-a-cursor')
+        
+        self.assertEqual(response.status_code, 400)
+    
+    def test_report_links_to_next_page(self):
+        self.app.config['REPORT_PAGE_SIZE'] = 5
+        first = self.client.get('/report').get_data(as_text=True)
+        
+        self.assertIn('cursor=', first)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import unittest
+from models import db, READ_REPLICA
+from tests.support import AppTestCase
+
+class ReadReplicaTest(AppTestCase):
+    """Runs against two SQLite files, copying the primary to the replica only when told to"""
+    
+    @property
+    def config(self):
+        return {'SQLALCHEMY_BINDS': {READ_REPLICA: {'url': 'sqlite:///' + self.replica}}}
+    
+    def create_database(self, path):
+        self.replica = os.path.join(self.folder, 'replica.db')
+        # create_app() registers the bind's metadata on the shared db, where later apps without the bind trip over it
+        self.addCleanup(db.metadatas.pop, READ_REPLICA, None)
+    
+    def replicate(self):
+        """Bring the replica up to date with the primary"""
+        with self.app.app_context():
+            db.engines[READ_REPLICA].dispose()
+        with sqlite3.connect(self.database) as primary, sqlite3.connect(self.replica) as replica:
+            primary.backup(replica)
+        primary.close()
+        replica.close()
+    
+    def weights(self, database):
+        with sqlite3.connect(database) as connection:
+            rows = connection.execute('SELECT waste_weight FROM waste_loads ORDER BY waste_weight').fetchall()
+        connection.close()
+        return [weight for weight, in rows]
+    
+    def test_get_views_read_from_the_replica(self):
+        self.post_load('2025-06-09T15:29', 1000)
+        self.replicate()
+        self.post_load('2025-06-10T09:00', 2000)
+        reader = self.app.test_client()
+        
+        self.assertEqual([load['waste_weight'] for load in reader.get('/api/waste-loads').get_json()['waste_loads']],
+                         [1000])
+        self.assertEqual(reader.get('/api/trends').get_json()['series'][0]['weight'], [1000.0])
+        self.assertEqual(reader.get('/export/csv').get_data(as_text=True).count('\n'), 2)
+        report = reader.get('/report').get_data(as_text=True)
+        self.assertIn('1000.0', report)
+        self.assertNotIn('3000.0', report)
+    
+    def test_writes_go_to_the_primary(self):
+        self.replicate()
+        self.post_load('2025-06-09T15:29', 1000)
+        self.client.post('/api/waste-loads/batch', json={'waste_loads': [
+            dict(self.load('2025-06-10T09:00', 2000), client_uuid='5b0e7c1a-9d24-4f3b-8a61-2e7d4c9f0a13')
+        ]})
+        
+        self.assertEqual(self.weights(self.database), [1000, 2000])
+        self.assertEqual(self.weights(self.replica), [])
+    
+    def test_recent_writers_read_from_the_primary(self):
+        self.replicate()
+        self.post_load('2025-06-09T15:29', 1000)
+        
+        # The writer sees its own load; anyone else still reads the lagging replica
+        self.assertEqual(len(self.client.get('/api/waste-loads').get_json()['waste_loads']), 1)
+        self.assertEqual(len(self.app.test_client().get('/api/waste-loads').get_json()['waste_loads']), 0)
+        
+        with self.client.session_transaction() as session:
+            session['read_primary_until'] = 0
+        self.assertEqual(len(self.client.get('/api/waste-loads').get_json()['waste_loads']), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from app import SEARCH_PLAN_CASES, search_plan_ok
+from models import WasteLoad, Tenant, explain, use_tenant
+from tests.support import AppTestCase
+
+class SearchPlanTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(20):
+            self.post_load(f'2025-06-{index + 1:02d}T10:00', vehicle_number=f'KA-19-AA-{index:04d}')
+    
+    def test_filter_combinations_are_driven_by_indexes(self):
+        with self.app.app_context():
+            use_tenant(Tenant.get_id(Tenant.DEFAULT_SLUG))
+            for name, filters in SEARCH_PLAN_CASES.items():
+                plan = explain(WasteLoad.page_query(filters))
+                with self.subTest(name):
+                    self.assertTrue(search_plan_ok(filters, plan), '\n'.join(plan))
+    
+    def test_substring_search_probed_per_row_fails(self):
+        # Walking the tenant's datetime index and probing the FTS id list for every row
+        plan = ['SEARCH waste_loads USING INDEX ix_waste_loads_tenant_id_datetime_id (tenant_id=?)',
+                'LIST SUBQUERY 1', 'SCAN waste_loads_search VIRTUAL TABLE INDEX 0:L0']
+        
+        self.assertTrue(search_plan_ok({}, plan))
+        self.assertFalse(search_plan_ok({'vehicle_number': 'aa-000'}, plan))
+        self.assertFalse(search_plan_ok({}, ['SCAN waste_loads USING COVERING INDEX ix_waste_loads_tenant_id_panchayath']))
+    
+    def test_explain_search_command(self):
+        result = self.app.test_cli_runner().invoke(args=['explain-search'])
+        
+        self.assertEqual(result.exit_code, 0, result.output)
+    
+    def test_substring_search_results(self):
+        loads = self.client.get('/api/waste-loads?vehicle_number=aa-0007').get_json()['waste_loads']
+        
+        self.assertEqual([load['vehicle_number'] for load in loads], ['KA-19-AA-0007'])
+
+if __name__ == '__main__':
+    unittest.main()
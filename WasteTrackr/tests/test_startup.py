@@ -0,0 +1,18 @@
+import os
+import tempfile
+import unittest
+from benchmarks.startup import check
+
+class StartupTest(unittest.TestCase):
+    def test_create_app_is_fast_and_never_connects(self):
+        with tempfile.TemporaryDirectory() as folder:
+            database = os.path.join(folder, 'startup.db')
+            import_ms, create_app_ms, connections, failures = check(f'sqlite:///{database}', runs=3)
+            
+            self.assertEqual(failures, [], f'import {import_ms:.1f} ms, create_app {create_app_ms:.1f} ms')
+            self.assertEqual(connections, 0)
+            # Not even an empty SQLite file may be created
+            self.assertFalse(os.path.exists(database))
+
+if __name__ == '__main__':
+    unittest.main()
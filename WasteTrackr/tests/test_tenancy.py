@@ -0,0 +1,75 @@
+import unittest
+from tests.support import AppTestCase
+
+KANNUR = 'http://kannur.example.org'
+DEFAULT = 'http://example.org'
+
+class TenancyTest(AppTestCase):
+    config = {'TENANT_DOMAIN': 'example.org'}
+    
+    def setUp(self):
+        super().setUp()
+        result = self.app.test_cli_runner().invoke(args=['add-tenant', 'kannur'])
+        self.assertEqual(result.exit_code, 0, result.output)
+    
+    def loads(self, base_url, query=''):
+        response = self.client.get('/api/waste-loads' + query, base_url=base_url)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['waste_loads']
+    
+    def test_loads_are_only_visible_to_their_tenant(self):
+        self.client.post('/api/waste-loads', json=self.load('2025-06-09T15:29'), base_url=DEFAULT)
+        self.client.post('/api/waste-loads', json=self.load('2025-06-09T16:00', 750, vehicle_number='KL-13-X-99'),
+                         base_url=KANNUR)
+        
+        self.assertEqual([load['vehicle_number'] for load in self.loads(DEFAULT)], ['KA-19-AB-1234'])
+        self.assertEqual([load['vehicle_number'] for load in self.loads(KANNUR)], ['KL-13-X-99'])
+        self.assertEqual(self.loads(KANNUR, '?vehicle_number=ab-1234'), [])
+        self.assertNotIn('KA-19-AB-1234', self.client.get('/export/csv', base_url=KANNUR).get_data(as_text=True))
+    
+    def test_cursor_from_another_tenant_only_pages_own_loads(self):
+        for minute in range(3):
+            self.client.post('/api/waste-loads', json=self.load(f'2025-06-09T15:0{minute}', 1000 + 100 * minute),
+                             base_url=DEFAULT)
+        self.client.post('/api/waste-loads', json=self.load('2025-06-08T10:00', vehicle_number='KL-13-X-99'),
+                         base_url=KANNUR)
+        cursor = self.client.get('/api/waste-loads?limit=1', base_url=DEFAULT).get_json()['next_cursor']
+        
+        self.assertEqual([load['vehicle_number'] for load in self.loads(KANNUR, f'?cursor={cursor}')], ['KL-13-X-99'])
+    
+    def test_writes_do_not_invalidate_other_tenants(self):
+        first = self.client.get('/api/waste-loads', base_url=KANNUR)
+        self.client.post('/api/waste-loads', json=self.load('2025-06-09T15:29'), base_url=DEFAULT)
+        again = self.client.get('/api/waste-loads', base_url=KANNUR, headers={'If-None-Match': first.headers['ETag']})
+        
+        self.assertEqual(again.status_code, 304)
+    
+    def test_same_client_uuid_syncs_to_each_tenant(self):
+        record = dict(self.load('2025-06-09T15:29'), client_uuid='3f1e9a52-7c4b-4d2a-8e6f-1b2c3d4e5f60')
+        for base_url in (DEFAULT, KANNUR):
+            response = self.client.post('/api/waste-loads/batch', json={'waste_loads': [record]}, base_url=base_url)
+            self.assertEqual(response.get_json()['created'], 1)
+    
+    def test_unknown_subdomain_is_not_found(self):
+        for url in ('/report', '/api/waste-loads'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, base_url='http://nowhere.example.org').status_code, 404)
+        response = self.client.post('/api/waste-loads', json=self.load('2025-06-09T15:29'),
+                                    base_url='http://nowhere.example.org')
+        
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.loads(DEFAULT), [])
+    
+    def test_tenant_header_is_ignored_unless_configured(self):
+        self.client.post('/api/waste-loads', json=self.load('2025-06-09T15:29'), base_url=KANNUR)
+        
+        self.assertEqual(self.loads(DEFAULT), [])
+        response = self.client.get('/api/waste-loads', base_url=DEFAULT, headers={'X-Tenant': 'kannur'})
+        self.assertEqual(response.get_json()['waste_loads'], [])
+        
+        self.app.config['TENANT_HEADER'] = 'X-Tenant'
+        response = self.client.get('/api/waste-loads', base_url=DEFAULT, headers={'X-Tenant': 'kannur'})
+        self.assertEqual(len(response.get_json()['waste_loads']), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import math
+import unittest
+from datetime import date, timedelta
+from tests.support import AppTestCase
+from trends import OTHER_GROUP, build_trends
+
+def days(start, count, weight, label=''):
+    """(day, group, load_count, total_weight) rows, one load per day from start"""
+    return [(start + timedelta(days=offset), label, 1, weight) for offset in range(count)]
+
+class BuildTrendsTest(unittest.TestCase):
+    def test_moving_averages_over_dense_days(self):
+        # Weights 1..40 with a gap: day 10 has no loads and counts as zero
+        rows = [(date(2025, 1, 1) + timedelta(days=offset), '', 1, offset + 1)
+                for offset in range(40) if offset != 9]
+        
+        series = build_trends(rows)['series'][0]
+        
+        weights = [0 if offset == 9 else offset + 1 for offset in range(40)]
+        for window in (7, 30):
+            averages = series[f'weight_ma_{window}d']
+            self.assertTrue(all(math.isnan(value) for value in averages[:window - 1]))
+            for index in range(window - 1, 40):
+                self.assertAlmostEqual(averages[index], round(sum(weights[index - window + 1:index + 1]) / window, 2))
+    
+    def test_weekly_buckets_from_a_mid_week_start(self):
+        # 2025-01-08 is a Wednesday; its week starts on Monday 2025-01-06
+        rows = days(date(2025, 1, 1), 21, 10.0)
+        
+        trends = build_trends([row for row in rows if row[0] >= date(2025, 1, 8)], 'week',
+                              date(2025, 1, 8), date(2025, 1, 21))
+        series = trends['series'][0]
+        
+        self.assertEqual(trends['periods'], ['2025-01-06', '2025-01-13', '2025-01-20'])
+        self.assertEqual(series['loads'].tolist(), [5, 7, 2])
+        self.assertEqual(series['weight'].tolist(), [50.0, 70.0, 20.0])
+        # Averages are as of each period's last day, which for the first week is Sunday the 12th
+        self.assertTrue(math.isnan(series['weight_ma_7d'][0]))
+        self.assertEqual(series['weight_ma_7d'][1:].tolist(), [10.0, 10.0])
+    
+    def test_monthly_buckets_from_a_mid_month_start(self):
+        rows = days(date(2025, 1, 20), 50, 2.0)
+        
+        trends = build_trends(rows, 'month', date(2025, 1, 15), date(2025, 3, 10))
+        
+        self.assertEqual(trends['periods'], ['2025-01-01', '2025-02-01', '2025-03-01'])
+        self.assertEqual(trends['series'][0]['loads'].tolist(), [12, 28, 10])
+        self.assertEqual(trends['series'][0]['weight_delta'][1:].tolist(), [32.0, -36.0])
+    
+    def test_deltas_are_nan_without_a_previous_period(self):
+        rows = [(date(2025, 1, 6), '', 1, 100.0), (date(2025, 1, 20), '', 1, 50.0)]
+        
+        series = build_trends(rows, 'week')['series'][0]
+        
+        self.assertEqual(series['weight'].tolist(), [100.0, 0.0, 50.0])
+        self.assertTrue(math.isnan(series['weight_delta'][0]))
+        self.assertEqual(series['weight_delta'][1:].tolist(), [-100.0, 50.0])
+        # No percentage change from an empty week
+        self.assertTrue(math.isnan(series['weight_delta_pct'][0]))
+        self.assertEqual(series['weight_delta_pct'][1], -100.0)
+        self.assertTrue(math.isnan(series['weight_delta_pct'][2]))
+    
+    def test_top_groups_and_other(self):
+        start = date(2025, 1, 1)
+        rows = days(start, 3, 5.0, 'Wet') + days(start, 3, 9.0, 'Dry') + days(start, 3, 1.0, 'Mixed') + days(start, 1, 2.0, None)
+        
+        series = build_trends(rows, 'year', top=2)['series']
+        
+        self.assertEqual([entry['key'] for entry in series], ['Dry', 'Wet', OTHER_GROUP])
+        self.assertEqual([entry['weight'].tolist() for entry in series], [[27.0], [15.0], [5.0]])
+        self.assertEqual(series[2]['loads'].tolist(), [4])
+        # Without a cut every group keeps its own series, the unlabelled one as None
+        self.assertEqual([entry['key'] for entry in build_trends(rows, 'year', top=4)['series']],
+                         ['Dry', 'Wet', 'Mixed', None])
+    
+    def test_top_must_be_positive(self):
+        rows = days(date(2025, 1, 1), 3, 5.0, 'Wet') + days(date(2025, 1, 1), 3, 9.0, 'Dry')
+        
+        for top in (0, -1):
+            with self.subTest(top=top), self.assertRaises(ValueError):
+                build_trends(rows, top=top)
+
+class TrendsApiTest(AppTestCase):
+    def test_nan_is_null_and_top_is_checked(self):
+        self.post_load('2025-06-02T10:00', 100, waste_type='Dry')
+        self.post_load('2025-06-10T10:00', 300, waste_type='Dry')
+        self.post_load('2025-06-10T11:00', 50, waste_type='Wet')
+        
+        response = self.client.get('/api/trends?granularity=week&group_by=waste_type&top=1')
+        
+        self.assertEqual(response.status_code, 200)
+        trends = response.get_json()
+        self.assertEqual(trends['periods'], ['2025-06-02', '2025-06-09'])
+        dry, other = trends['series']
+        self.assertEqual((dry['key'], other['key']), ('Dry', OTHER_GROUP))
+        self.assertEqual(dry['weight_delta'], [None, 200.0])
+        self.assertEqual(dry['weight_delta_pct'], [None, 200.0])
+        self.assertEqual(other['weight_delta_pct'], [None, None])
+        self.assertEqual(dry['weight_ma_30d'], [None, None])
+        
+        for top in (0, -2):
+            with self.subTest(top=top):
+                self.assertEqual(self.client.get(f'/api/trends?top={top}').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+from datetime import date
+
+import numpy as np
+
+GRANULARITIES = ('day', 'week', 'month', 'year')
+MOVING_AVERAGE_DAYS = (7, 30)
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Series label for the groups beyond the requested top N
+OTHER_GROUP = 'Other'
+
+def period_starts(days, granularity):
+    """Map a datetime64[D] array to the first day of each day's week (Monday), month or year"""
+    if granularity == 'week':
+        # Day 0 (1970-01-01) was a Thursday, three days after a Monday
+        return days - (days.astype(np.int64) + 3) % 7
+    if granularity == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    if granularity == 'year':
+        return days.astype('datetime64[Y]').astype('datetime64[D]')
+    return days
+
+def moving_average(matrix, window):
+    """Trailing mean over window columns of each row, NaN until a full window is available"""
+    result = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] >= window:
+        cumulative = np.concatenate([np.zeros((matrix.shape[0], 1)), np.cumsum(matrix, axis=1)], axis=1)
+        result[:, window - 1:] = (cumulative[:, window:] - cumulative[:, :-window]) / window
+    return result
+
+def build_trends(rows, granularity='day', start=None, end=None, top=None):
+    """Turn (day, group, load_count, total_weight) rows into per-period trend series
+    
+    Rows are spread over a dense day-by-group matrix from start (or the first day
+    with data) to end (or the last), so days without loads count as zero. Moving
+    averages of daily tonnage are taken over the dense daily series and reported as
+    of each period's last day; deltas compare each period with the one before it.
+    With top, only the heaviest groups get their own series and the rest are
+    summed into OTHER_GROUP.
+    """
+    if top is not None and top < 1:
+        raise ValueError('top must be at least 1')
+    if not rows:
+        return {'periods': [], 'series': []}
+    
+    days, labels, loads, weights = zip(*rows)
+    # Ordinals convert far faster than date objects
+    days = (np.array([day.toordinal() for day in days]) - EPOCH_ORDINAL).astype('datetime64[D]')
+    loads = np.array(loads, dtype=np.int64)
+    weights = np.array([weight or 0.0 for weight in weights], dtype=np.float64)
+    first = np.datetime64(start, 'D') if start else days.min()
+    last = np.datetime64(end, 'D') if end else days.max()
+    calendar = np.arange(first, last + 1)
+    
+    keys, group_index = np.unique(np.array([label or '' for label in labels]), return_inverse=True)
+    day_index = (days - first).astype(np.int64)
+    daily_weight = np.zeros((len(keys), len(calendar)))
+    daily_loads = np.zeros((len(keys), len(calendar)), dtype=np.int64)
+    np.add.at(daily_weight, (group_index, day_index), weights)
+    np.add.at(daily_loads, (group_index, day_index), loads)
+    
+    # Heaviest groups first
+    order = np.argsort(-daily_weight.sum(axis=1), kind='stable')
+    keys = [str(key) or None for key in keys[order]]
+    daily_weight, daily_loads = daily_weight[order], daily_loads[order]
+    if top and len(keys) > top:
+        keys = keys[:top] + [OTHER_GROUP]
+        daily_weight = np.vstack([daily_weight[:top], daily_weight[top:].sum(axis=0, keepdims=True)])
+        daily_loads = np.vstack([daily_loads[:top], daily_loads[top:].sum(axis=0, keepdims=True)])
+    
+    periods = period_starts(calendar, granularity)
+    boundaries = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    period_ends = np.r_[boundaries[1:], len(calendar)] - 1
+    period_weight = np.add.reduceat(daily_weight, boundaries, axis=1)
+    period_loads = np.add.reduceat(daily_loads, boundaries, axis=1)
+    
+    delta = np.full(period_weight.shape, np.nan)
+    delta[:, 1:] = np.diff(period_weight, axis=1)
+    delta_pct = np.full(period_weight.shape, np.nan)
+    previous = period_weight[:, :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta_pct[:, 1:] = np.where(previous > 0, delta[:, 1:] / previous * 100, np.nan)
+    averages = {window: moving_average(daily_weight, window)[:, period_ends] for window in MOVING_AVERAGE_DAYS}
+    
+    series = []
+    for index, key in enumerate(keys):
+        entry = {
+            'key': key,
+            'loads': period_loads[index],
+            'weight': np.round(period_weight[index], 2),
+            'weight_delta': np.round(delta[index], 2),
+            'weight_delta_pct': np.round(delta_pct[index], 1)
+        }
+        for window, average in averages.items():
+            entry[f'weight_ma_{window}d'] = np.round(average[index], 2)
+        series.append(entry)
+    
+    return {'periods': np.datetime_as_string(periods[boundaries]).tolist(), 'series': series}